@@ -12,3 +12,19 @@ DOMAIN = 'base'
 
 CLASSIFIER_MODEL_FILENAME = 'sample/data/classifier_model.joblib'
 
+# Memory budget (bytes) of the decoded sample images
+IMAGE_CACHE_MEMORY_BUDGET = 512 * 1024 * 1024
+# Map the images of opened projects from a raw image store on disk instead
+# of decoding them into memory
+MEMORY_MAPPED_IMAGES = False
+
+# Douglas-Peucker tolerance (image pixels) of the contours loaded for
+# editing. 0 keeps every vertex of the exact contours
+CONTOUR_SIMPLIFICATION_TOLERANCE = 1.
+
+# Memory budget (bytes) of the undo stack
+UNDO_MEMORY_BUDGET = 64 * 1024 * 1024
+
+# Memory budget (bytes) of the scaled image tiles
+TILE_CACHE_MEMORY_BUDGET = 128 * 1024 * 1024
+
@@ -0,0 +1,147 @@
+# -*- encoding: utf-8 -*-
+
+'''
+    The analysis_scheduler module.
+'''
+
+# General imports
+import heapq
+import itertools
+import threading
+
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                                                             #
+# 	AnalysisJob                                                               #
+#                                                                             #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+class AnalysisJob(object):
+
+    '''
+        The AnalysisJob class. A pending or running analysis of a sample.
+    '''
+
+    ''' Initialization method. '''
+    def __init__(self, sample_id, algorithm_settings, priority):
+
+        self.__sample_id = sample_id
+        self.__algorithm_settings = algorithm_settings
+        self.__priority = priority
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                             Getters & Setters                               #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+    def get_sample_id(self):
+        return self.__sample_id
+
+    def get_algorithm_settings(self):
+        return self.__algorithm_settings
+
+    def set_algorithm_settings(self, algorithm_settings):
+        self.__algorithm_settings = algorithm_settings
+
+    def get_priority(self):
+        return self.__priority
+
+    def set_priority(self, priority):
+        self.__priority = priority
+
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                                                             #
+# 	AnalysisScheduler                                                         #
+#                                                                             #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+class AnalysisScheduler(object):
+
+    '''
+        The AnalysisScheduler class. Thread-safe priority queue of
+        AnalysisJobs. There is at most one pending job per sample, and jobs
+        with the same priority run in submission order.
+    '''
+
+    # Priorities. Lower values run first. The active sample job is popped
+    # before any of them
+    INTERACTIVE_PRIORITY = 1
+    BATCH_PRIORITY = 2
+
+    ''' Initialization method. '''
+    def __init__(self):
+
+        self.__lock = threading.Lock()
+
+        # Heap of (priority, sequence, AnalysisJob) entries. Entries whose
+        # job is no longer pending are skipped when popped
+        self.__heap = []
+        self.__sequence = itertools.count()
+
+        # Pending AnalysisJobs by sample ID
+        self.__pending_jobs = {}
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                  Methods                                    #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+    '''
+        Queues the analysis of the sample with given ID. If the sample is
+        already pending, its job takes the latest AlgorithmSettings and the
+        most urgent of both priorities.
+    '''
+    def submit(self, sample_id, algorithm_settings, priority):
+
+        with self.__lock:
+
+            job = self.__pending_jobs.get(sample_id)
+            if job is None:
+                job = AnalysisJob(sample_id, algorithm_settings, priority)
+                self.__pending_jobs[sample_id] = job
+                heapq.heappush(self.__heap,
+                    (priority, next(self.__sequence), job))
+                return
+
+            job.set_algorithm_settings(algorithm_settings)
+            if priority < job.get_priority():
+                # The old entry becomes stale
+                job.set_priority(priority)
+                heapq.heappush(self.__heap,
+                    (priority, next(self.__sequence), job))
+
+    '''
+        Removes and returns the next AnalysisJob, or None if the queue is
+        empty. The job of the sample with the preferred ID, if pending, is
+        returned before any other.
+    '''
+    def pop(self, preferred_sample_id=None):
+
+        with self.__lock:
+
+            job = self.__pending_jobs.pop(preferred_sample_id, None)
+
+            while job is None and len(self.__heap) > 0:
+                (priority, _, candidate) = heapq.heappop(self.__heap)
+                sample_id = candidate.get_sample_id()
+                if (self.__pending_jobs.get(sample_id) is candidate and
+                        priority == candidate.get_priority()):
+                    job = self.__pending_jobs.pop(sample_id)
+
+            return job
+
+    ''' Discards every pending AnalysisJob. '''
+    def clear(self):
+
+        with self.__lock:
+            self.__heap.clear()
+            self.__pending_jobs.clear()
+
+    ''' Returns the number of pending AnalysisJobs. '''
+    def get_queue_depth(self):
+
+        with self.__lock:
+            return len(self.__pending_jobs)
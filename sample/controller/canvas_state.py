@@ -7,7 +7,6 @@
 # General imports
 import itertools
 import cairo
-import math
 
 # PyGObject imports
 import gi
@@ -24,7 +23,7 @@ from sample.controller.buttons import MouseButtons
 from sample.model.canvas_model import CanvasModel, DelimiterPointType, \
     DelimiterPointSelection, SelectionArea, DelimiterPoint, CanvasContour, \
     SelectedDelimiterPoint, RequestedDelimiterPoint, TailContourBuilder, \
-    HeadContourBuilder, union, see_anchoring_with_delimiter_point_list, \
+    HeadContourBuilder, see_anchoring_with_delimiter_point_grid, \
     make_roommates, Roommate
 
 
@@ -100,6 +99,14 @@ class CanvasState(State):
     def get_editing(self, *args):
         pass
 
+    ''' 
+        Overlay area behaviour. Returns the (x1, y1, x2, y2) image boxes
+        drawn by the state that mouse events may change, or None if the
+        whole Canvas has to be redrawn.
+    '''
+    def get_overlay_area(self, *args):
+        return None
+
     ''' Update buttons sensitivity behaviour. '''
     def update_buttons_sensitivity(self, *args):
         pass
@@ -155,21 +162,9 @@ class CanvasSelectionState(CanvasState):
             self._context.get_view().get_main_window().get_canvas().\
                 set_cursor("move")
            
-            # Get movement direction of mouse
-            mouse_coordinates = int(event.x_root), int(event.y_root)
-            axis_direction = self.__get_direction(
-                mouse_coordinates,
-                self._context.get_view().get_main_window().get_canvas().\
-                    get_move_reference_point()
-            )
-            
-            # Move scrollbars
+            # Move scrollbars by the mouse displacement since the click
             self._context.get_view().get_main_window().get_canvas().\
-                move_scrollbars(axis_direction)
-                
-            # Update reference point with current mouse location
-            self._context.get_view().get_main_window().get_canvas().\
-                set_move_reference_point(mouse_coordinates)
+                move_scrollbars((int(event.x_root), int(event.y_root)))
 
     ''' CanvasState.on_mouse_click() implementation method. '''
     def on_mouse_click(self, event):
@@ -178,11 +173,13 @@ class CanvasSelectionState(CanvasState):
         if event.button == MouseButtons.LEFT_BUTTON:
 
             # Select comet
-            self.__check_comet_selection((int(event.x), int(event.y)))
+            self.__check_comet_selection(
+                CanvasModel.get_instance().to_image_coordinates(
+                    (event.x, event.y)))
 
             # Set the Canvas 'reference point' for Scrollbars movement
             self._context.get_view().get_main_window().get_canvas().\
-                set_move_reference_point(
+                start_scrollbars_movement(
                     (int(event.x_root),
                      int(event.y_root))
                 )
@@ -220,6 +217,16 @@ class CanvasSelectionState(CanvasState):
     def get_editing(self):
         return False
 
+    ''' CanvasState.get_overlay_area() implementation method. '''
+    def get_overlay_area(self):
+
+        # The comet selection rectangle
+        selected_comet_view = self._context.\
+                                  get_active_sample_selected_comet_view()
+        if selected_comet_view is None:
+            return []
+        return [selected_comet_view.get_bounding_box()]
+
 
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
 # 	                                Methods                                   #
@@ -240,9 +247,9 @@ class CanvasSelectionState(CanvasState):
                 CanvasModel.get_instance().get_selection_color())
 
             # Get the contour that the rectangle is gonna enclose
-            contour = selected_comet_view.get_scaled_tail_contour()
+            contour = selected_comet_view.get_tail_contour()
             if contour is None:
-                contour = selected_comet_view.get_scaled_head_contour()
+                contour = selected_comet_view.get_head_contour()
             
             # Get the selection rectangle
             rect_contour = utils.contour_to_list(
@@ -252,25 +259,21 @@ class CanvasSelectionState(CanvasState):
             self._context.get_brush().draw_line(
                 cairo_context, rect_contour, close=True)
 
-    ''' Returns the mouse pointer's movement direction. '''
-    def __get_direction(self, point, reference_point):
-
-        x_axis = reference_point[0] - point[0]
-        y_axis = reference_point[1] - point[1]
-        return x_axis, y_axis
-
     ''' 
         If clicked point belongs to a comet contour, said comet is selected.
+        Only the comets whose bounding box contains the point are tested.
     '''
     def __check_comet_selection(self, point):
 
-        for comet_view in self._context.get_view().\
-            get_active_sample_comet_view_list():
+        # The last overlapping comet on the list is selected, so candidates
+        # are checked from the end
+        for comet_view in reversed(self._context.get_view().\
+            get_active_sample_comet_views_at(point)):
 
             # Get the contour what will be used for the check
-            comet_contour = (comet_view.get_scaled_tail_contour() if 
-                             comet_view.get_scaled_tail_contour() is not None 
-                             else comet_view.get_scaled_head_contour())
+            comet_contour = (comet_view.get_tail_contour() if 
+                             comet_view.get_tail_contour() is not None 
+                             else comet_view.get_head_contour())
 
             # Select comet if point is inside the comet contour    
             if utils.is_point_inside_contour(comet_contour, point):
@@ -279,6 +282,7 @@ class CanvasSelectionState(CanvasState):
                     self._context.get_active_sample_id(), 
                     comet_view.get_id()
                 )
+                return
 
  
  
@@ -351,43 +355,16 @@ class CanvasEditingState(CanvasState):
         brush.set_line_type(CanvasModel.get_instance().get_edge_line_type())
 
         brush.set_color(self._context.get_tail_color())
-        # Draw tail contours edges
-        for tail_contour in CanvasModel.get_instance().\
-                get_tail_contour_dict().values():
-                
-            self.__draw_edge_lines(
-                cairo_context, 
-                [p for p in tail_contour.get_delimiter_point_dict().values()]
-            )
+        # Draw tail contours edges, as (point1, point2) rows
+        brush.draw_lines(cairo_context,
+            CanvasModel.get_instance().get_edge_segments(
+                DelimiterPointType.TAIL).reshape(-1, 2, 2))
 
         brush.set_color(self._context.get_head_color())
         # Draw head contour edges            
-        for head_contour in CanvasModel.get_instance().\
-                get_head_contour_dict().values():
-            self.__draw_edge_lines(
-                cairo_context, 
-                [p for p in head_contour.get_delimiter_point_dict().values()]
-            )
-
-    ''' 
-        Draws the edge lines between the DelimiterPoints in the given list.
-    '''
-    def __draw_edge_lines(self, cairo_context, delimiter_point_list):
-
-        # Draw contour edges
-        for delimiter_point in delimiter_point_list:
-
-            line = []
-
-            # Draw line to neighbor DelimiterPoint
-            for neighbor in delimiter_point.get_neighbors():
-
-                line = [delimiter_point.get_coordinates(),
-                        neighbor.get_coordinates()]
-
-                cairo_context.new_sub_path()
-                self._context.get_brush().draw_line( 
-                    cairo_context, line, close=False)
+        brush.draw_lines(cairo_context,
+            CanvasModel.get_instance().get_edge_segments(
+                DelimiterPointType.HEAD).reshape(-1, 2, 2))
 
     ''' 
         Draws the DelimiterPoints, the points that connect the contours
@@ -438,6 +415,10 @@ class CanvasEditingState(CanvasState):
     def get_editing(self):
         return True
 
+    ''' CanvasState.get_overlay_area() implementation method. '''
+    def get_overlay_area(self):
+        return self.__state.get_overlay_area()
+
     ''' CanvasState.update_buttons_sensitivity() implementation. '''
     def update_buttons_sensitivity(self):
         self.__state.update_buttons_sensitivity()
@@ -545,17 +526,20 @@ class EditingSelectionState(CanvasState):
      
                 # Move selected DelimiterPoints
                 self.move_selected_delimiter_points(
-                    (int(event.x), int(event.y)))
+                    CanvasModel.get_instance().to_image_coordinates(
+                        (event.x, event.y)))
 
             else:
                 # Update the SelectionArea ending point
                 CanvasModel.get_instance().get_selection_area().\
-                    set_ending_point((int(event.x), int(event.y)))
+                    set_ending_point(CanvasModel.get_instance().
+                        to_image_coordinates((event.x, event.y)))
 
     ''' CanvasState.mouse_click() implementation method. '''
     def on_mouse_click(self, event):
         
-        mouse_coordinates = (int(event.x), int(event.y))
+        mouse_coordinates = CanvasModel.get_instance().to_image_coordinates(
+                                (event.x, event.y))
         # See if the 'click' was on a DelimiterPoint
         delimiter_point = self.__click_on_delimiter_point(
             mouse_coordinates)
@@ -676,6 +660,40 @@ class EditingSelectionState(CanvasState):
         self._context.get_build_tail_contour_button().set_sensitive(False)
         self._context.get_build_head_contour_button().set_sensitive(False)    
 
+    ''' CanvasState.get_overlay_area() implementation method. '''
+    def get_overlay_area(self):
+
+        area = []
+
+        # The selection area, with the DelimiterPoints drawn inside it
+        if CanvasModel.get_instance().get_selection_area() is not None:
+            (x, y, width, height) = \
+                CanvasModel.get_instance().get_selection_area().get_rect()
+            area.append((x, y, x + width, y + height))
+
+        # The selected DelimiterPoints and the edges to their neighbors
+        points = []
+        for selected_point in CanvasModel.get_instance().\
+                get_delimiter_point_selection().get_dict().values():
+
+            delimiter_point = CanvasModel.get_instance().get_delimiter_point(
+                selected_point.get_id(),
+                selected_point.get_type(),
+                selected_point.get_canvas_contour_id()
+            )
+            if delimiter_point is not None:
+                points.append(delimiter_point.get_coordinates())
+                points += [neighbor.get_coordinates() for neighbor
+                           in delimiter_point.get_neighbors()]
+
+        if CanvasModel.get_instance().get_anchored_delimiter_point() is not None:
+            points.append(CanvasModel.get_instance().
+                get_anchored_delimiter_point().get_coordinates())
+
+        if len(points) > 0:
+            area.append(utils.get_points_bounding_box(points))
+        return area
+
 
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
 # 	                               Methods                                    #
@@ -744,36 +762,33 @@ class EditingSelectionState(CanvasState):
 
             # Draw DelimiterPoints inside the selection area as if they were
             # selected
-            for delimiter_point in CanvasModel.get_instance().get_all_points():
-
-                (point_x, point_y) = delimiter_point.get_coordinates()
-                if ( (point_x >= rect_x and point_x <= rect_x + width) and
-                     (point_y >= rect_y and point_y <= rect_y + height) ):
+            for delimiter_point in CanvasModel.get_instance().\
+                    get_delimiter_points_inside_rect(
+                        (rect_x, rect_y, width, height)):
 
-                    # Draw DelimiterPoint
-                    CanvasEditingState.get_instance().draw_delimiter_point(
-                        cairo_context, delimiter_point)
+                # Draw DelimiterPoint
+                CanvasEditingState.get_instance().draw_delimiter_point(
+                    cairo_context, delimiter_point)
 
 
     ''' Selects the DelimiterPoints inside the selection area. '''
     def select_delimiter_points_inside_selection_area(self):
 
-        (rect_x, rect_y, width, height) = \
-            CanvasModel.get_instance().get_selection_area().get_rect()
-            
-        for delimiter_point in CanvasModel.get_instance().get_all_points():
+        selection_dict = CanvasModel.get_instance().\
+            get_delimiter_point_selection().get_dict()
 
-            (x, y) = delimiter_point.get_coordinates()
-            if ( (x >= rect_x and x <= rect_x + width) and
-                 (y >= rect_y and y <= rect_y + height) ):
+        for delimiter_point in CanvasModel.get_instance().\
+                get_delimiter_points_inside_rect(CanvasModel.get_instance().
+                    get_selection_area().get_rect()):
 
-                CanvasModel.get_instance().get_delimiter_point_selection().\
-                    get_dict()[delimiter_point.get_id()] = \
-                        SelectedDelimiterPoint(
-                            delimiter_point.get_id(),
-                            delimiter_point.get_type(),
-                            delimiter_point.get_contour_id()
-                        ) 
+            # Only the newly selected DelimiterPoints are added
+            if delimiter_point.get_id() not in selection_dict:
+                selection_dict[delimiter_point.get_id()] = \
+                    SelectedDelimiterPoint(
+                        delimiter_point.get_id(),
+                        delimiter_point.get_type(),
+                        delimiter_point.get_contour_id()
+                    ) 
 
     ''' Moves the selected DelimiterPoints. '''
     def move_selected_delimiter_points(self, mouse_coordinates):
@@ -826,28 +841,25 @@ class EditingSelectionState(CanvasState):
         # selected pivot DelimiterPoint's type.
         if (CanvasModel.get_instance().get_selected_pivot_delimiter_point().
                 get_type() == DelimiterPointType.HEAD):
-                
-            delimiter_point_list = CanvasModel.get_instance().\
-                get_all_tail_points()
-            
+            delimiter_point_type = DelimiterPointType.TAIL
         else:
-            delimiter_point_list = CanvasModel.get_instance().\
-                get_all_head_points()
-
-        # The forbidden id list
-        points_with_roommate = [p.get_id() for p in delimiter_point_list if 
-                                p.get_roommate() is not None]
-        forbidden_id_list = (
-            union(
-                CanvasModel.get_instance().get_delimiter_point_selection().
-                    get_dict().keys(),
-                points_with_roommate
-            )
-        )
+            delimiter_point_type = DelimiterPointType.HEAD
+        delimiter_point_grid = CanvasModel.get_instance().get_point_grid(
+                                   delimiter_point_type)
+
+        # The forbidden id set: the selected points and the points with
+        # roommate (only the ones near the mouse pointer are checked)
+        forbidden_id_list = set(CanvasModel.get_instance().
+            get_delimiter_point_selection().get_dict().keys())
+        forbidden_id_list.update(
+            p.get_id() for p in delimiter_point_grid.query(
+                mouse_coordinates, CanvasModel.get_instance().
+                    to_image_distance(CanvasModel.ANCHORING_DISTANCE))
+            if p.get_roommate() is not None)
 
         # Search for candidate
-        candidate = see_anchoring_with_delimiter_point_list(
-            delimiter_point_list, forbidden_id_list, mouse_coordinates)
+        candidate = see_anchoring_with_delimiter_point_grid(
+            delimiter_point_grid, forbidden_id_list, mouse_coordinates)
 
         # We are anchoring the selected pivot DelimiterPoint and the 
         # candidate DelimiterPoint
@@ -885,7 +897,8 @@ class EditingSelectionState(CanvasState):
 
             # The click is above a DelimiterPoint
             if (euclidean_distance <= CanvasModel.get_instance().
-                    get_selection_distance()):
+                    to_image_distance(CanvasModel.get_instance().
+                        get_selection_distance())):
                     
                 CanvasModel.get_instance().set_selected_pivot_delimiter_point(
                     delimiter_point)
@@ -895,92 +908,29 @@ class EditingSelectionState(CanvasState):
 
     ''' Returns the existing edges, defined by two DelimiterPoints. '''
     def get_edges(self):
-
-        edges = []
-        aux_dic = {}
-
-        for delimiter_point in CanvasModel.get_instance().get_all_points():
-
-            if delimiter_point.get_id() not in aux_dic:
-                aux_dic[delimiter_point.get_id()] = []
-
-            for neighbor in delimiter_point.get_neighbors():
-
-                if neighbor.get_id() not in aux_dic:
-                    aux_dic[neighbor.get_id()] = []
-
-                if neighbor.get_id() not in aux_dic[delimiter_point.get_id()]:
-
-                    # Append points to edges
-                    edges.append((delimiter_point, neighbor))
-
-                    aux_dic[delimiter_point.get_id()].append(neighbor.get_id())
-                    aux_dic[neighbor.get_id()].append(delimiter_point.get_id())
-
-        return edges            
+        return CanvasModel.get_instance().get_edges()
 
     ''' 
         Sees if given right click coordinates belong to an edge between
-        two DelimiterPoints.
+        two DelimiterPoints. Returns the closest edge and its distance.
     '''
     def right_click_on_edge(self, mouse_coordinates):
 
-        candidate = None
-
-        for edge in self.get_edges():
+        edges = CanvasModel.get_instance().get_edges()
+        if len(edges) == 0:
+            return None
 
-            # Calculate distance
-            distance = self.get_distance_point_to_segment(
-                           mouse_coordinates, edge)           
+        # Distances to every edge at once
+        distances = utils.get_distances_point_to_segments(
+            mouse_coordinates, CanvasModel.get_instance().get_edge_segments())
+        index = distances.argmin()
 
-            if (distance <= CanvasModel.get_instance().
-                    get_edge_selection_distance()):
-            
-                if candidate is None:
-                    candidate = (edge, distance)
+        if (distances[index] <= CanvasModel.get_instance().
+                to_image_distance(CanvasModel.get_instance().
+                    get_edge_selection_distance())):
+            return (edges[index], distances[index])
 
-                elif distance < candidate[1]:
-                    candidate = (edge, distance)
-                    
-        return candidate 
-
-    ''' Returns the distance from point 'point' to line 'line'. '''
-    def get_distance_point_to_segment(self, point0, line):   
-
-        point1 = line[0].get_coordinates()
-        point2 = line[1].get_coordinates() 
-
-        x0, y0 = float(point0[0]), float(point0[1])
-        x1, y1, x2, y2 = (float(point1[0]), float(point1[1]), 
-                          float(point2[0]), float(point2[1]))
-
-        A = x0 - x1
-        B = y0 - y1
-        C = x2 - x1
-        D = y2 - y1
-
-        dot = A * C + B * D
-        len_sq = C * C + D * D
-        param = -1
-
-        if len_sq != 0:
-            param = dot / len_sq
-
-        if param < 0:
-            xx = x1
-            yy = y1
-
-        elif param > 1:
-            xx = x2
-            yy = y2
- 
-        else:
-            xx = x1 + param * C
-            yy = y1 + param * D
-
-        dx = x0 - xx
-        dy = y0 - yy
-        return math.sqrt(dx * dx + dy * dy)
+        return None
 
     ''' Deletes the selected DelimiterPoints. '''
     def delete_selected_delimiter_points(self):
@@ -1056,6 +1006,29 @@ class EditingBuildingState(CanvasState):
     
         self.__draw_building_trail_line(cairo_context)
         self.__draw_mouse_pointer_delimiter_point(cairo_context)
+
+    ''' CanvasState.get_overlay_area() implementation method. '''
+    def get_overlay_area(self):
+
+        # The building trail line and the mouse pointer DelimiterPoint
+        points = []
+        coordinates = self._context.get_view().get_main_window().\
+            get_canvas().get_mouse_coordinates()
+        if coordinates is not None:
+            points.append(
+                CanvasModel.get_instance().to_image_coordinates(coordinates))
+
+        if CanvasModel.get_instance().get_root_delimiter_point() is not None:
+            points.append(CanvasModel.get_instance().
+                get_root_delimiter_point().get_coordinates())
+
+        if CanvasModel.get_instance().get_anchored_delimiter_point() is not None:
+            points.append(CanvasModel.get_instance().
+                get_anchored_delimiter_point().get_coordinates())
+
+        if len(points) == 0:
+            return []
+        return [utils.get_points_bounding_box(points)]
             
     ''' 
         Draws the trail between the root and mouse pointer DelimiterPoints. 
@@ -1097,8 +1070,9 @@ class EditingBuildingState(CanvasState):
             line.append(CanvasModel.get_instance().
                 get_anchored_delimiter_point().get_coordinates())
         else:  
-            line.append(self._context.get_view().get_main_window().
-                get_canvas().get_mouse_coordinates())
+            line.append(CanvasModel.get_instance().to_image_coordinates(
+                self._context.get_view().get_main_window().get_canvas().
+                    get_mouse_coordinates()))
 
         return line
         
@@ -1123,6 +1097,8 @@ class EditingBuildingState(CanvasState):
             # No anchored DelimiterPoint
             else:
             
+                coordinates = CanvasModel.get_instance().\
+                    to_image_coordinates(coordinates)
                 self._context.get_brush().set_color(
                     self.__state.get_color())
 
@@ -1203,7 +1179,8 @@ class BuildingContourState(CanvasState):
     ''' Left mouse button click behaviour. '''
     def __left_mouse_button_click(self, event):
 
-        mouse_coordinates = (int(event.x), int(event.y))
+        mouse_coordinates = CanvasModel.get_instance().to_image_coordinates(
+                                (event.x, event.y))
 
         # A DelimiterPoint is root
         if CanvasModel.get_instance().get_root_delimiter_point() is not None:
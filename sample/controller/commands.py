@@ -4,12 +4,10 @@
     The commands module.
 '''
 
-# General imports
-import copy
-
 # Custom imports
-import sample.model.utils as utils
-from sample.model.canvas_model import CanvasModel, SelectedDelimiterPoint
+from sample.model.canvas_model import CanvasModel, SelectedDelimiterPoint, \
+    DelimiterPointType
+from sample.model.canvas_snapshot import CanvasContourDictSnapshot
 
 
 
@@ -25,6 +23,9 @@ class Command(object):
         The Command abstract class. Specific Commands inherit from this class.
     '''
 
+    # Estimated memory usage (bytes) of a Command without large data
+    SIZE = 512
+
     ''' Initialization method. '''
     def __init__(self, controller):
     
@@ -48,6 +49,24 @@ class Command(object):
     ''' Undo Command method. '''
     def undo(self, *args):
         raise NotImplementedError("This method must be implemented.")    
+
+    '''
+        Returns the IDs of the samples changed by the Command, other than the
+        active one.
+    '''
+    def get_sample_ids(self):
+        return []
+
+    ''' Returns the estimated memory usage (bytes) of the Command. '''
+    def get_size(self):
+        return Command.SIZE
+
+    ''' Returns the memory usage (bytes) of given sample's loaded image. '''
+    def _get_sample_size(self, sample):
+
+        if sample.is_image_loaded():
+            return sample.get_image().nbytes
+        return 0
         
 
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
@@ -122,6 +141,16 @@ class AddSamplesCommand(Command):
         # Save data       
         self._data = new_data
 
+    ''' Command.get_sample_ids() behaviour. '''
+    def get_sample_ids(self):
+        return [data for data in self._data if isinstance(data, int)]
+
+    ''' Command.get_size() behaviour. '''
+    def get_size(self):
+
+        return Command.SIZE + sum(self._get_sample_size(data[0]) for data
+                                  in self._data if isinstance(data, tuple))
+
 
 
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
@@ -164,6 +193,20 @@ class DeleteSampleCommand(Command):
         
         # Save data
         self._data = sample.get_id()
+
+    ''' Command.get_sample_ids() behaviour. '''
+    def get_sample_ids(self):
+
+        if isinstance(self._data, int):
+            return [self._data]
+        return []
+
+    ''' Command.get_size() behaviour. '''
+    def get_size(self):
+
+        if isinstance(self._data, tuple):
+            return Command.SIZE + self._get_sample_size(self._data[0])
+        return Command.SIZE
     
 
 
@@ -204,6 +247,10 @@ class RenameSampleCommand(Command):
         # Save data
         self._data = (sample_id, previous_name)
 
+    ''' Command.get_sample_ids() behaviour. '''
+    def get_sample_ids(self):
+        return [self._data[0]]
+
 
 
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
@@ -240,13 +287,18 @@ class AddCometCommand(Command):
         )
         
         # Remove the Tail CanvasContour from the CanvasContour dictionary
-        if self._data.get_tail_canvas_contour() is not None:
-            del CanvasModel.get_instance().get_tail_contour_dict()[
-                self._data.get_tail_canvas_contour().get_id()]      
+        if self._data.get_tail_snapshot() is not None:
+            for canvas_contour_id in self._data.get_tail_snapshot().\
+                    get_contour_ids():
+                del CanvasModel.get_instance().get_tail_contour_dict()[
+                    canvas_contour_id]
           
         # Remove the Head CanvasContour from the CanvasContour dictionary
-        del CanvasModel.get_instance().get_head_contour_dict()[
-            self._data.get_head_canvas_contour().get_id()]
+        for canvas_contour_id in self._data.get_head_snapshot().\
+                get_contour_ids():
+            del CanvasModel.get_instance().get_head_contour_dict()[
+                canvas_contour_id]
+        CanvasModel.get_instance().invalidate_indexes()
 
     ''' Command.undo() behaviour. '''
     def undo(self):
@@ -268,42 +320,29 @@ class AddCometCommand(Command):
         self._controller.set_sample_analyzed_flag(
             self._data.get_sample_id(), self._data.get_analyzed_flag())
          
-        current_scale_ratio = self._controller.get_sample_zoom_value(
-            self._data.get_sample_id())
-        scale = self._data.get_scale_ratio() != current_scale_ratio
-                             
         # Add the previous Tail CanvasContour (before the comet was built)
-        if self._data.get_tail_canvas_contour() is not None:
-        
-            # If scaling is needed
-            if scale:
-                      
-                utils.scale_canvas_contour(
-                    self._data.get_tail_canvas_contour(),
-                    current_scale_ratio / self._data.get_scale_ratio()
-                )
-        
-            CanvasModel.get_instance().get_tail_contour_dict()[
-                self._data.get_tail_canvas_contour().get_id()] = \
-                    copy.deepcopy(self._data.get_tail_canvas_contour())     
-          
-        # If scaling is needed
-        if scale:
-                  
-            utils.scale_canvas_contour(
-                self._data.get_head_canvas_contour(),
-                current_scale_ratio / self._data.get_scale_ratio()
-            )  
+        if self._data.get_tail_snapshot() is not None:
+            CanvasModel.get_instance().get_tail_contour_dict().update(
+                self._data.get_tail_snapshot().restore(
+                    DelimiterPointType.TAIL))
           
         # Add the previous Head CanvasContour (before the comet was built)  
-        CanvasModel.get_instance().get_head_contour_dict()[
-            self._data.get_head_canvas_contour().get_id()] = \
-                copy.deepcopy(self._data.get_head_canvas_contour())
+        CanvasModel.get_instance().get_head_contour_dict().update(
+            self._data.get_head_snapshot().restore(
+                DelimiterPointType.HEAD))
+        CanvasModel.get_instance().invalidate_indexes()
                    
         # Save data
         self._data.set_comet_copy(comet_copy)
         self._data.set_pos(pos)
-        self._data.set_scale_ratio(current_scale_ratio)
+
+    ''' Command.get_size() behaviour. '''
+    def get_size(self):
+
+        size = Command.SIZE + self._data.get_head_snapshot().get_size()
+        if self._data.get_tail_snapshot() is not None:
+            size += self._data.get_tail_snapshot().get_size()
+        return size
         
 
 
@@ -321,16 +360,15 @@ class AddCometCommandData(object):
 
     ''' Initialization method. '''
     def __init__(self, sample_id, comet_id, analyzed_flag,
-            tail_canvas_contour, head_canvas_contour, scale_ratio):
+            tail_snapshot, head_snapshot):
             
         self.__sample_id = sample_id
         self.__comet_id = comet_id
         self.__comet_copy = None
         self.__pos = None
         self.__analyzed_flag = analyzed_flag
-        self.__tail_canvas_contour = tail_canvas_contour
-        self.__head_canvas_contour = head_canvas_contour
-        self.__scale_ratio = scale_ratio
+        self.__tail_snapshot = tail_snapshot
+        self.__head_snapshot = head_snapshot
         
         
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
@@ -367,23 +405,17 @@ class AddCometCommandData(object):
     def set_analyzed_flag(self, analyzed_flag):
         self.__analyzed_flag = analyzed_flag
         
-    def get_tail_canvas_contour(self):
-        return self.__tail_canvas_contour
-        
-    def set_tail_canvas_contour(self, tail_canvas_contour):
-        self.__tail_canvas_contour = tail_canvas_contour
+    def get_tail_snapshot(self):
+        return self.__tail_snapshot
         
-    def get_head_canvas_contour(self):
-        return self.__head_canvas_contour
+    def set_tail_snapshot(self, tail_snapshot):
+        self.__tail_snapshot = tail_snapshot
         
-    def set_head_canvas_contour(self, head_canvas_contour):
-        self.__head_canvas_contour = head_canvas_contour
+    def get_head_snapshot(self):
+        return self.__head_snapshot
         
-    def get_scale_ratio(self):
-        return self.__scale_ratio
-        
-    def set_scale_ratio(self, scale_ratio):
-        self.__scale_ratio = scale_ratio
+    def set_head_snapshot(self, head_snapshot):
+        self.__head_snapshot = head_snapshot
 
 
 
@@ -541,6 +573,10 @@ class AnalyzeSamplesCommand(Command):
         # Replace sample's comet lists
         self._data = self._controller.update_samples_comet_list(self._data)
 
+    ''' Command.get_sample_ids() behaviour. '''
+    def get_sample_ids(self):
+        return [sample_id for (sample_id, _, _) in self._data]
+
 
 
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
@@ -654,28 +690,13 @@ class EditCometContoursCommand(Command):
         self._controller.select_comet(
             self._data.get_sample_id(), self._data.get_comet_id())
         
-        # Scale the CanvasContours dicts if needed
-        current_scale_ratio = self._controller.get_sample_zoom_value(
-            self._data.get_sample_id())
-        if self._data.get_scale_ratio() != current_scale_ratio:
-        
-            utils.scale_canvas_contour_dict(
-                self._data.get_tail_canvas_contour_dict(),
-                current_scale_ratio / self._data.get_scale_ratio()
-            )
-                
-            utils.scale_canvas_contour_dict(
-                self._data.get_head_canvas_contour_dict(),
-                current_scale_ratio / self._data.get_scale_ratio()
-            )
-            
-            self._data.set_scale_ratio(current_scale_ratio)
-                     
         # Set the Comet as being edited
         self._controller.start_comet_being_edited(
             self._data.get_sample_id(), self._data.get_comet_id(),
-            copy.deepcopy(self._data.get_tail_canvas_contour_dict()),
-            copy.deepcopy(self._data.get_head_canvas_contour_dict())
+            self._data.get_tail_snapshot().restore(
+                DelimiterPointType.TAIL),
+            self._data.get_head_snapshot().restore(
+                DelimiterPointType.HEAD)
         )
         
     ''' Command.undo() behaviour. '''
@@ -691,7 +712,13 @@ class EditCometContoursCommand(Command):
         # Select Comet
         self._controller.select_comet(
             self._data.get_sample_id(), self._data.get_comet_id())
-        
+
+    ''' Command.get_size() behaviour. '''
+    def get_size(self):
+
+        return (Command.SIZE + self._data.get_tail_snapshot().get_size() +
+                self._data.get_head_snapshot().get_size())
+
 
 
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
@@ -707,14 +734,13 @@ class EditCometContoursCommandData(object):
     '''
 
     ''' Initialization method. '''
-    def __init__(self, sample_id, comet_id, tail_canvas_contour_dict,
-            head_canvas_contour_dict, scale_ratio):
+    def __init__(self, sample_id, comet_id, tail_snapshot,
+            head_snapshot):
         
         self.__sample_id = sample_id
         self.__comet_id = comet_id
-        self.__tail_canvas_contour_dict = tail_canvas_contour_dict
-        self.__head_canvas_contour_dict = head_canvas_contour_dict
-        self.__scale_ratio = scale_ratio
+        self.__tail_snapshot = tail_snapshot
+        self.__head_snapshot = head_snapshot
 
 
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
@@ -733,23 +759,17 @@ class EditCometContoursCommandData(object):
     def set_comet_id(self, comet_id):
         self.__comet_id = comet_id
 
-    def get_tail_canvas_contour_dict(self):
-        return self.__tail_canvas_contour_dict
+    def get_tail_snapshot(self):
+        return self.__tail_snapshot
         
-    def set_tail_canvas_contour_dict(self, tail_canvas_contour_dict):
-        self.__tail_canvas_contour_dict = tail_canvas_contour_dict
+    def set_tail_snapshot(self, tail_snapshot):
+        self.__tail_snapshot = tail_snapshot
         
-    def get_head_canvas_contour_dict(self):
-        return self.__head_canvas_contour_dict
+    def get_head_snapshot(self):
+        return self.__head_snapshot
         
-    def set_head_canvas_contour_dict(self, head_canvas_contour_dict):
-        self.__head_canvas_contour_dict = head_canvas_contour_dict
-
-    def get_scale_ratio(self):
-        return self.__scale_ratio
-        
-    def set_scale_ratio(self, scale_ratio):
-        self.__scale_ratio = scale_ratio
+    def set_head_snapshot(self, head_snapshot):
+        self.__head_snapshot = head_snapshot
  
  
  
@@ -786,31 +806,21 @@ class CancelEditCometContoursCommand(Command):
         if self._controller.get_active_sample_id() != self._data.get_sample_id():
             self._controller.activate_sample(self._data.get_sample_id())
 
-        current_scale_ratio = self._controller.get_sample_zoom_value(
-            self._data.get_sample_id())
-        # Scale the CanvasContour dictionaries if needed
-        if self._data.get_scale_ratio() != current_scale_ratio:
-        
-            utils.scale_canvas_contour_dict(
-                self._data.get_tail_canvas_contour_dict(),
-                current_scale_ratio / self._data.get_scale_ratio()
-            )
-            
-            utils.scale_canvas_contour_dict(
-                self._data.get_head_canvas_contour_dict(),
-                current_scale_ratio / self._data.get_scale_ratio()
-            )
-        
-            # Update the scale_ratio attribute
-            self._data.set_scale_ratio(current_scale_ratio)
-            
         # Start Comet being edited  
         self._controller.start_comet_being_edited(
             self._data.get_sample_id(), self._data.get_comet_id(),
-            copy.deepcopy(self._data.get_tail_canvas_contour_dict()),
-            copy.deepcopy(self._data.get_head_canvas_contour_dict())
+            self._data.get_tail_snapshot().restore(
+                DelimiterPointType.TAIL),
+            self._data.get_head_snapshot().restore(
+                DelimiterPointType.HEAD)
         )
-        
+
+    ''' Command.get_size() behaviour. '''
+    def get_size(self):
+
+        return (Command.SIZE + self._data.get_tail_snapshot().get_size() +
+                self._data.get_head_snapshot().get_size())
+
 
 
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
@@ -826,14 +836,13 @@ class CancelEditCometContoursCommandData(object):
     '''
 
     ''' Initialization method. '''
-    def __init__(self, sample_id, comet_id, tail_canvas_contour_dict,
-            head_canvas_contour_dict, scale_ratio):
+    def __init__(self, sample_id, comet_id, tail_snapshot,
+            head_snapshot):
         
         self.__sample_id = sample_id
         self.__comet_id = comet_id
-        self.__tail_canvas_contour_dict = tail_canvas_contour_dict
-        self.__head_canvas_contour_dict = head_canvas_contour_dict
-        self.__scale_ratio = scale_ratio
+        self.__tail_snapshot = tail_snapshot
+        self.__head_snapshot = head_snapshot
 
 
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
@@ -852,23 +861,17 @@ class CancelEditCometContoursCommandData(object):
     def set_comet_id(self, comet_id):
         self.__comet_id = comet_id
 
-    def get_tail_canvas_contour_dict(self):
-        return self.__tail_canvas_contour_dict
+    def get_tail_snapshot(self):
+        return self.__tail_snapshot
         
-    def set_tail_canvas_contour_dict(self, tail_canvas_contour_dict):
-        self.__tail_canvas_contour_dict = tail_canvas_contour_dict
+    def set_tail_snapshot(self, tail_snapshot):
+        self.__tail_snapshot = tail_snapshot
         
-    def get_head_canvas_contour_dict(self):
-        return self.__head_canvas_contour_dict
+    def get_head_snapshot(self):
+        return self.__head_snapshot
         
-    def set_head_canvas_contour_dict(self, head_canvas_contour_dict):
-        self.__head_canvas_contour_dict = head_canvas_contour_dict
-
-    def get_scale_ratio(self):
-        return self.__scale_ratio
-        
-    def set_scale_ratio(self, scale_ratio):
-        self.__scale_ratio = scale_ratio
+    def set_head_snapshot(self, head_snapshot):
+        self.__head_snapshot = head_snapshot
 
 
 
@@ -914,30 +917,13 @@ class UpdateCometContoursCommand(Command):
                 get_sample_id()):
             self._controller.activate_sample(self._data.get_sample_id()) 
          
-        
-        current_scale_ratio = self._controller.get_sample_zoom_value(
-            self._data.get_sample_id())
-        # Scale the CanvasContour dictionaries if needed
-        if self._data.get_scale_ratio() != current_scale_ratio:
-        
-            utils.scale_canvas_contour_dict(
-                self._data.get_tail_canvas_contour_dict(),
-                current_scale_ratio / self._data.get_scale_ratio()
-            )
-            
-            utils.scale_canvas_contour_dict(
-                self._data.get_head_canvas_contour_dict(),
-                current_scale_ratio / self._data.get_scale_ratio()
-            )
-        
-            # Update the scale_ratio attribute
-            self._data.set_scale_ratio(current_scale_ratio)
-         
         # Start Comet being edited  
         self._controller.start_comet_being_edited(
             self._data.get_sample_id(), self._data.get_comet_id(),
-            copy.deepcopy(self._data.get_tail_canvas_contour_dict()),
-            copy.deepcopy(self._data.get_head_canvas_contour_dict())
+            self._data.get_tail_snapshot().restore(
+                DelimiterPointType.TAIL),
+            self._data.get_head_snapshot().restore(
+                DelimiterPointType.HEAD)
         )
         
         # Update Comet contours
@@ -946,9 +932,15 @@ class UpdateCometContoursCommand(Command):
             self._data.get_opencv_tail_contour(),
             self._data.get_opencv_head_contour()
         )
-        
 
- 
+    ''' Command.get_size() behaviour. '''
+    def get_size(self):
+
+        return (Command.SIZE + self._data.get_tail_snapshot().get_size() +
+                self._data.get_head_snapshot().get_size())
+
+
+
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
 #                                                                             #
 #   UpdateCometContoursCommandData                                            #
@@ -963,16 +955,15 @@ class UpdateCometContoursCommandData(object):
 
     ''' Initialization method. '''
     def __init__(self, sample_id, comet_id, opencv_tail_contour,
-            opencv_head_contour, tail_canvas_contour_dict,
-            head_canvas_contour_dict, scale_ratio):
+            opencv_head_contour, tail_snapshot,
+            head_snapshot):
         
         self.__sample_id = sample_id
         self.__comet_id = comet_id
         self.__opencv_tail_contour = opencv_tail_contour
         self.__opencv_head_contour = opencv_head_contour
-        self.__tail_canvas_contour_dict = tail_canvas_contour_dict
-        self.__head_canvas_contour_dict = head_canvas_contour_dict
-        self.__scale_ratio = scale_ratio
+        self.__tail_snapshot = tail_snapshot
+        self.__head_snapshot = head_snapshot
 
 
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
@@ -1003,23 +994,17 @@ class UpdateCometContoursCommandData(object):
     def set_opencv_head_contour(self, opencv_head_contour):
         self.__opencv_head_contour = opencv_head_contour
 
-    def get_tail_canvas_contour_dict(self):
-        return self.__tail_canvas_contour_dict
+    def get_tail_snapshot(self):
+        return self.__tail_snapshot
         
-    def set_tail_canvas_contour_dict(self, tail_canvas_contour_dict):
-        self.__tail_canvas_contour_dict = tail_canvas_contour_dict
+    def set_tail_snapshot(self, tail_snapshot):
+        self.__tail_snapshot = tail_snapshot
         
-    def get_head_canvas_contour_dict(self):
-        return self.__head_canvas_contour_dict
+    def get_head_snapshot(self):
+        return self.__head_snapshot
         
-    def set_head_canvas_contour_dict(self, head_canvas_contour_dict):
-        self.__head_canvas_contour_dict = head_canvas_contour_dict
-
-    def get_scale_ratio(self):
-        return self.__scale_ratio
-        
-    def set_scale_ratio(self, scale_ratio):
-        self.__scale_ratio = scale_ratio
+    def set_head_snapshot(self, head_snapshot):
+        self.__head_snapshot = head_snapshot
         
 
    
@@ -1049,21 +1034,6 @@ class CreateDelimiterPointCommand(Command):
         # Transition to CanvasEditingState       
         self._controller.canvas_transition_to_editing_state()
 
-        # Recalculate DelimiterPoint coordinates based on previous and
-        # current zoom values
-        current_scale_ratio = self._controller.get_sample_zoom_value(
-            self._data.get_sample_id())
-        if self._data.get_scale_ratio() != current_scale_ratio:
-        
-            # Scale and set coordinates
-            self._data.set_coordinates(
-                utils.scale_point(
-                    self._data.get_coordinates(),
-                    current_scale_ratio / self._data.get_scale_ratio()
-                )
-            )
-            self._data.set_scale_ratio(current_scale_ratio)
-           
         # 'Create DelimiterPoint' use case 
         if self._data.get_root_delimiter_point_id() is None:     
              
@@ -1152,7 +1122,7 @@ class CreateDelimiterPointCommandData(object):
 
     ''' Initialization method. '''
     def __init__(self, sample_id, delimiter_point_id, delimiter_point_type,
-            canvas_contour_id, roommate, coordinates, builder, scale_ratio):
+            canvas_contour_id, roommate, coordinates, builder):
         
         self.__sample_id = sample_id
         self.__delimiter_point_id = delimiter_point_id
@@ -1161,7 +1131,6 @@ class CreateDelimiterPointCommandData(object):
         self.__roommate = roommate
         self.__coordinates = coordinates      
         self.__builder = builder
-        self.__scale_ratio = scale_ratio
         self.__root_delimiter_point_id = None
         self.__comet_being_edited_has_changed = None
         
@@ -1207,12 +1176,6 @@ class CreateDelimiterPointCommandData(object):
     def set_builder(self, builder):
         self.__builder = builder
         
-    def get_scale_ratio(self):
-        return self.__scale_ratio
-        
-    def set_scale_ratio(self, scale_ratio):
-        self.__scale_ratio = scale_ratio
-        
     def get_root_delimiter_point_id(self):
         return self.__root_delimiter_point_id
         
@@ -1289,26 +1252,10 @@ class DeleteDelimiterPointsCommand(Command):
         # Transition to EditingSelectionState       
         self._controller.canvas_transition_to_editing_selection_state()
         
-        # Recalculate DelimiterPoint coordinates based on previous and
-        # current zoom values
-        current_scale_ratio = self._controller.get_sample_zoom_value(
-            self._data.get_sample_id())
-        recalculate_coordinates = self._data.get_scale_ratio() != current_scale_ratio
-        
         # Add the DelimiterPoints that were removed
         for (canvas_contour_id, (deleted_delimiter_point_data_list, closed)) in self._data.get_deleted_delimiter_point_data_dict().items():
     
             for deleted_delimiter_point_data in deleted_delimiter_point_data_list:
-            
-                if recalculate_coordinates:
-        
-                    # Scale and set coordinates
-                    deleted_delimiter_point_data.set_coordinates(
-                        utils.scale_point(
-                            deleted_delimiter_point_data.get_coordinates(),
-                            current_scale_ratio / self._data.get_scale_ratio()
-                        )
-                    )
            
                 roommate_delimiter_point = None
                 if deleted_delimiter_point_data.get_roommate() is not None:
@@ -1360,10 +1307,7 @@ class DeleteDelimiterPointsCommand(Command):
                             dst_delimiter_point,
                             canvas_contour_id
                         )
-                        
-        if recalculate_coordinates: 
-            self._data.set_scale_ratio(current_scale_ratio)
-            
+
         if self._data.get_comet_being_edited_has_changed() is not None:    
             self._controller.set_comet_being_edited_has_changed(
                 self._data.get_comet_being_edited_has_changed())
@@ -1383,12 +1327,10 @@ class DeleteDelimiterPointsCommandData(object):
     '''
 
     ''' Initialization method. '''
-    def __init__(self, sample_id, deleted_delimiter_point_data_dict,
-            scale_ratio): 
+    def __init__(self, sample_id, deleted_delimiter_point_data_dict): 
 
         self.__sample_id = sample_id
         self.__deleted_delimiter_point_data_dict = deleted_delimiter_point_data_dict
-        self.__scale_ratio = scale_ratio
         self.__comet_being_edited_has_changed = None
         
 
@@ -1409,12 +1351,6 @@ class DeleteDelimiterPointsCommandData(object):
             deleted_delimiter_point_data_dict):
         self.__deleted_delimiter_point_data_dict = \
             deleted_delimiter_point_data_dict
-            
-    def get_scale_ratio(self):  
-        return self.__scale_ratio
-        
-    def set_scale_ratio(self, scale_ratio):
-        self.__scale_ratio = scale_ratio
         
     def get_comet_being_edited_has_changed(self):
         return self.__comet_being_edited_has_changed 
@@ -1691,30 +1627,29 @@ class CloseCanvasContourCommand(Command):
         # Transition to CanvasEditingState       
         self._controller.canvas_transition_to_editing_state()
         
-        # Scale CanvasContour if needed
-        current_scale_ratio = self._controller.get_sample_zoom_value(
-            self._data.get_sample_id())
-            
-        if self._data.get_scale_ratio() != current_scale_ratio:
-            utils.scale_canvas_contour(
-                self._data.get_canvas_contour(),
-                current_scale_ratio/self._data.get_scale_ratio()
-            )
-                                
-        canvas_contour_copy = self._data.get_builder().get_contour_dict()[
-            self._data.get_canvas_contour().get_id()]
-            
-        self._data.get_builder().get_contour_dict()[
-            self._data.get_canvas_contour().get_id()] = \
-                copy.deepcopy(self._data.get_canvas_contour())
+        contour_dict = self._data.get_builder().get_contour_dict()
+        snapshot = self._data.get_snapshot()
+
+        # Keep the current CanvasContour as a delta of the stored one
+        current_snapshot = CanvasContourDictSnapshot(
+            {canvas_contour_id: contour_dict[canvas_contour_id]
+             for canvas_contour_id in snapshot.get_contour_ids()},
+            snapshot)
+
+        contour_dict.update(snapshot.restore(
+            self._data.get_builder().POINT_TYPE))
+        CanvasModel.get_instance().invalidate_indexes()
             
-        self._data.set_scale_ratio(current_scale_ratio)
-        self._data.set_canvas_contour(canvas_contour_copy)
+        self._data.set_snapshot(current_snapshot)
 
         if self._data.get_comet_being_edited_has_changed() is not None:    
             self._controller.set_comet_being_edited_has_changed(
                 has_changed)
 
+    ''' Command.get_size() behaviour. '''
+    def get_size(self):
+        return Command.SIZE + self._data.get_snapshot().get_size()
+
 
 
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
@@ -1730,12 +1665,11 @@ class CloseCanvasContourCommandData(object):
     '''
 
     ''' Initialization method. '''
-    def __init__(self, sample_id, builder, canvas_contour, scale_ratio):
+    def __init__(self, sample_id, builder, snapshot):
 
         self.__sample_id = sample_id
         self.__builder = builder
-        self.__canvas_contour = canvas_contour
-        self.__scale_ratio = scale_ratio
+        self.__snapshot = snapshot
         self.__comet_being_edited_has_changed = None
 
 
@@ -1755,17 +1689,11 @@ class CloseCanvasContourCommandData(object):
     def set_builder(self, builder):
         self.__builder = builder
         
-    def get_canvas_contour(self):
-        return self.__canvas_contour
+    def get_snapshot(self):
+        return self.__snapshot
         
-    def set_canvas_contour(self, canvas_contour):
-        self.__canvas_contour = canvas_contour
-        
-    def get_scale_ratio(self):
-        return self.__scale_ratio
-        
-    def set_scale_ratio(self, scale_ratio):
-        self.__scale_ratio = scale_ratio
+    def set_snapshot(self, snapshot):
+        self.__snapshot = snapshot
         
     def get_comet_being_edited_has_changed(self):
         return self.__comet_being_edited_has_changed
@@ -1800,6 +1728,12 @@ class MoveDelimiterPointsCommand(Command):
         self.__move_delimiter_points(
             self._data.get_comet_being_edited_has_changed())
 
+    ''' Command.get_size() behaviour. '''
+    def get_size(self):
+
+        return (Command.SIZE + CanvasContourDictSnapshot.POINT_SIZE *
+                len(self._data.get_delimiter_point_selection().get_dict()))
+
     ''' Moves the DelimiterPoints to its origin. '''    
     def __move_delimiter_points(self, has_changed): 
         
@@ -1812,13 +1746,7 @@ class MoveDelimiterPointsCommand(Command):
         
         # Move points to origin coordinates
         self._controller.move_delimiter_points_to_origin(
-            self._data.get_delimiter_point_selection(),
-            self._data.get_scale_ratio()
-        )
-        
-        # Set new scale ratio
-        self._data.set_scale_ratio(self._controller.
-            get_sample_zoom_value(self._data.get_sample_id()))
+            self._data.get_delimiter_point_selection())
             
         if self._data.get_comet_being_edited_has_changed() is not None:    
             self._controller.set_comet_being_edited_has_changed(
@@ -1839,11 +1767,10 @@ class MoveDelimiterPointsCommandData(object):
     '''
 
     ''' Initialization method. '''
-    def __init__(self, sample_id, delimiter_point_selection, scale_ratio):
+    def __init__(self, sample_id, delimiter_point_selection):
 
         self.__sample_id = sample_id
         self.__delimiter_point_selection = delimiter_point_selection
-        self.__scale_ratio = scale_ratio
         self.__comet_being_edited_has_changed = None
 
 
@@ -1863,12 +1790,6 @@ class MoveDelimiterPointsCommandData(object):
     def set_delimiter_point_selection(self, delimiter_point_selection):
         self.__delimiter_point_selection = delimiter_point_selection
         
-    def get_scale_ratio(self):
-        return self.__scale_ratio
-        
-    def set_scale_ratio(self, scale_ratio):
-        self.__scale_ratio = scale_ratio
-        
     def get_comet_being_edited_has_changed(self):
         return self.__comet_being_edited_has_changed 
 
@@ -7,8 +7,9 @@
 # General imports
 import os
 import sys
-import copy
 import ntpath
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathvalidate import ValidationError, validate_filename
 
 # PyGObject imports
@@ -19,6 +20,7 @@ from gi.repository import Gtk
 
 
 # Custom imports
+import sample.config as config
 from sample.dialog_response import DialogResponse
 from sample.singleton import Singleton
 
@@ -28,6 +30,8 @@ from sample.controller.algorithm_settings_dto import AlgorithmSettingsDto
 from sample.controller.canvas_state import CanvasSelectionState, CanvasEditingState, \
     EditingSelectionState, BuildingTailContourState, BuildingHeadContourState
 from sample.controller.threads import ThreadWithException
+from sample.controller.analysis_scheduler import AnalysisScheduler
+from sample.model.cancellation import CancellationToken, CancellationError
 import sample.controller.commands as commands
 
 import sample.model.utils as utils
@@ -36,6 +40,7 @@ from sample.model.sample import Sample
 from sample.model.comet import Comet
 from sample.model.canvas_model import CanvasModel, DelimiterPointType, \
     contours_are_nested, check_contour_is_closed, make_roommates
+from sample.model.canvas_snapshot import CanvasContourDictSnapshot
     
 from sample.i18n.i18n import I18n
 from sample.i18n.language import Language
@@ -73,6 +78,27 @@ class Controller(object):
         # Undo & Redo stacks
         self.__undo_stack = []
         self.__redo_stack = []
+        # Estimated memory usage (bytes) of the undo stack and its budget.
+        # The oldest commands are dropped when the budget is exceeded
+        self.__undo_stack_size = 0
+        self.__undo_memory_budget = config.UNDO_MEMORY_BUDGET
+
+        # CanvasContour dict snapshots taken when a comet's edition starts,
+        # by sample ID. Later snapshots only store their differences
+        self.__contour_snapshots = {}
+
+        # CancellationToken of the running Analyze Samples thread
+        self.__analyze_samples_cancellation_token = CancellationToken()
+
+        # Generate Output File thread and its CancellationToken. It can run
+        # while the Analyze Samples thread does
+        self.__generate_output_file_thread = None
+        self.__generate_output_file_cancellation_token = CancellationToken()
+
+        # Queue of the samples to analyze. A single Analyze Samples thread
+        # runs while it has pending jobs
+        self.__analysis_scheduler = AnalysisScheduler()
+        self.__is_analyzing_samples = False
 
         # Flags
         self.__is_unsaved_project = False
@@ -81,6 +107,8 @@ class Controller(object):
         # Constants
         self.__SEPARATOR = " - "
         self.__UNSAVED_CHANGES_SYMBOL = "*"
+        self.__AUTOSAVE_INTERVAL = 30000   # milliseconds
+        self.__N_LOADING_WORKERS = os.cpu_count() or 1
 
         # Model & View
         self.__model = model
@@ -89,6 +117,9 @@ class Controller(object):
         # Canvas state
         self.__canvas_state = CanvasSelectionState(self)
 
+        # Autosave
+        GLib.timeout_add(self.__AUTOSAVE_INTERVAL, self.__autosave)
+
         # Start UI
         self.__view.connect(self)
         self.__view.set_application_window_title(
@@ -111,6 +142,9 @@ class Controller(object):
 
     ''' Ends the application execution. '''
     def __exit(self):
+
+        # Changes were either saved or discarded by the user
+        self.__model.discard_journal()
         Gtk.main_quit()
 
     ''' 'New project' use case. '''
@@ -150,7 +184,7 @@ class Controller(object):
             return
 
         # Open project
-        self.__model.open_project(project_path)
+        recovered = self.__model.open_project(project_path)
 
         # Update View
         view_store = []
@@ -158,10 +192,11 @@ class Controller(object):
 
             comet_view_list = self.comet_list_to_comet_view_list(
                 sample.get_comet_list())
+            # Surfaces are built when the sample is activated
             view_store.append(
                 (sample_id, 
                  sample.get_name(), 
-                 utils.image_to_pixbuf(sample.get_image()),
+                 None,
                  comet_view_list
                 )
             ) 
@@ -172,16 +207,17 @@ class Controller(object):
         self.__view.get_main_window().set_title(
             self.__build_application_window_title())       
         # Add new Samples on View
-        for (sample_id, sample_name, pixbuf, 
+        for (sample_id, sample_name, surface, 
              comet_view_list) in view_store:
              
              self.__add_sample_view(sample_id, sample_name, 
-                SampleParameters(pixbuf, comet_view_list), None)
+                SampleParameters(surface, comet_view_list), None)
 
         # Current project is not a 'new project'
         self.__is_new_project = False
-        # Update state and clear command stacks
-        self.__update(False)
+        # Update state and clear command stacks. Changes recovered from the
+        # journal are not saved yet
+        self.__update(recovered)
         self.__clear_command_stacks()
 
     ''' 'Save project' use case. '''
@@ -285,16 +321,19 @@ class Controller(object):
         if algorithm_settings is None:
             algorithm_settings = self.__model.get_algorithm_settings()
 
-        # Run AnalyzeSamplesLoadingWindow
-        self.__view.run_analyze_samples_loading_window()
+        # Single sample requests go before batch work
+        if len(samples_id_list) == 1:
+            priority = AnalysisScheduler.INTERACTIVE_PRIORITY
+        else:
+            priority = AnalysisScheduler.BATCH_PRIORITY
 
-        # Run thread to analyze the Samples and update the
-        # AnalyzeSamplesLoadingWindow
-        self.__thread = ThreadWithException(
-                            self.__analyze_samples,
-                            [samples_id_list, algorithm_settings])
-        self.__thread.daemon = True
-        self.__thread.start()
+        for sample_id in samples_id_list:
+            self.__analysis_scheduler.submit(
+                sample_id, algorithm_settings, priority)
+
+        # The running thread takes the new jobs
+        if not self.__is_analyzing_samples:
+            self.__start_analyze_samples_thread()
  
     ''' 'Add new comet' use case. '''
     def add_new_comet_use_case(self, sample_id, tail_contour, head_contour):
@@ -326,13 +365,19 @@ class Controller(object):
         # Start Comet being edited
         self.start_comet_being_edited(sample_id, comet_id)
 
+        # Keep the snapshots as the base of the following ones
+        self.__contour_snapshots[sample_id] = (
+            CanvasContourDictSnapshot(
+                CanvasModel.get_instance().get_tail_contour_dict()),
+            CanvasContourDictSnapshot(
+                CanvasModel.get_instance().get_head_contour_dict())
+        )
+
         # Add EditCometContoursCommand to the undo stack           
         command.set_data(
             commands.EditCometContoursCommandData(
                 sample_id, comet_id,
-                copy.deepcopy(CanvasModel.get_instance().get_tail_contour_dict()),
-                copy.deepcopy(CanvasModel.get_instance().get_head_contour_dict()),
-                self.get_sample_zoom_value(sample_id)
+                *self.__contour_snapshots[sample_id]
             )
         )
         self.__add_command(command)
@@ -350,9 +395,7 @@ class Controller(object):
             commands.CancelEditCometContoursCommandData(
                 self.__active_sample_id, 
                 comet_id,
-                copy.deepcopy(CanvasModel.get_instance().get_tail_contour_dict()),
-                copy.deepcopy(CanvasModel.get_instance().get_head_contour_dict()),
-                self.get_sample_zoom_value(self.__active_sample_id)
+                *self.__take_contour_snapshots(self.__active_sample_id)
             )
         )
       
@@ -376,9 +419,7 @@ class Controller(object):
         command.set_data(
             commands.UpdateCometContoursCommandData(
                 sample_id, comet_id, old_tail_contour, old_head_contour,
-                copy.deepcopy(CanvasModel.get_instance().get_tail_contour_dict()),
-                copy.deepcopy(CanvasModel.get_instance().get_head_contour_dict()),
-                self.get_sample_zoom_value(sample_id)
+                *self.__take_contour_snapshots(sample_id)
             )
         )
         self.__add_command(command)
@@ -407,10 +448,13 @@ class Controller(object):
         unsaved_changes_value = self.__is_unsaved_project
 
         command = self.__undo_stack.pop()
+        self.__undo_stack_size = max(
+            0, self.__undo_stack_size - command.get_size())
         self.__update(command.get_is_unsaved_project())
         command.undo()
         command.set_is_unsaved_project(unsaved_changes_value)
         self.__redo_stack.append(command)
+        self.__record_command(command)
 
         self.__view.set_undo_button_sensitivity(len(self.__undo_stack) > 0)
         self.__view.set_redo_button_sensitivity(True)
@@ -427,6 +471,9 @@ class Controller(object):
         command.execute()
         command.set_is_unsaved_project(unsaved_changes_value)
         self.__undo_stack.append(command)
+        self.__undo_stack_size += command.get_size()
+        self.__fit_undo_stack()
+        self.__record_command(command)
 
         self.__view.set_redo_button_sensitivity(len(self.__redo_stack) > 0)
         self.__view.set_undo_button_sensitivity(True)
@@ -437,11 +484,24 @@ class Controller(object):
     def generate_output_file_use_case(self):
 
         # Run GenerateOutputFileDialog
-        (response_id, filename) = self.__view.run_generate_output_file_dialog(
-            self.__get_project_name())
+        (response_id, filename, image_format, compression, archive) = \
+            self.__view.run_generate_output_file_dialog(
+                self.__get_project_name())
 
         if response_id == DialogResponse.ACCEPT:
-            self.__model.generate_output_file(filename)
+
+            # Run GenerateOutputFileLoadingWindow
+            self.__view.run_generate_output_file_loading_window(
+                ntpath.basename(filename))
+
+            # Run thread to generate the output file
+            self.__generate_output_file_cancellation_token = CancellationToken()
+            self.__generate_output_file_thread = ThreadWithException(
+                                self.__generate_output_file,
+                                [filename, image_format, compression, archive,
+                                 self.__generate_output_file_cancellation_token])
+            self.__generate_output_file_thread.daemon = True
+            self.__generate_output_file_thread.start()
 
     ''' 'See comet parameters' use case. '''
     def see_comet_parameters_use_case(self, sample_id, comet_id):
@@ -516,8 +576,7 @@ class Controller(object):
             delimiter_point.get_contour_id(),
             delimiter_point.get_roommate(),
             coordinates,
-            builder,
-            self.get_sample_zoom_value(self.__active_sample_id)
+            builder
         )   
 
         command.set_data(data)
@@ -560,8 +619,7 @@ class Controller(object):
             delimiter_point.get_contour_id(),
             delimiter_point.get_roommate(),
             coordinates,
-            builder,
-            self.get_sample_zoom_value(self.__active_sample_id)
+            builder
         )         
         data.set_root_delimiter_point_id(root_delimiter_point.get_id())
         command.set_data(data)
@@ -592,8 +650,9 @@ class Controller(object):
 
         if src_delimiter_point.get_contour_id() == dst_delimiter_point.get_contour_id():
             # Previous state of the CanvasContour's DelimiterPoint dict
-            previous_canvas_contour = copy.deepcopy(builder.get_contour_dict()[
-                src_delimiter_point.get_contour_id()])
+            previous_canvas_contour = CanvasContourDictSnapshot({
+                src_delimiter_point.get_contour_id(): builder.get_contour_dict()[
+                    src_delimiter_point.get_contour_id()]})
 
         # Connect both points
         self.connect_delimiter_points(builder, src_delimiter_point, dst_delimiter_point)
@@ -626,8 +685,7 @@ class Controller(object):
                     commands.CloseCanvasContourCommandData(
                         self.__active_sample_id,
                         builder, 
-                        previous_canvas_contour,
-                        self.get_sample_zoom_value(self.__active_sample_id)
+                        previous_canvas_contour
                     )
                 )
                 
@@ -658,6 +716,12 @@ class Controller(object):
                 comet_id = self.on_comet_built(
                     closed_head_canvas_contour, closed_tail_canvas_contour)
                 
+                closed_tail_snapshot = None
+                if closed_tail_canvas_contour is not None:
+                    closed_tail_snapshot = CanvasContourDictSnapshot({
+                        closed_tail_canvas_contour.get_id():
+                            closed_tail_canvas_contour})
+
                 # Prepare the AddCometCommand
                 command = commands.AddCometCommand(self)
                 command.set_string(self.__i18n.get_strings().ADD_COMET_COMMAND_STRING)
@@ -666,9 +730,8 @@ class Controller(object):
                 command.set_data(commands.AddCometCommandData
                     (self.__active_sample_id, comet_id, 
                      self.__model.get_sample(self.__active_sample_id).get_analyzed(),
-                     copy.deepcopy(closed_tail_canvas_contour),
-                     previous_canvas_contour,
-                     self.get_sample_zoom_value(self.__active_sample_id)                       
+                     closed_tail_snapshot,
+                     previous_canvas_contour
                     )
                  )
                 self.__add_command(command)
@@ -704,18 +767,16 @@ class Controller(object):
     ''' Behaviour by default when a CanvasContour is closed. '''
     def on_closed_contour_created(self, contour, valid_points_id_list):
                 
-        valid_points = [p for p in contour.get_delimiter_point_dict().values()
-                        if p.get_id() in valid_points_id_list]
+        # Contour has now only the DelimiterPoints that close the contour.
+        # The rest of points are removed with their edges
+        for delimiter_point in list(contour.get_delimiter_point_dict().values()):
+            if delimiter_point.get_id() not in valid_points_id_list:
+                contour.remove_delimiter_point(delimiter_point)
+                if delimiter_point.get_grid() is not None:
+                    delimiter_point.get_grid().remove(delimiter_point)
+        CanvasModel.get_instance().invalidate_edges()
 
-        # Contour has now only the DelimiterPoints that close the contour
-        contour.set_delimiter_point_dict(
-            {p.get_id():p for p in valid_points})
-
-        # The rest of points are removed from the neighbors pointers
-        for delimiter_point in valid_points:
-            for neighbor in delimiter_point.get_neighbors():
-                if neighbor.get_id() not in valid_points_id_list:
-                    delimiter_point.get_neighbors().remove(neighbor)
+        valid_points = list(contour.get_delimiter_point_dict().values())
 
         CanvasModel.get_instance().set_root_delimiter_point(None)
         CanvasModel.get_instance().set_anchored_delimiter_point(None)
@@ -806,6 +867,7 @@ class Controller(object):
         # Clear all Head contour points
         del CanvasModel.get_instance().get_head_contour_dict()\
                 [head_contour.get_id()]
+        CanvasModel.get_instance().invalidate_indexes()
 
         CanvasModel.get_instance().set_root_delimiter_point(None)
 
@@ -824,8 +886,7 @@ class Controller(object):
         
         data = commands.MoveDelimiterPointsCommandData(
             self.__active_sample_id,
-            copy.deepcopy(delimiter_point_selection),
-            self.get_sample_zoom_value(self.__active_sample_id)
+            delimiter_point_selection.copy()
         )
                
         # If a Comet is being edited
@@ -842,13 +903,7 @@ class Controller(object):
         Moves the given DelimiterPoints from the DelimiterPointSelection 
         from its current position to their origin.
     '''    
-    def move_delimiter_points_to_origin(self, delimiter_point_selection, scale_ratio):
-
-        # Get scale_ratio to scale DelimiterPoints coordinates if needed
-        current_scale_ratio = self.get_sample_zoom_value(self.__active_sample_id)
-        scale_flag = (scale_ratio != current_scale_ratio)
-        if scale_flag:
-            new_scale_ratio = current_scale_ratio / scale_ratio
+    def move_delimiter_points_to_origin(self, delimiter_point_selection):
 
         for selected_delimiter_point in delimiter_point_selection.get_dict().\
                 values():
@@ -865,8 +920,6 @@ class Controller(object):
                        
             # Set origin as new coordinates
             origin = delimiter_point_selection.get_dict()[delimiter_point.get_id()].get_origin()
-            if scale_flag:
-                origin = utils.scale_point(origin, new_scale_ratio)          
             delimiter_point.set_coordinates(origin)
             
             # Set new origin 
@@ -914,8 +967,7 @@ class Controller(object):
 
         data = commands.DeleteDelimiterPointsCommandData(
             self.__active_sample_id,
-            deleted_delimiter_point_data_dict,
-            self.get_sample_zoom_value(self.__active_sample_id)
+            deleted_delimiter_point_data_dict
         )
         
         # Delete DelimiterPoints
@@ -999,7 +1051,9 @@ class Controller(object):
     def __remove_comet_tail_view(self, sample_id, comet_id):
             
         comet_view = self.__view.get_view_store().get_comet_view(sample_id, comet_id)
-        comet_view.set_scaled_tail_contour(None)
+        comet_view.set_tail_contour(None)
+        self.__view.get_view_store().get_store()[sample_id].update_comet(
+            comet_view)
         self.__view.get_main_window().get_canvas().update()
         self.__view.get_main_window().get_selection_window().update()
 
@@ -1067,85 +1121,140 @@ class Controller(object):
         self.__view.set_application_window_title(
             self.__build_application_window_title())     
 
-    ''' Stops the Analyze Samples thread. '''
+    ''' 
+        Stops the Analyze Samples thread. The thread stops by itself at the
+        next sample, stage or comet boundary.
+    '''
     def stop_analyze_samples_thread(self):
-        self.__thread.raise_exception()
+        self.__analysis_scheduler.clear()
+        self.__analyze_samples_cancellation_token.cancel()
 
-    ''' Analyze samples behaviour. '''
-    def __analyze_samples(self, samples_id_list, algorithm_settings):
+    ''' 
+        Stops the Generate Output File thread. The thread stops by itself at
+        the next sample boundary.
+    '''
+    def stop_generate_output_file_thread(self):
+        self.__generate_output_file_cancellation_token.cancel()
 
-        samples_comet_list_list = []
+    '''
+        Runs the AnalyzeSamplesLoadingWindow and the thread that analyzes
+        the queued samples.
+    '''
+    def __start_analyze_samples_thread(self):
 
-        i = 0
-        while (i < len(samples_id_list) and not self.__view.get_analyze_samples_loading_window().get_cancelled()):
+        self.__is_analyzing_samples = True
 
-            try:
-                sample = self.__model.get_sample(samples_id_list[i])
+        # Run AnalyzeSamplesLoadingWindow
+        self.__view.run_analyze_samples_loading_window()
 
-                # Update loading window
-                GLib.idle_add(self.__view.update_analyze_samples_loading_window,
-                    self.__i18n.get_strings().ANALYZING_SAMPLES_WINDOW_LABEL.format(
-                        i+1, len(samples_id_list)), sample.get_name())
+        # Run thread to analyze the Samples and update the
+        # AnalyzeSamplesLoadingWindow
+        self.__analyze_samples_cancellation_token = CancellationToken()
+        self.__thread = ThreadWithException(
+                            self.__analyze_samples,
+                            [self.__analyze_samples_cancellation_token])
+        self.__thread.daemon = True
+        self.__thread.start()
 
-                comet_list = self.__model.analyze_sample(sample, algorithm_settings)
-                samples_comet_list_list.append((samples_id_list[i], comet_list, True))
+    ''' 
+        Analyze samples behaviour. Queued samples are analyzed by priority,
+        the active one first, and each one is applied to the Model and the
+        View as soon as it is analyzed.
+    '''
+    def __analyze_samples(self, cancellation_token):
 
-                # Operation cannot be cancelled anymore
-                GLib.idle_add(self.__view.get_analyze_samples_loading_window().\
-                    get_cancel_button().hide)
-             
-            except Exception as e:
-                print("Error: {0}".format(e))
+        # Previous data of the analyzed samples, for the AnalyzeSamplesCommand
+        analyzed_samples_data = []
+
+        try:
+
+            i = 0
+            while not cancellation_token.is_cancelled():
+
+                job = self.__analysis_scheduler.pop(self.__active_sample_id)
+                if job is None:
+                    break
+
+                try:
+                    sample = self.__model.get_sample(job.get_sample_id())
+
+                    # Update loading window
+                    GLib.idle_add(self.__view.update_analyze_samples_loading_window,
+                        self.__i18n.get_strings().ANALYZING_SAMPLES_WINDOW_LABEL.format(
+                            i+1, i+1 + self.__analysis_scheduler.get_queue_depth()),
+                        sample.get_name())
+
+                    comet_list = self.__model.analyze_sample(sample,
+                                     job.get_algorithm_settings(), cancellation_token)
+
+                    # Update Model and View with the sample comets
+                    GLib.idle_add(self.__apply_analyzed_sample,
+                        job.get_sample_id(), comet_list, analyzed_samples_data)
 
-            i += 1    
+                # Cancelled while analyzing the sample
+                except CancellationError:
+                    break
+                 
+                except Exception as e:
+                    print("Error: {0}".format(e))
 
-        # Update if operation not cancelled by user
-        if not self.__view.get_analyze_samples_loading_window().get_cancelled():
+                i += 1    
 
-            # Update in Model
-            data = self.__model.update_samples_comet_list(samples_comet_list_list)
+        # The analyzed samples are kept if the operation is cancelled
+        finally:
+            GLib.idle_add(self.__finish_analyze_samples, analyzed_samples_data)
 
-            samples_comet_view_lists = []
-            for (sample_id, comet_list, _) in samples_comet_list_list:
-                samples_comet_view_lists.append(
-                    (sample_id, self.comet_list_to_comet_view_list(comet_list)))
+    ''' Generate output file behaviour. '''
+    def __generate_output_file(self, filename, image_format, compression,
+            archive, cancellation_token):
+
+        try:
+            self.__model.generate_output_file(filename, image_format,
+                compression, archive, cancellation_token)
+
+        # Cancelled while generating the output file
+        except CancellationError:
+            pass
+
+        except Exception as e:
+            print("Error: {0}".format(e))
+
+        finally:
+            GLib.idle_add(self.__view.close_generate_output_file_loading_window)
+
+    ''' 
+        Sets the comets of an analyzed sample, keeping its previous data in
+        given list. Samples removed from the Model are skipped.
+    '''
+    def __apply_analyzed_sample(self, sample_id, comet_list,
+            analyzed_samples_data):
+
+        if sample_id not in self.__model.get_store():
+            return
 
-            # Update in View
-            GLib.idle_add(self.replace_samples_comet_view_list,
-                samples_comet_view_lists)
+        analyzed_samples_data += self.update_samples_comet_list(
+            [(sample_id, comet_list, True)])
+
+    ''' 
+        Adds a single AnalyzeSamplesCommand for the analyzed samples and
+        closes the AnalyzeSamplesLoadingWindow.
+    '''
+    def __finish_analyze_samples(self, analyzed_samples_data):
+
+        if len(analyzed_samples_data) > 0:
 
             # Add AnalyzeSamples command to the stack
             command = commands.AnalyzeSamplesCommand(self)
             command.set_string(self.__i18n.get_strings().ANALYZE_SAMPLES_COMMAND_STRING)
-            command.set_data(data)
+            command.set_data(analyzed_samples_data)
             self.__add_command(command)
 
-        GLib.idle_add(self.__view.close_analyze_samples_loading_window)
-            
-    ''' Sets the given comet list for the sample with given ID. '''
-    def replace_samples_comet_view_list(self, samples_comet_view_lists):
+        self.__view.close_analyze_samples_loading_window()
+        self.__is_analyzing_samples = False
 
-        for (sample_id, comet_view_list) in samples_comet_view_lists:    
-
-            sample_parameters = self.__view.get_view_store().get_store()[sample_id]
-            # Set new list
-            sample_parameters.set_comet_view_list(comet_view_list)
-            # Set number of comets in sample
-            self.__view.get_main_window().get_samples_view().\
-                set_sample_number_of_comets(sample_id, len(comet_view_list), 
-                    self.__model.get_sample(sample_id).get_analyzed()
-            )       
-                        
-        
-        # Scale CometView objects to current Sample scale ratio
-        scale_ratio = self.get_sample_zoom_value(
-                        self.__active_sample_id)
-        self.scale_sample_comet_contours(
-            self.__active_sample_id, scale_ratio) 
-
-        # Update
-        self.__view.get_main_window().get_canvas().update()
-        self.__view.get_main_window().get_selection_window().update()
+        # Jobs submitted while the thread was exiting
+        if self.__analysis_scheduler.get_queue_depth() > 0:
+            self.__start_analyze_samples_thread()
 
     ''' 
         Sets the comet contours with given ID that belongs to the sample with
@@ -1181,23 +1290,25 @@ class Controller(object):
         
         # Update View
         sample_parameters = self.__view.get_view_store().get_store()[sample_id]
-        # Flip Pixbufs
-        sample_parameters.set_original_pixbuf(
-            sample_parameters.get_original_pixbuf().flip(True))
-        sample_parameters.set_displayed_pixbuf(
-            sample_parameters.get_displayed_pixbuf().flip(True))
+        # Set flipped surface
+        surface = utils.image_to_surface(
+                      self.__model.get_sample(sample_id).get_image())
+        sample_parameters.set_surface(surface)
+        self.__view.get_main_window().get_zoom_tool().get_tile_cache().\
+            invalidate(sample_id)
             
-        width = sample_parameters.get_displayed_pixbuf().get_width()
-        # Flip ScaledContours
+        width = surface.get_width()
+        # Flip CometView contours
         for comet_view in sample_parameters.get_comet_view_list():
 
-            if comet_view.get_scaled_tail_contour() is not None:
-                comet_view.set_scaled_tail_contour(
+            if comet_view.get_tail_contour() is not None:
+                comet_view.set_tail_contour(
                     utils.flip_contour(
-                        comet_view.get_scaled_tail_contour(), width))                
-            comet_view.set_scaled_head_contour(
+                        comet_view.get_tail_contour(), width))                
+            comet_view.set_head_contour(
                 utils.flip_contour(
-                    comet_view.get_scaled_head_contour(), width))
+                    comet_view.get_head_contour(), width))
+            sample_parameters.update_comet(comet_view)
         
         # Flip DelimiterPoints
         for (_, contour) in self.__model.get_sample(sample_id).get_tail_contour_dict().items():
@@ -1209,10 +1320,6 @@ class Controller(object):
                 coordinates = delimiter_point.get_coordinates()
                 delimiter_point.set_coordinates((width-1-coordinates[0], coordinates[1]))
 
-        # Delete Sample's cache of zoomed images
-        if sample_id in self.__view.get_main_window().get_zoom_tool().get_cache().keys(): 
-            del self.__view.get_main_window().get_zoom_tool().get_cache()[sample_id]
-
         # Update Canvas
         self.__view.get_main_window().get_canvas().update()
 
@@ -1225,21 +1332,11 @@ class Controller(object):
         # Update View
         sample_parameters = self.__view.get_view_store().get_store()[sample_id]
         image = self.__model.get_sample(sample_id).get_image()       
-        scale_ratio = self.get_sample_zoom_value(sample_id)
-
-        # Set inverted pixbufs
-        pixbuf = utils.image_to_pixbuf(image)          
-        sample_parameters.set_original_pixbuf(pixbuf)
-        scaled_pixbuf = pixbuf.scale_simple(
-                            pixbuf.get_width() * scale_ratio, 
-                            pixbuf.get_height() * scale_ratio,
-                            2
-                        )
-        sample_parameters.set_displayed_pixbuf(scaled_pixbuf)
-
-        # Delete Sample's cache of zoomed images
-        if sample_id in self.__view.get_main_window().get_zoom_tool().get_cache().keys(): 
-            del self.__view.get_main_window().get_zoom_tool().get_cache()[sample_id]
+
+        # Set inverted surface
+        sample_parameters.set_surface(utils.image_to_surface(image))
+        self.__view.get_main_window().get_zoom_tool().get_tile_cache().\
+            invalidate(sample_id)
 
         # Update Canvas
         self.__view.get_main_window().get_canvas().update()
@@ -1292,6 +1389,10 @@ class Controller(object):
         sample_copy = self.__model.delete_sample(sample_id)
         # Delete from View
         (sample_parameters, pos) = self.__view.delete_sample(sample_id)
+        self.__view.get_main_window().get_zoom_tool().get_tile_cache().\
+            invalidate(sample_id)
+        # Commands on the stacks keep the snapshots they were taken from
+        self.__contour_snapshots.pop(sample_id, None)
         
         if len(self.__model.get_store()) == 0:     
             self.__active_sample_id = None
@@ -1329,17 +1430,8 @@ class Controller(object):
     ''' 'add_comet' View behaviour. '''        
     def __add_comet_view(self, sample_id, comet_id, tail_contour, head_contour, pos):        
 
-        scale_value = self.get_sample_zoom_value(sample_id)
-        
-        # Scale tail contour
-        scaled_tail_contour = None
-        if tail_contour is not None:           
-            scaled_tail_contour = utils.scale_contour(tail_contour, scale_value)
-        # Scale head contour
-        scaled_head_contour = utils.scale_contour(head_contour, scale_value)
-
         # Create and add CometView
-        comet_view = CometView(comet_id, scaled_tail_contour, scaled_head_contour)
+        comet_view = CometView(comet_id, tail_contour, head_contour)
         sample_parameters = self.__view.get_view_store().get_store()[sample_id]
         sample_parameters.add_comet(comet_view, pos)
 
@@ -1397,12 +1489,10 @@ class Controller(object):
     ''' 'add_comet_tail' View behaviour. '''       
     def __add_comet_tail_view(self, sample_id, comet_id, tail_contour):        
 
-        scale_value = self.get_sample_zoom_value(sample_id)
-
         comet_view = self.__view.get_view_store().get_comet_view(sample_id, comet_id)
-        comet_view.set_scaled_tail_contour(
-            utils.scale_contour(tail_contour, scale_value)
-        )
+        comet_view.set_tail_contour(tail_contour)
+        self.__view.get_view_store().get_store()[sample_id].update_comet(
+            comet_view)
                 
         self.__view.get_main_window().get_canvas().update()
         self.__view.get_main_window().get_selection_window().update()
@@ -1441,10 +1531,6 @@ class Controller(object):
                     self.__model.get_sample(sample_id).get_analyzed()
             )       
                         
-        # Scale Comet contours according to Sample scale value activated
-        scale_value = self.get_sample_zoom_value(self.__active_sample_id)
-        self.scale_sample_comet_contours(self.__active_sample_id, scale_value)
-        
         # Update View
         self.__view.get_main_window().get_canvas().update()
         self.__view.get_main_window().get_selection_window().update()
@@ -1458,6 +1544,8 @@ class Controller(object):
 
         self.__undo_stack.clear()
         self.__redo_stack.clear()
+        self.__undo_stack_size = 0
+        self.__contour_snapshots.clear()
         self.__view.set_undo_button_sensitivity(False)
         self.__view.set_redo_button_sensitivity(False)
         self.__update_undo_and_redo_buttons_tooltips()
@@ -1467,6 +1555,8 @@ class Controller(object):
 
         # Add command        
         self.__undo_stack.append(command)
+        self.__undo_stack_size += command.get_size()
+        self.__fit_undo_stack()
         # Reset redo stack
         self.__redo_stack.clear()
         # Set buttons sensitivity
@@ -1476,7 +1566,58 @@ class Controller(object):
         self.__update_undo_and_redo_buttons_tooltips()
         # Update -> there are unsaved changes
         self.__update(True)
+        # Journal the changes once the pending view updates are done
+        GLib.idle_add(self.__record_command, command)
+
+    ''' Drops the oldest commands while the undo memory budget is exceeded. '''
+    def __fit_undo_stack(self):
+
+        while (self.__undo_stack_size > self.__undo_memory_budget and
+               len(self.__undo_stack) > 1):
+            self.__undo_stack_size -= self.__undo_stack.pop(0).get_size()
+
+    '''
+        Journals the samples changed by given command. The active sample is
+        always checked, since most commands act on it. Samples whose record
+        did not change are not written.
+    '''
+    def __record_command(self, command):
+
+        sample_ids = set(command.get_sample_ids())
+        if self.__active_sample_id is not None:
+            sample_ids.add(self.__active_sample_id)
+        self.__model.record_changes(sample_ids)
+        return False
+
+    '''
+        Flushes the project journal and, when it grows too big, compacts it by
+        saving the project. Called periodically.
+    '''
+    def __autosave(self):
+
+        if self.__is_unsaved_project and not self.__is_new_project:
+            if self.__model.journal_needs_compaction():
+                self.__save_project()
+            else:
+                self.__model.sync_journal()
+        return True
         
+    '''
+        Returns the snapshots of the CanvasModel contours dicts, taken as
+        differences from the ones taken when the edition of the comet being
+        edited on sample with given ID started.
+    '''
+    def __take_contour_snapshots(self, sample_id):
+
+        (tail_base, head_base) = self.__contour_snapshots.get(
+                                     sample_id, (None, None))
+        return (
+            CanvasContourDictSnapshot(
+                CanvasModel.get_instance().get_tail_contour_dict(), tail_base),
+            CanvasContourDictSnapshot(
+                CanvasModel.get_instance().get_head_contour_dict(), head_base)
+        )
+
     ''' Updates Undo and Redo Buttons tooltips. '''    
     def __update_undo_and_redo_buttons_tooltips(self):
         self.__view.update_undo_and_redo_buttons_tooltips()
@@ -1522,34 +1663,29 @@ class Controller(object):
         command = commands.AddSamplesCommand(self)
         command.set_string(self.__i18n.get_strings().ADD_SAMPLES_COMMAND_STRING)
  
-        # Add samples
+        # Add samples. Images are decoded and their surfaces built on a pool
+        # of workers, and the samples are added in the given order
         added_samples_ids = []
-        i = 0
-        while i < len(filepaths):
-
-            # Get filename from full path
-            filename = ntpath.basename(filepaths[i])
-
-            # Update LoadSamplesWindow
-            GLib.idle_add(self.__view.update_load_samples_window, filename,
-                self.__i18n.get_strings().LOAD_SAMPLES_WINDOW_LABEL.format(i+1, len(filepaths)),
-                i+1, len(filepaths))
-
-            sample_name = get_valid_name(filename, self.__model.get_store())
-            
-            try:
-            
-                sample_image = utils.read_image(filepaths[i])[1]                    
-                sample = Sample(sample_name, sample_image)
-                sample_parameters = SampleParameters(utils.image_to_pixbuf(sample_image))
-                GLib.idle_add(self.add_sample, sample, sample_parameters)
-                added_samples_ids.append(sample.get_id())
-                
-            except Exception as err:
-                print(err)
-                print("ERROR: image " + filename + " couldn't be added.")
-                
-            i += 1
+        with ThreadPoolExecutor(
+                max_workers=self.__N_LOADING_WORKERS) as executor:
+
+            pending = deque()
+            i = 0
+            for filepath in filepaths:
+
+                pending.append(
+                    (filepath, executor.submit(load_sample_image, filepath)))
+
+                # Bound the number of decoded images held in memory
+                if len(pending) >= self.__N_LOADING_WORKERS * 2:
+                    i += 1
+                    self.__add_new_sample(*pending.popleft(), i,
+                        len(filepaths), added_samples_ids)
+
+            while len(pending) > 0:
+                i += 1
+                self.__add_new_sample(*pending.popleft(), i,
+                    len(filepaths), added_samples_ids)
             
         if len(added_samples_ids) > 0:    
         
@@ -1560,6 +1696,33 @@ class Controller(object):
         # Close LoadSamplesWindow
         GLib.idle_add(self.__view.close_load_samples_window)
 
+    '''
+        Adds the sample loaded from given filepath by given future, the n-th
+        one out of given total. Its ID is appended to given list.
+    '''
+    def __add_new_sample(self, filepath, future, n, total, added_samples_ids):
+
+        # Get filename from full path
+        filename = ntpath.basename(filepath)
+
+        # Update LoadSamplesWindow
+        GLib.idle_add(self.__view.update_load_samples_window, filename,
+            self.__i18n.get_strings().LOAD_SAMPLES_WINDOW_LABEL.format(n, total),
+            n, total)
+
+        sample_name = get_valid_name(filename, self.__model.get_store())
+
+        try:
+
+            (sample_image, surface) = future.result()
+            sample = Sample(sample_name, sample_image)
+            GLib.idle_add(self.add_sample, sample, SampleParameters(surface))
+            added_samples_ids.append(sample.get_id())
+
+        except Exception as err:
+            print(err)
+            print("ERROR: image " + filename + " couldn't be added.")
+
     ''' Behaviour on the command stacks when project is saved. '''
     def __command_stacks_on_project_saved(self):
 
@@ -1611,17 +1774,11 @@ class Controller(object):
 
             else:
                 
-                # The scale ratio
-                scale_ratio = 1. / self.get_sample_zoom_value(self.__active_sample_id)
-                
                 # Build tail contour
                 tail_contour = None
                 for (_, canvas_contour) in tail_contour_dict.items():
 
-                    # Scale the DelimiterPoint list to ratio 1. to save in the Model as about_use_case
                     # OpenCV contour
-                    utils.scale_delimiter_point_list(
-                        canvas_contour.get_delimiter_point_dict().values(), scale_ratio)
                     tail_contour = utils.list_to_contour(
                         [p.get_coordinates() for p in canvas_contour.get_delimiter_point_dict().values()]
                     )
@@ -1630,10 +1787,7 @@ class Controller(object):
                 head_contour = None
                 for (_, canvas_contour) in head_contour_dict.items():
 
-                    # Scale the DelimiterPoint list to ratio 1. to save in the Model as about_use_case
                     # OpenCV contour
-                    utils.scale_delimiter_point_list(
-                        canvas_contour.get_delimiter_point_dict().values(), scale_ratio)
                     head_contour = utils.list_to_contour(
                         [p.get_coordinates() for p in canvas_contour.get_delimiter_point_dict().values()]
                     )    
@@ -1657,14 +1811,9 @@ class Controller(object):
         (old_tail_contour, old_head_contour) = self.set_comet_contours(
             sample_id, comet_id, tail_contour, head_contour)
            
-        scale_ratio = self.get_sample_zoom_value(self.__active_sample_id)
         # Update contours in View
-        scaled_tail_contour = None
-        if tail_contour is not None:
-            scaled_tail_contour = utils.scale_contour(tail_contour, scale_ratio)
-        scaled_head_contour = utils.scale_contour(head_contour, scale_ratio)
-        self.__view.get_view_store().set_comet_scaled_contours(
-            sample_id, comet_id, scaled_tail_contour, scaled_head_contour)
+        self.__view.get_view_store().set_comet_contours(
+            sample_id, comet_id, tail_contour, head_contour)
 
         return (comet_id, old_tail_contour, old_head_contour)
 
@@ -1706,7 +1855,12 @@ class Controller(object):
 
     ''' Sets sample's zoom active index with given ID. '''
     def set_sample_zoom_index(self, sample_id, zoom_index):
+
         self.__model.get_sample(sample_id).set_zoom_index(zoom_index)
+        # Mouse coordinates are mapped back with the active sample zoom
+        if sample_id == self.__active_sample_id:
+            CanvasModel.get_instance().set_scale_ratio(
+                self.get_sample_zoom_value(sample_id))
        
     ''' 
         Returns the AlgorithmSettings as a AlgorithmSettingsDto to the View.
@@ -1746,95 +1900,46 @@ class Controller(object):
             sample_id = self.__view.get_main_window().get_samples_view().get_sample_id(
                 self.__view.get_main_window().get_samples_view().get_selected_sample_row())
 
+        # Release the surface of the previous active sample
+        if (self.__active_sample_id is not None and
+            self.__active_sample_id != sample_id and
+            self.__active_sample_id in self.__view.get_view_store().get_store()):
+            self.__release_sample_surface(self.__active_sample_id)
+
+        # Build the surface of the new active sample
+        self.__load_sample_surface(sample_id)
+
         # Change the active sample 
         self.__active_sample_id = sample_id
+        # Update CanvasModel zoom
+        CanvasModel.get_instance().set_scale_ratio(
+            self.get_sample_zoom_value(sample_id))
         # Update CanvasModel contour dicts
         self.update_canvas_model_contours_dicts()
         # View behaviour on sample activated
         self.__view.on_sample_activated(sample_id)
 
     ''' 
-        Scales the active Sample Comet contours and CanvasContours 
-        DelimiterPoints.
+        Builds the image surface of the sample with given ID if it is not
+        built. The image is decoded on demand if needed.
     '''
-    def scale_active_sample_comets(self, requested_scale_value):
-        self.scale_sample_comets(self.__active_sample_id, requested_scale_value)
-        
-    ''' Scales the Comet contours and CanvasContours DelimiterPoints of Sample
-        with given ID.
-    '''    
-    def scale_sample_comets(self, sample_id, requested_scale_ratio):    
-    
-        ''' TODO: escalar los cometas del modelo y sustituirlos en la Vista. '''
-    
-        # Scale Comets
-        self.scale_sample_comet_contours(sample_id, requested_scale_ratio)
-        
-        # Scale 'Free Editing' and 'Comet being edited' CanvasContours
-        self.scale_sample_canvas_contours(sample_id, requested_scale_ratio)
-       
+    def __load_sample_surface(self, sample_id):
+
+        sample_parameters = self.__view.get_view_store().get_store()[sample_id]
+        if sample_parameters.get_surface() is not None:
+            return
+
+        sample_parameters.set_surface(utils.image_to_surface(
+            self.__model.get_sample(sample_id).get_image()))
+
     ''' 
-        Scales all Comet contours of Sample with given ID and creates
-        their corresponding CometView objects.
+        Releases the image surface of the sample with given ID, so only the
+        ImageCache bounds the memory used by inactive samples.
     '''
-    def scale_sample_comet_contours(self, sample_id, scale_ratio):
-          
-        sample = self.__model.get_sample(sample_id)
-
-        comet_view_list = self.comet_list_to_comet_view_list(
-                              sample.get_comet_list())
-        
-        # Scale Comets contours
-        for comet_view in comet_view_list:
+    def __release_sample_surface(self, sample_id):
 
-            # Scale the Comet tail contour
-            if comet_view.get_scaled_tail_contour() is not None:
-                tail_contour = comet_view.get_scaled_tail_contour()
-                comet_view.set_scaled_tail_contour(
-                    utils.scale_contour(
-                        tail_contour,
-                        scale_ratio
-                    )
-                )
-                
-            # Scale the head contour
-            head_contour = comet_view.get_scaled_head_contour()
-            comet_view.set_scaled_head_contour(              
-                utils.scale_contour(
-                    head_contour,
-                    scale_ratio
-                )
-            )
-            
-        # Set new CometView list
-        self.__view.get_view_store().get_store()[sample_id].set_comet_view_list(
-            comet_view_list)
-        
-    ''' Scales all DelimiterPoints of Sample with given ID. '''
-    def scale_sample_canvas_contours(self, sample_id, requested_scale_ratio):
-
-        current_scale_ratio = self.get_sample_zoom_value(sample_id)
-        final_scale_ratio = requested_scale_ratio / current_scale_ratio
-        sample = self.__model.get_sample(sample_id)
-                                
-        # Scale 'Free editing' CanvasContours 
-        utils.scale_canvas_contour_dict(
-            sample.get_tail_contour_dict(),
-            final_scale_ratio
-        )
-        utils.scale_canvas_contour_dict(
-            sample.get_head_contour_dict(),
-            final_scale_ratio
-        )
-        # Scale 'Comet being edited' CanvasContours
-        utils.scale_canvas_contour_dict(
-            sample.get_comet_being_edited_tail_contour_dict(),
-            final_scale_ratio
-        )
-        utils.scale_canvas_contour_dict(
-            sample.get_comet_being_edited_head_contour_dict(),
-            final_scale_ratio
-        )
+        sample_parameters = self.__view.get_view_store().get_store()[sample_id]
+        sample_parameters.set_surface(None)
 
 
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
@@ -1916,28 +2021,19 @@ class Controller(object):
     ''' Behaviour when the user builds a valid comet. '''
     def on_add_comet(self, tail_contour, head_contour):
 
-        # Contours are parsed to ratio 1.
-        scale_ratio = 1. / self.get_sample_zoom_value(self.__active_sample_id)
-
         # [1] Build Tail contour
         if tail_contour is not None:
 
             # Parse to opencv contour
             coordinates_list = [point.get_coordinates() for point in
                                 tail_contour.get_delimiter_point_dict().values()]
-            tail_contour = utils.scale_contour(
-                               utils.list_to_contour(coordinates_list),
-                               scale_ratio
-                           )
+            tail_contour = utils.list_to_contour(coordinates_list)
 
         # [2] Build Head contour                
         # Parse to opencv contour
         coordinates_list = [point.get_coordinates() for point in
                             head_contour.get_delimiter_point_dict().values()]           
-        head_contour = utils.scale_contour(
-                           utils.list_to_contour(coordinates_list),
-                           scale_ratio
-                       )
+        head_contour = utils.list_to_contour(coordinates_list)
                     
         
         if tail_contour is not None:
@@ -1963,7 +2059,7 @@ class Controller(object):
         # Select comet
         self.__model.select_comet(sample_id, comet_id)
         # Update View
-        self.__view.get_main_window().get_canvas().update()
+        self.__view.get_main_window().get_canvas().update_overlay()
         self.__view.get_main_window().get_selection_window().update()
         
     ''' 
@@ -1995,16 +2091,6 @@ class Controller(object):
             # Load the OpenCV contours into CanvasModel        
             CanvasModel.get_instance().prepare_comet_for_editing(
                 comet.get_tail_contour(), comet.get_head_contour())
-                  
-            # Scale the CanvasContours
-            utils.scale_canvas_contour_dict(
-                CanvasModel.get_instance().get_tail_contour_dict(),
-                self.get_sample_zoom_value(sample_id)
-            )
-            utils.scale_canvas_contour_dict(
-                CanvasModel.get_instance().get_head_contour_dict(),
-                self.get_sample_zoom_value(sample_id)
-            )    
          
         # If CanvasContours dictionaries are provided, use them directly
         else:
@@ -2115,6 +2201,10 @@ class Controller(object):
     ''' On Canvas draw callback method. '''
     def draw(self, cairo_context):
         self.__canvas_state.draw(cairo_context)
+
+    ''' Returns the image boxes drawn by the Canvas state overlay. '''
+    def get_canvas_overlay_area(self):
+        return self.__canvas_state.get_overlay_area()
         
         
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
@@ -2213,6 +2303,9 @@ class Controller(object):
         
     def set_canvas_state(self, canvas_state):
         self.__canvas_state = canvas_state
+
+    def get_undo_memory_budget(self):
+        return self.__undo_memory_budget
         
         
 
@@ -2220,6 +2313,12 @@ class Controller(object):
 # ~                         Module Auxiliar Methods                         ~ # 
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
 
+''' Returns the image read from given filepath and its surface. '''
+def load_sample_image(filepath):
+
+    sample_image = utils.read_image(filepath)[1]
+    return (sample_image, utils.image_to_surface(sample_image))
+
 ''' If name already exists in the Model, another name is created. '''
 def get_valid_name(text, store):
 
@@ -0,0 +1,102 @@
+# -*- encoding: utf-8 -*-
+
+'''
+    The test_analysis_scheduler module. Tests the sample analysis queue.
+'''
+
+# General imports
+import unittest
+
+# Custom imports
+from sample.controller.analysis_scheduler import AnalysisScheduler
+
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                                                             #
+# 	AnalysisSchedulerTest                                                     #
+#                                                                             #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+class AnalysisSchedulerTest(unittest.TestCase):
+
+    ''' Creates an empty AnalysisScheduler. '''
+    def setUp(self):
+        self.scheduler = AnalysisScheduler()
+
+    ''' Pops every pending job and returns their sample IDs. '''
+    def pop_all(self, preferred_sample_id=None):
+
+        sample_ids = []
+        job = self.scheduler.pop(preferred_sample_id)
+        while job is not None:
+            sample_ids.append(job.get_sample_id())
+            job = self.scheduler.pop(preferred_sample_id)
+        return sample_ids
+
+    ''' Jobs with the same priority run in submission order. '''
+    def test_submission_order(self):
+
+        for sample_id in (3, 1, 2):
+            self.scheduler.submit(sample_id, None,
+                                  AnalysisScheduler.BATCH_PRIORITY)
+
+        self.assertEqual(self.scheduler.get_queue_depth(), 3)
+        self.assertEqual(self.pop_all(), [3, 1, 2])
+        self.assertEqual(self.scheduler.get_queue_depth(), 0)
+        self.assertIsNone(self.scheduler.pop())
+
+    ''' Interactive jobs run before the batch ones. '''
+    def test_priority(self):
+
+        self.scheduler.submit(1, None, AnalysisScheduler.BATCH_PRIORITY)
+        self.scheduler.submit(2, None, AnalysisScheduler.BATCH_PRIORITY)
+        self.scheduler.submit(3, None, AnalysisScheduler.INTERACTIVE_PRIORITY)
+
+        self.assertEqual(self.pop_all(), [3, 1, 2])
+
+    '''
+        A sample submitted again keeps a single job, with the latest
+        settings and the most urgent priority.
+    '''
+    def test_dedupe(self):
+
+        self.scheduler.submit(1, None, AnalysisScheduler.BATCH_PRIORITY)
+        self.scheduler.submit(2, "old", AnalysisScheduler.BATCH_PRIORITY)
+        self.scheduler.submit(2, "new", AnalysisScheduler.INTERACTIVE_PRIORITY)
+        self.scheduler.submit(2, "last", AnalysisScheduler.BATCH_PRIORITY)
+
+        self.assertEqual(self.scheduler.get_queue_depth(), 2)
+        job = self.scheduler.pop()
+        self.assertEqual(job.get_sample_id(), 2)
+        self.assertEqual(job.get_algorithm_settings(), "last")
+        self.assertEqual(job.get_priority(),
+                         AnalysisScheduler.INTERACTIVE_PRIORITY)
+        # The stale entry of the sample is skipped
+        self.assertEqual(self.pop_all(), [1])
+
+    ''' The preferred sample job runs before any other. '''
+    def test_preferred_sample(self):
+
+        self.scheduler.submit(1, None, AnalysisScheduler.INTERACTIVE_PRIORITY)
+        self.scheduler.submit(2, None, AnalysisScheduler.BATCH_PRIORITY)
+        self.scheduler.submit(3, None, AnalysisScheduler.BATCH_PRIORITY)
+
+        self.assertEqual(self.scheduler.pop(3).get_sample_id(), 3)
+        # A preferred sample that is not pending is ignored
+        self.assertEqual(self.pop_all(3), [1, 2])
+
+    ''' Clearing discards every pending job. '''
+    def test_clear(self):
+
+        self.scheduler.submit(1, None, AnalysisScheduler.BATCH_PRIORITY)
+        self.scheduler.submit(2, None, AnalysisScheduler.INTERACTIVE_PRIORITY)
+        self.scheduler.clear()
+
+        self.assertEqual(self.scheduler.get_queue_depth(), 0)
+        self.assertIsNone(self.scheduler.pop(1))
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -193,6 +193,11 @@ class Strings(object):
         self.DIALOG_ADD_SAMPLES_TITLE = _("Añadir muestras")
         self.DIALOG_SAVE_PROJECT_AS_TITLE = _("Guardar proyecto")
         self.DIALOG_SAVE_BEFORE_ACTION_TITLE = _("Advertencia - FreeComet")
+        self.OUTPUT_OPTIONS_FORMAT_LABEL = _("Formato de imagen")
+        self.OUTPUT_OPTIONS_ORIGINAL_FORMAT_LABEL = _("Original")
+        self.OUTPUT_OPTIONS_COMPRESSION_LABEL = _("Compresión")
+        self.OUTPUT_OPTIONS_ARCHIVE_LABEL = _("Guardar imágenes en un archivo zip")
+        self.GENERATING_OUTPUT_FILE_WINDOW_LABEL = _("Generando estadísticas...")
         
         # Commands
         self.ADD_SAMPLES_COMMAND_STRING = _("'Añadir Imágenes'")
@@ -46,9 +46,21 @@ class Algorithm(metaclass=Singleton):
         self.original_image = None               # The original image
         self.image_name = None                   # The image name
 
+        # CancellationToken checked between stages and comets, if any
+        self.cancellation_token = None
+
     def execute(self, *args):
         raise NotImplementedError("Method must be implemented.")
 
+    ''' 
+        Raises a CancellationError if the execution has been cancelled.
+        Only called where stopping leaves no partial result behind.
+    '''
+    def check_cancellation(self):
+
+        if self.cancellation_token is not None:
+            self.cancellation_token.check()
+
 
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
 #                             Debugging Methods                               #
@@ -174,12 +186,16 @@ class FreeComet(Algorithm):
        
         # [1] IMAGE PREPROCESSING
         smoothed_gs_image = self.__preprocessing(gs_image)
+        self.check_cancellation()
         # [2] COMET FINDING
         comets_binary_mask = self.__comet_finding(smoothed_gs_image)
+        self.check_cancellation()
         # [3] HEAD SEGMENTATION
         comets_contours_list = self.__head_segmentation(comets_binary_mask, gs_image)
+        self.check_cancellation()
         # [4] TAIL SEGMENTATION
         comets_contours_list = self.__tail_segmentation(comets_contours_list, gs_image)
+        self.check_cancellation()
         # [5] COMET FILTERING
         comets_contours_list = self.__comet_filtering(comets_contours_list, gs_image)
                
@@ -208,6 +224,7 @@ class FreeComet(Algorithm):
         new_comet_contours = []
         for comet_contour in comet_contours:
 
+            self.check_cancellation()
             if self.__is_valid_comet(comet_contour, gs_image):
                 new_comet_contours.append(comet_contour)
 
@@ -404,6 +421,8 @@ class FreeComet(Algorithm):
         # Each comet is processed and its head location searched
         for comet_contour in utils.find_contours(binary_image):
 
+            self.check_cancellation()
+
             # [1.] PREAMBLE
 
             # Expanded Comet Mask
@@ -467,6 +486,7 @@ class FreeComet(Algorithm):
         # Potential heads are segmented
         i = 0
         while i < len(comet_list):
+            self.check_cancellation()
             comet_list[i] = self.__segment_head(comet_list[i], binary_image, gs_image, processed_image)
             i += 1
 
@@ -678,6 +698,8 @@ class FreeComet(Algorithm):
 
         i = 0
         while i < len(comet_list):
+
+            self.check_cancellation()
                
             # [1] Tail Segmentation        
             comet_list[i] = self.__segment_tail(comet_list[i], gs_image)
@@ -854,6 +876,7 @@ class OpenComet(Algorithm):
 
         # [1] Comet Finding
         comet_contours = self.__comet_finding(gs_image)
+        self.check_cancellation()
 
         if self.DEBUG:
             debug_image = numpy.copy(self.original_image)
@@ -971,6 +994,7 @@ class OpenComet(Algorithm):
         filtered_contours = []       
         for contour in contours:
 
+            self.check_cancellation()
             rect = utils.create_enclosing_rectangle(contour)
             comet_mask = utils.create_contour_mask(contour, image, rect)
             if self.__validate_comet(image, comet_mask, contour):
@@ -1076,6 +1100,8 @@ class OpenComet(Algorithm):
         # For each comet its head is segmented
         for comet_contour in comet_contours:
 
+            self.check_cancellation()
+
             # Initial status
             head_is_valid = True
 
@@ -0,0 +1,62 @@
+# -*- encoding: utf-8 -*-
+
+'''
+    The cancellation module.
+'''
+
+# General imports
+import threading
+
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                                                             #
+# 	CancellationError                                                         #
+#                                                                             #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+class CancellationError(Exception):
+
+    '''
+        The CancellationError class. Extends from Exception. Raised by
+        CancellationToken.check() when the operation has been cancelled.
+    '''
+
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                                                             #
+# 	CancellationToken                                                         #
+#                                                                             #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+class CancellationToken(object):
+
+    '''
+        The CancellationToken class. Flag shared between the thread that
+        requests a cancellation and the one running a long operation, which
+        checks it at points where stopping leaves no half-updated data.
+    '''
+
+    ''' Initialization method. '''
+    def __init__(self):
+        self.__event = threading.Event()
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                  Methods                                    #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+    ''' Requests the cancellation of the operation. '''
+    def cancel(self):
+        self.__event.set()
+
+    ''' Returns whether the cancellation has been requested or not. '''
+    def is_cancelled(self):
+        return self.__event.is_set()
+
+    ''' Raises a CancellationError if the cancellation has been requested. '''
+    def check(self):
+
+        if self.__event.is_set():
+            raise CancellationError()
@@ -7,10 +7,11 @@
 # General imports
 import itertools
 import cairo
-import copy
+import numpy
 
 # Custom imports
 from sample.singleton import Singleton
+import sample.config as config
 import sample.model.utils as utils
 
 
@@ -51,6 +52,10 @@ class CanvasModel(metaclass=Singleton):
         
         self.__tail_color = Colors.RED
         self.__head_color = Colors.GREEN
+
+        # The active sample zoom. DelimiterPoints are kept in image
+        # coordinates and scaled by the Canvas when drawn.
+        self.__scale_ratio = 1.
         
         # CanvasSelectionState parameters
         self.__selection_color = Colors.YELLOW
@@ -77,6 +82,26 @@ class CanvasModel(metaclass=Singleton):
         
         # BuildingContourState parameters
         self.__root_delimiter_point = None
+
+        # Contours loaded for editing are simplified with this tolerance.
+        # The exact ones are kept by the Comet until a point is modified.
+        self.__simplification_tolerance = \
+            config.CONTOUR_SIMPLIFICATION_TOLERANCE
+
+        # DelimiterPoints spatial indexes, built on demand
+        self.__tail_point_grid = None
+        self.__head_point_grid = None
+        # Edges between neighbor DelimiterPoints, as (ContourArray, rows,
+        # neighbor rows) tuples, the DelimiterPoint pairs and their segments,
+        # built on demand
+        self.__edge_rows = None
+        self.__edges = None
+        self.__edge_segments = None
+        # Every DelimiterPoint and its (N, 2) coordinate array, in the same
+        # order, built on demand
+        self.__points = None
+        self.__point_rows = None
+        self.__point_coordinates = None
         
         # So we don't save anything if the comet contours remained the same.
         self.__comet_being_edited_has_changed = False
@@ -102,47 +127,62 @@ class CanvasModel(metaclass=Singleton):
                 print(delimiter_point.to_string())
         
     
+    ''' 
+        Returns the image coordinates of given Canvas (zoomed) coordinates.
+    '''
+    def to_image_coordinates(self, coordinates):
+        return (int(coordinates[0] / self.__scale_ratio),
+                int(coordinates[1] / self.__scale_ratio))
+
+    ''' 
+        Returns the image distance of given Canvas (zoomed) distance, so the
+        hit-test thresholds stay the same on screen at any zoom.
+    '''
+    def to_image_distance(self, distance):
+        return distance / self.__scale_ratio
+
     ''' Behaviour when a Comet is requested to be edited. '''
     def prepare_comet_for_editing(self, opencv_tail_contour, opencv_head_contour):
     
         self.__tail_contour_dict = {}
         self.__head_contour_dict = {}
+        self.invalidate_indexes()
 
         # Load Comet contour
         if opencv_tail_contour is not None:
         
             self.load_opencv_contour(
-                opencv_tail_contour,
+                utils.simplify_contour(opencv_tail_contour,
+                    self.__simplification_tolerance),
                 TailContourBuilder.get_instance()
             )
             self.__root_delimiter_point = None
 
         # Load Head contour
         self.load_opencv_contour(
-            opencv_head_contour,
+            utils.simplify_contour(opencv_head_contour,
+                self.__simplification_tolerance),
             HeadContourBuilder.get_instance()
         )           
         self.__root_delimiter_point = None
     
-    ''' Loads an OpenCV contour into the contour dictionary. '''
+    '''
+        Loads an OpenCV contour into the contour dictionary, as a single
+        closed CanvasContour. The contour array is copied at once to the
+        ContourArray of the CanvasContour, each vertex linked to its
+        previous and next ones.
+    '''
     def load_opencv_contour(self, opencv_contour, building_instance):
 
-        # Create first point
-        previous_point = building_instance.create_delimiter_point(
-            (opencv_contour[0][0][0], opencv_contour[0][0][1]))
-        first_point = previous_point
-
-        # Create and connect the rest
-        for point in opencv_contour[1:]:
-            coordinates = (point[0][0], point[0][1])
-            previous_point = building_instance.create_and_connect_points(
-                previous_point, coordinates)
+        canvas_contour = CanvasContour()
+        canvas_contour.set_closed(True)
+        canvas_contour.load_polyline(
+            opencv_contour.reshape(-1, 2).astype(numpy.float64),
+            building_instance.POINT_TYPE)
 
-        # Connect last and first points
-        building_instance.connect_points(first_point, previous_point)
-
-        for (_, contour) in building_instance.get_contour_dict().items():
-            contour.set_closed(True)
+        building_instance.get_contour_dict()[canvas_contour.get_id()] = \
+            canvas_contour
+        self.invalidate_indexes()
             
     ''' Adds the requested_delimiter_point by the user. '''        
     def add_requested_delimiter_point(self):
@@ -197,6 +237,149 @@ class CanvasModel(metaclass=Singleton):
             return TailContourBuilder.get_instance()
         return HeadContourBuilder.get_instance()
 
+    ''' 
+        Returns the DelimiterPointGrid of the DelimiterPoints of given type.
+        It is built if it was invalidated.
+    '''
+    def get_point_grid(self, delimiter_point_type):
+
+        if delimiter_point_type == DelimiterPointType.TAIL:
+            if self.__tail_point_grid is None:
+                self.__tail_point_grid = DelimiterPointGrid(
+                                             self.get_all_tail_points())
+            return self.__tail_point_grid
+
+        if self.__head_point_grid is None:
+            self.__head_point_grid = DelimiterPointGrid(
+                                         self.get_all_head_points())
+        return self.__head_point_grid
+
+    ''' 
+        Adds a new DelimiterPoint to the DelimiterPointGrid of its type, if
+        built.
+    '''
+    def index_delimiter_point(self, delimiter_point):
+
+        if delimiter_point.get_type() == DelimiterPointType.TAIL:
+            point_grid = self.__tail_point_grid
+        else:
+            point_grid = self.__head_point_grid
+
+        if point_grid is not None:
+            point_grid.insert(delimiter_point)
+        self.__points = None
+        self.__point_coordinates = None
+
+    ''' 
+        Invalidates the DelimiterPointGrids and the edges. Must be called
+        when the DelimiterPoints are added to the contour dictionaries
+        directly.
+    '''
+    def invalidate_indexes(self):
+
+        self.__tail_point_grid = None
+        self.__head_point_grid = None
+        self.invalidate_edges()
+
+    ''' 
+        Returns the edges, as pairs of neighbor DelimiterPoints, of every
+        contour. Each edge is returned once.
+    '''
+    def get_edges(self):
+
+        if self.__edges is None:
+
+            self.__edges = []
+            for (array, rows, neighbor_rows) in self.__get_edge_rows():
+                self.__edges += zip(array.get_points(rows),
+                                    array.get_points(neighbor_rows))
+
+        return self.__edges
+
+    ''' 
+        Returns the (x1, y1, x2, y2) segment array of the edges, in the
+        get_edges() order, gathered from the ContourArrays. If a
+        DelimiterPointType is given, only the edges of its contours are
+        returned.
+    '''
+    def get_edge_segments(self, delimiter_point_type=None):
+
+        if delimiter_point_type is not None:
+            if delimiter_point_type == DelimiterPointType.TAIL:
+                contour_dict = self.__tail_contour_dict
+            else:
+                contour_dict = self.__head_contour_dict
+            return CanvasModel.__get_segments(
+                [(canvas_contour.get_array(),) +
+                 canvas_contour.get_array().get_edge_rows()
+                 for canvas_contour in contour_dict.values()])
+
+        if self.__edge_segments is None:
+            self.__edge_segments = CanvasModel.__get_segments(
+                self.__get_edge_rows())
+
+        return self.__edge_segments
+
+    ''' 
+        Returns the DelimiterPoints inside given (x, y, width, height)
+        rectangle, tested on the coordinate array at once.
+    '''
+    def get_delimiter_points_inside_rect(self, rect):
+
+        if self.__points is None:
+            self.__points = []
+            self.__point_rows = []
+            for canvas_contour in itertools.chain(
+                    self.__head_contour_dict.values(),
+                    self.__tail_contour_dict.values()):
+                rows = canvas_contour.get_array().get_rows()
+                self.__points += canvas_contour.get_array().get_points(rows)
+                self.__point_rows.append((canvas_contour.get_array(), rows))
+            self.__point_coordinates = None
+
+        if len(self.__points) == 0:
+            return []
+
+        if self.__point_coordinates is None:
+            self.__point_coordinates = numpy.concatenate(
+                [array.get_coordinates_array(rows)
+                 for (array, rows) in self.__point_rows])
+
+        return [self.__points[index] for index in utils.
+                get_indexes_inside_rect(self.__point_coordinates, rect)]
+
+    ''' 
+        Invalidates the edges and the DelimiterPoint arrays. Must be called
+        when the neighbors of a DelimiterPoint change or DelimiterPoints are
+        removed.
+    '''
+    def invalidate_edges(self):
+
+        self.__edge_rows = None
+        self.__edges = None
+        self.__edge_segments = None
+        self.__points = None
+        self.__point_coordinates = None
+
+    ''' 
+        Invalidates the edge segments and the DelimiterPoint coordinate
+        array. Must be called when a DelimiterPoint moves.
+    '''
+    def invalidate_edge_segments(self):
+
+        self.__edge_segments = None
+        self.__point_coordinates = None
+
+    ''' 
+        Returns whether given DelimiterPoint is still in the contour
+        dictionaries or not.
+    '''
+    def contains_delimiter_point(self, delimiter_point):
+
+        return self.get_delimiter_point(
+                   delimiter_point.get_id(), delimiter_point.get_type(),
+                   delimiter_point.get_contour_id()) is delimiter_point
+
     ''' Returns all the DelimiterPoints. '''
     def get_all_points(self):
     
@@ -217,6 +400,35 @@ class CanvasModel(metaclass=Singleton):
     def get_all_head_points(self):
         return self.__get_points(self.__head_contour_dict)
         
+    ''' 
+        Returns the edge rows of every ContourArray, as (ContourArray, rows,
+        neighbor rows) tuples.
+    '''
+    def __get_edge_rows(self):
+
+        if self.__edge_rows is None:
+            self.__edge_rows = [
+                (canvas_contour.get_array(),) +
+                canvas_contour.get_array().get_edge_rows()
+                for canvas_contour in itertools.chain(
+                    self.__head_contour_dict.values(),
+                    self.__tail_contour_dict.values())]
+
+        return self.__edge_rows
+
+    ''' 
+        Returns the (x1, y1, x2, y2) segment array of given (ContourArray,
+        rows, neighbor rows) tuples.
+    '''
+    def __get_segments(edge_rows):
+
+        segments = [numpy.hstack((array.get_coordinates_array(rows),
+                                  array.get_coordinates_array(neighbor_rows)))
+                    for (array, rows, neighbor_rows) in edge_rows]
+        if len(segments) == 0:
+            return numpy.empty((0, 4))
+        return numpy.concatenate(segments)
+
     ''' Returns the DelimiterPoints from the given contour dictionary. '''
     def __get_points(self, contour_dict):
 
@@ -245,12 +457,12 @@ class CanvasModel(metaclass=Singleton):
             delimiter_point = canvas_contour.get_delimiter_point_dict()[
                 selected_delimiter_point.get_id()]
             
-            # Remove itself from its local neighborhood
-            for neighbor in delimiter_point.get_neighbors():                                             
-                neighbor.get_neighbors().remove(delimiter_point)
-                
-            # Remove from the CanvasContour it belongs to
-            del canvas_contour.get_delimiter_point_dict()[delimiter_point.get_id()]
+            # Remove from the CanvasContour it belongs to, and from its
+            # local neighborhood
+            canvas_contour.remove_delimiter_point(delimiter_point)
+            self.invalidate_edges()
+            if delimiter_point.get_grid() is not None:
+                delimiter_point.get_grid().remove(delimiter_point)
                     
             # Contour is no longer closed
             canvas_contour.set_closed(False)        
@@ -304,8 +516,7 @@ class CanvasModel(metaclass=Singleton):
 
         # Neighbor1 is no longer local neighbor with neighbor2 and
         # viceversa
-        neighbors[0].get_neighbors().remove(neighbors[1])
-        neighbors[1].get_neighbors().remove(neighbors[0]) 
+        unmake_neighbors(neighbors[0], neighbors[1])
 
         # Create new point                 
         new_delimiter_point = builder.create_delimiter_point(
@@ -320,6 +531,12 @@ class CanvasModel(metaclass=Singleton):
 #                              Getters & Setters                              #
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #    
     
+    def get_scale_ratio(self):
+        return self.__scale_ratio
+
+    def set_scale_ratio(self, scale_ratio):
+        self.__scale_ratio = scale_ratio
+
     def get_tail_color(self):
         return self.__tail_color
 
@@ -349,12 +566,16 @@ class CanvasModel(metaclass=Singleton):
         
     def set_tail_contour_dict(self, tail_contour_dict):
         self.__tail_contour_dict = tail_contour_dict
+        self.__tail_point_grid = None
+        self.invalidate_edges()
 
     def get_head_contour_dict(self):
         return self.__head_contour_dict
 
     def set_head_contour_dict(self, head_contour_dict):
         self.__head_contour_dict = head_contour_dict
+        self.__head_point_grid = None
+        self.invalidate_edges()
         
     def get_edge_width(self):
         return self.__edge_width
@@ -521,6 +742,35 @@ class DelimiterPointSelection(object):
         self.__dict = {}
         self.__moved = False
 
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                  Methods                                    #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+    '''
+        Returns a copy of the selection. Only the SelectedDelimiterPoints are
+        copied, not the DelimiterPoints they refer to.
+    '''
+    def copy(self):
+
+        selection = DelimiterPointSelection()
+        for (delimiter_point_id, selected_delimiter_point) in \
+                self.__dict.items():
+
+            selected_delimiter_point_copy = SelectedDelimiterPoint(
+                selected_delimiter_point.get_id(),
+                selected_delimiter_point.get_type(),
+                selected_delimiter_point.get_canvas_contour_id()
+            )
+            selected_delimiter_point_copy.set_origin(
+                selected_delimiter_point.get_origin())
+            selection.get_dict()[delimiter_point_id] = \
+                selected_delimiter_point_copy
+
+        selection.set_moved(self.__moved)
+        return selection
+
+
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
 #                             Getters & Setters                               #
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
@@ -635,7 +885,10 @@ class RequestedDelimiterPoint(metaclass=Singleton):
 class CanvasContour(object):
 
     '''
-        The CanvasContour class.
+        The CanvasContour class. Its DelimiterPoints are stored on a
+        ContourArray, and are added and removed through the CanvasContour
+        so both stay in sync. The DelimiterPoint dictionary must not be
+        modified directly.
     '''
 
     # The ID Generator
@@ -648,9 +901,86 @@ class CanvasContour(object):
             self.__id = next(CanvasContour.new_id)
         else:
             self.__id = id
+        self.__array = ContourArray()
         self.__delimiter_point_dict = {}
         self.__closed = False
 
+    ''' Unpickling behaviour. '''
+    def __setstate__(self, state):
+
+        self.__dict__.update(state)
+
+        # Legacy contours hold DelimiterPoints without a ContourArray
+        if '_CanvasContour__array' not in state:
+            delimiter_point_list = list(self.__delimiter_point_dict.values())
+            self.__array = ContourArray()
+            self.__delimiter_point_dict = {}
+            self.add_delimiter_points(delimiter_point_list)
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                   Methods                                   #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+    ''' 
+        Adds new DelimiterPoints of given type with given (N, 2) coordinate
+        array, each one linked to the previous and next ones. The last one
+        is linked to the first one if the CanvasContour is closed. Returns
+        the DelimiterPoints.
+    '''
+    def load_polyline(self, coordinates, delimiter_point_type):
+
+        size = len(coordinates)
+        positions = numpy.arange(size - 1)
+        edges = numpy.stack((positions, positions + 1), axis=1)
+        # A closing edge on less than three points would repeat an edge
+        if self.__closed and size >= 3:
+            edges = numpy.concatenate((edges, [[size - 1, 0]]))
+
+        return self.load(
+            numpy.fromiter(itertools.islice(DelimiterPoint.new_id, size),
+                           numpy.int64, size),
+            coordinates, edges, delimiter_point_type)
+
+    ''' 
+        Adds new DelimiterPoints of given type, with given IDs and (N, 2)
+        coordinate array, and links them with given (M, 2) array of
+        positions. Returns the DelimiterPoints.
+    '''
+    def load(self, ids, coordinates, edges, delimiter_point_type):
+
+        delimiter_point_list = self.__array.extend(
+            ids, coordinates, edges, delimiter_point_type, self.__id)
+        self.__delimiter_point_dict.update(
+            zip(ids.tolist(), delimiter_point_list))
+
+        return delimiter_point_list
+
+    ''' 
+        Adds given DelimiterPoints, removing them from their CanvasContour,
+        if any. Their edges are kept, except the ones with DelimiterPoints
+        that are not in this CanvasContour.
+    '''
+    def add_delimiter_points(self, delimiter_point_list):
+
+        for delimiter_point in self.__array.take(delimiter_point_list):
+            delimiter_point.set_contour_id(self.__id)
+            self.__delimiter_point_dict[delimiter_point.get_id()] = \
+                delimiter_point
+
+    ''' Adds given DelimiterPoint. See add_delimiter_points(). '''
+    def add_delimiter_point(self, delimiter_point):
+        self.add_delimiter_points([delimiter_point])
+
+    ''' 
+        Removes given DelimiterPoint and its edges. It keeps its coordinates
+        and roommate.
+    '''
+    def remove_delimiter_point(self, delimiter_point):
+
+        del self.__delimiter_point_dict[delimiter_point.get_id()]
+        delimiter_point.detach()
+
 
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
 #                              Getters & Setters                              #
@@ -662,12 +992,12 @@ class CanvasContour(object):
     def set_id(self, id):
         self.__id = id
 
+    def get_array(self):
+        return self.__array
+
     def get_delimiter_point_dict(self):
         return self.__delimiter_point_dict
 
-    def set_delimiter_point_dict(self, delimiter_point_dict):
-        self.__delimiter_point_dict = delimiter_point_dict
-
     def get_closed(self):
         return self.__closed
 
@@ -676,6 +1006,283 @@ class CanvasContour(object):
 
 
 
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                                                             #
+# 	ContourArray                                                              #
+#                                                                             #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+class ContourArray(object):
+
+    '''
+        The ContourArray class. Stores the DelimiterPoints of a CanvasContour
+        as rows of NumPy arrays: their IDs, their coordinates and the rows of
+        up to two neighbors. The few DelimiterPoints with more neighbors
+        keep the others aside. Each row is accessed through a DelimiterPoint
+        proxy. Removed rows keep a negative ID and are not reused.
+    '''
+
+    __slots__ = ('__ids', '__coordinates', '__neighbors', '__extra_neighbors',
+                 '__points', '__roommates', '__size')
+
+    ''' Initialization method. '''
+    def __init__(self):
+
+        self.__ids = numpy.empty(0, numpy.int64)
+        self.__coordinates = numpy.empty((0, 2))
+        # Neighbor rows, -1 if empty
+        self.__neighbors = numpy.empty((0, 2), numpy.int64)
+        self.__extra_neighbors = {}         # The extra_neighbors (int list{})
+        self.__points = []                  # The points (DelimiterPoint list)
+        self.__roommates = {}               # The roommates (Roommate{})
+        self.__size = 0                     # The size (int)
+
+    ''' Pickling behaviour. Only the used rows are pickled. '''
+    def __getstate__(self):
+
+        return {
+            '_ContourArray__ids': self.__ids[:self.__size],
+            '_ContourArray__coordinates': self.__coordinates[:self.__size],
+            '_ContourArray__neighbors': self.__neighbors[:self.__size],
+            '_ContourArray__extra_neighbors': self.__extra_neighbors,
+            '_ContourArray__points': self.__points,
+            '_ContourArray__roommates': self.__roommates,
+            '_ContourArray__size': self.__size
+        }
+
+    ''' Unpickling behaviour. '''
+    def __setstate__(self, state):
+
+        for (name, value) in state.items():
+            setattr(self, name, value)
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                   Methods                                   #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+    ''' 
+        Appends rows with given IDs and (N, 2) coordinate array, linked with
+        given (M, 2) array of positions, and returns their DelimiterPoints
+        of given type and CanvasContour ID.
+    '''
+    def extend(self, ids, coordinates, edges, delimiter_point_type,
+               contour_id):
+
+        size = len(ids)
+        first_row = self.__size
+        self.__reserve(size)
+        self.__ids[first_row:first_row + size] = ids
+        self.__coordinates[first_row:first_row + size] = coordinates
+        self.__size += size
+
+        delimiter_point_list = [
+            DelimiterPoint(None, delimiter_point_type, id, self, row)
+            for (row, id) in enumerate(ids.tolist(), first_row)]
+        for delimiter_point in delimiter_point_list:
+            delimiter_point.set_contour_id(contour_id)
+        self.__points += delimiter_point_list
+
+        # Each row takes its first two neighbors in its free columns
+        edges = numpy.asarray(edges, numpy.int64).reshape(-1, 2) + first_row
+        rows = numpy.concatenate((edges[:, 0], edges[:, 1]))
+        neighbor_rows = numpy.concatenate((edges[:, 1], edges[:, 0]))
+        order = numpy.argsort(rows, kind='stable')
+        (rows, neighbor_rows) = (rows[order], neighbor_rows[order])
+        columns = (numpy.arange(len(rows)) -
+                   numpy.searchsorted(rows, rows, side='left'))
+        stored = columns < 2
+        self.__neighbors[rows[stored], columns[stored]] = neighbor_rows[stored]
+        for (row, neighbor_row) in zip(rows[~stored].tolist(),
+                                       neighbor_rows[~stored].tolist()):
+            self.__extra_neighbors.setdefault(row, []).append(neighbor_row)
+
+        return delimiter_point_list
+
+    ''' 
+        Moves given DelimiterPoints to this array, from the ones they are
+        in, if any. Their edges are kept, except the ones with DelimiterPoints
+        that are not in this array. Returns the moved DelimiterPoints.
+    '''
+    def take(self, delimiter_point_list):
+
+        delimiter_point_list = [p for p in delimiter_point_list
+                                if p.get_array() is not self]
+        moved_ids = {p.get_id() for p in delimiter_point_list}
+        # Neighbors are read before the rows are moved
+        neighbor_lists = [p.get_neighbors() for p in delimiter_point_list]
+
+        for delimiter_point in delimiter_point_list:
+            delimiter_point.detach()
+            delimiter_point.attach(self, self.__append(delimiter_point))
+
+        # Each edge between moved DelimiterPoints is linked once
+        for (delimiter_point, neighbor_list) in zip(delimiter_point_list,
+                                                    neighbor_lists):
+            for neighbor in neighbor_list:
+                if (neighbor.get_array() is self and
+                        (neighbor.get_id() not in moved_ids or
+                         delimiter_point.get_id() < neighbor.get_id())):
+                    self.link(delimiter_point.get_row(), neighbor.get_row())
+
+        return delimiter_point_list
+
+    ''' Removes the DelimiterPoint at given row and its edges. '''
+    def release(self, row):
+
+        for neighbor_row in self.get_neighbor_rows(row):
+            self.unlink(row, neighbor_row)
+        self.__ids[row] = -1
+        self.__points[row] = None
+        self.__roommates.pop(row, None)
+
+    ''' Links the DelimiterPoints at given rows. '''
+    def link(self, row1, row2):
+
+        self.__add_neighbor(row1, row2)
+        self.__add_neighbor(row2, row1)
+
+    ''' Unlinks the DelimiterPoints at given rows. '''
+    def unlink(self, row1, row2):
+
+        self.__remove_neighbor(row1, row2)
+        self.__remove_neighbor(row2, row1)
+
+    ''' Returns the neighbor rows of given row. '''
+    def get_neighbor_rows(self, row):
+
+        neighbor_rows = [n for n in self.__neighbors[row].tolist() if n >= 0]
+        return neighbor_rows + self.__extra_neighbors.get(row, [])
+
+    ''' Returns the rows in use. '''
+    def get_rows(self):
+        return numpy.flatnonzero(self.__ids[:self.__size] >= 0)
+
+    ''' Returns the DelimiterPoints at given rows. '''
+    def get_points(self, rows):
+        return [self.__points[row] for row in rows.tolist()]
+
+    ''' Returns the IDs at given rows. '''
+    def get_ids(self, rows):
+        return self.__ids[rows]
+
+    ''' Returns the (N, 2) coordinate array of given rows. '''
+    def get_coordinates_array(self, rows):
+        return self.__coordinates[rows]
+
+    ''' 
+        Returns the edges as two arrays with the rows of their DelimiterPoints.
+        Each edge is returned once.
+    '''
+    def get_edge_rows(self):
+
+        neighbors = self.__neighbors[:self.__size]
+        (rows, columns) = numpy.nonzero(
+            neighbors > numpy.arange(self.__size)[:, numpy.newaxis])
+        neighbor_rows = neighbors[rows, columns]
+
+        extra_edges = [(row, neighbor_row) for (row, neighbor_rows_list)
+                       in self.__extra_neighbors.items()
+                       for neighbor_row in neighbor_rows_list
+                       if neighbor_row > row]
+        if len(extra_edges) > 0:
+            extra_edges = numpy.array(extra_edges, numpy.int64)
+            rows = numpy.concatenate((rows, extra_edges[:, 0]))
+            neighbor_rows = numpy.concatenate((neighbor_rows, extra_edges[:, 1]))
+
+        return (rows, neighbor_rows)
+
+    ''' Returns the roommates by row. '''
+    def get_roommates(self):
+        return self.__roommates
+
+    ''' Returns the coordinates at given row. '''
+    def get_coordinates(self, row):
+        return tuple(self.__coordinates[row].tolist())
+
+    ''' Sets the coordinates at given row. '''
+    def set_coordinates(self, row, coordinates):
+        self.__coordinates[row] = coordinates
+
+    ''' Returns the DelimiterPoints linked to the one at given row. '''
+    def get_neighbors(self, row):
+        return [self.__points[n] for n in self.get_neighbor_rows(row)]
+
+    ''' Returns the roommate at given row. '''
+    def get_roommate(self, row):
+        return self.__roommates.get(row)
+
+    ''' Sets the roommate at given row. '''
+    def set_roommate(self, row, roommate):
+
+        if roommate is None:
+            self.__roommates.pop(row, None)
+        else:
+            self.__roommates[row] = roommate
+
+    ''' Appends a row for given DelimiterPoint and returns it. '''
+    def __append(self, delimiter_point):
+
+        row = self.__size
+        self.__reserve(1)
+        self.__ids[row] = delimiter_point.get_id()
+        self.__coordinates[row] = delimiter_point.get_coordinates()
+        self.__points.append(delimiter_point)
+        self.__size += 1
+        if delimiter_point.get_roommate() is not None:
+            self.__roommates[row] = delimiter_point.get_roommate()
+
+        return row
+
+    ''' Grows the arrays, if needed, to fit given number of new rows. '''
+    def __reserve(self, size):
+
+        capacity = len(self.__ids)
+        if self.__size + size <= capacity:
+            return
+
+        capacity = max(self.__size + size, 2 * capacity)
+        ids = numpy.full(capacity, -1, numpy.int64)
+        ids[:self.__size] = self.__ids[:self.__size]
+        coordinates = numpy.zeros((capacity, 2))
+        coordinates[:self.__size] = self.__coordinates[:self.__size]
+        neighbors = numpy.full((capacity, 2), -1, numpy.int64)
+        neighbors[:self.__size] = self.__neighbors[:self.__size]
+
+        (self.__ids, self.__coordinates, self.__neighbors) = \
+            (ids, coordinates, neighbors)
+
+    ''' Adds given neighbor row to given row. '''
+    def __add_neighbor(self, row, neighbor_row):
+
+        for column in range(2):
+            if self.__neighbors[row, column] < 0:
+                self.__neighbors[row, column] = neighbor_row
+                return
+        self.__extra_neighbors.setdefault(row, []).append(neighbor_row)
+
+    ''' Removes given neighbor row from given row. '''
+    def __remove_neighbor(self, row, neighbor_row):
+
+        for column in range(2):
+            if self.__neighbors[row, column] == neighbor_row:
+                self.__neighbors[row, column] = -1
+                return
+
+        self.__extra_neighbors[row].remove(neighbor_row)
+        if len(self.__extra_neighbors[row]) == 0:
+            del self.__extra_neighbors[row]
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                              Getters & Setters                              #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+    def get_size(self):
+        return self.__size
+
+
+
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
 #                                                                             #
 # 	DelimiterPointType                                                        #
@@ -702,32 +1309,128 @@ class DelimiterPointType(object):
 class DelimiterPoint(object):
 
     '''
-        The DelimiterPoint class.
+        The DelimiterPoint class. Proxy of a row of the ContourArray of its
+        CanvasContour, which stores its coordinates, neighbors and roommate.
+        A DelimiterPoint that is not in a CanvasContour keeps them aside,
+        as a (coordinates, neighbor list, roommate) tuple, until it's added
+        to one.
     '''
 
+    __slots__ = ('__id', '__contour_id', '__array', '__row', '__type',
+                 '__grid')
+
     # The ID Generator
     new_id = itertools.count()
 
-    ''' Initialization method. '''
-    def __init__(self, coordinates, type, id):
+    ''' 
+        Initialization method. If a ContourArray is given, the DelimiterPoint
+        is the proxy of given row and 'coordinates' is not used.
+    '''
+    def __init__(self, coordinates, type, id, array=None, row=None):
 
         if id is None:
             self.__id = next(DelimiterPoint.new_id)
         else:
             self.__id = id
         self.__contour_id = None
-        self.__coordinates = coordinates
-        self.__neighbors = []
-        self.__roommate = None
+        self.__array = array
+        if array is None:
+            self.__row = (coordinates, [], None)
+        else:
+            self.__row = row
         self.__type = type  
+        # The DelimiterPointGrid that indexes the point, if any
+        self.__grid = None
 
     def to_string(self):
 
         string = "ID=" + str(self.__id) + "\n"
         string += "ContourID=" + str(self.__contour_id) + "\n"
-        string += "Neighbors = " + str([point.get_id() for point in self.__neighbors])
+        string += "Neighbors = " + str([point.get_id() for point in self.get_neighbors()])
         return string   
 
+    ''' Pickling behaviour. The DelimiterPointGrid is not pickled. '''
+    def __getstate__(self):
+
+        return {
+            '_DelimiterPoint__id': self.__id,
+            '_DelimiterPoint__contour_id': self.__contour_id,
+            '_DelimiterPoint__array': self.__array,
+            '_DelimiterPoint__row': self.__row,
+            '_DelimiterPoint__type': self.__type
+        }
+
+    ''' 
+        Unpickling behaviour. Legacy DelimiterPoints are kept aside until
+        their CanvasContour adds them to its ContourArray.
+    '''
+    def __setstate__(self, state):
+
+        # Older pickles may be (dict, slots) pairs or include the grid
+        if isinstance(state, tuple):
+            state = {**(state[0] or {}), **(state[1] or {})}
+
+        if '_DelimiterPoint__array' not in state:
+            state = dict(state)
+            state['_DelimiterPoint__array'] = None
+            state['_DelimiterPoint__row'] = (
+                state.pop('_DelimiterPoint__coordinates'),
+                state.pop('_DelimiterPoint__neighbors'),
+                state.pop('_DelimiterPoint__roommate', None))
+
+        for (name, value) in state.items():
+            if name != '_DelimiterPoint__grid':
+                setattr(self, name, value)
+        self.__grid = None
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                   Methods                                   #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+    ''' 
+        Makes given DelimiterPoint a neighbor of this one, and vice versa.
+        Both must be in the same CanvasContour, or in none.
+    '''
+    def link(self, delimiter_point):
+
+        if self.__array is None and delimiter_point.__array is None:
+            self.__row[1].append(delimiter_point)
+            delimiter_point.__row[1].append(self)
+        elif self.__array is delimiter_point.__array:
+            self.__array.link(self.__row, delimiter_point.__row)
+        else:
+            raise ValueError("ERROR: DelimiterPoints of different "
+                             "CanvasContours can't be neighbors")
+
+    ''' Makes given DelimiterPoint not being a neighbor of this one. '''
+    def unlink(self, delimiter_point):
+
+        if self.__array is None:
+            self.__row[1].remove(delimiter_point)
+            delimiter_point.__row[1].remove(self)
+        else:
+            self.__array.unlink(self.__row, delimiter_point.__row)
+
+    ''' Makes the DelimiterPoint the proxy of given ContourArray row. '''
+    def attach(self, array, row):
+
+        self.__array = array
+        self.__row = row
+
+    ''' 
+        Removes the DelimiterPoint and its edges from its ContourArray, if
+        any. It keeps its coordinates and roommate.
+    '''
+    def detach(self):
+
+        if self.__array is not None:
+            state = (self.get_coordinates(), [], self.get_roommate())
+            self.__array.release(self.__row)
+            self.__array = None
+            self.__row = state
+
+
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
 #                              Getters & Setters                              #
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
@@ -741,32 +1444,158 @@ class DelimiterPoint(object):
     def set_contour_id(self, contour_id):
         self.__contour_id = contour_id
 
+    def get_array(self):
+        return self.__array
+
+    def get_row(self):
+        return self.__row
+
     def get_coordinates(self):
-        return self.__coordinates
+
+        if self.__array is None:
+            return self.__row[0]
+        return self.__array.get_coordinates(self.__row)
 
     def set_coordinates(self, coordinates):
-        self.__coordinates = coordinates
 
+        if self.__array is None:
+            self.__row = (coordinates,) + self.__row[1:]
+        else:
+            self.__array.set_coordinates(self.__row, coordinates)
+        if self.__grid is not None:
+            self.__grid.move(self)
+        invalidate_canvas_model_edges(segments_only=True)
+
+    ''' Returns a new list with the neighbor DelimiterPoints. '''
     def get_neighbors(self):
-        return self.__neighbors
 
-    def set_neighbors(self, neighbors):
-        self.__neighbors = neighbors
+        if self.__array is None:
+            return list(self.__row[1])
+        return self.__array.get_neighbors(self.__row)
 
     def get_roommate(self):
-        return self.__roommate
+
+        if self.__array is None:
+            return self.__row[2]
+        return self.__array.get_roommate(self.__row)
 
     def set_roommate(self, roommate):
-        self.__roommate = roommate
+
+        if self.__array is None:
+            self.__row = self.__row[:2] + (roommate,)
+        else:
+            self.__array.set_roommate(self.__row, roommate)
 
     def get_type(self):
         return self.__type
 
     def set_type(self, type):
         self.__type = type
+
+    def get_grid(self):
+        return self.__grid
+
+    def set_grid(self, grid):
+        self.__grid = grid
                
 
 
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                                                             #
+# 	DelimiterPointGrid                                                        #
+#                                                                             #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+class DelimiterPointGrid(object):
+
+    '''
+        The DelimiterPointGrid class. Uniform grid of CELL_SIZE square cells
+        that indexes DelimiterPoints by coordinates, so the points close to
+        a location are found without scanning every point. Indexed
+        DelimiterPoints keep it updated when they are moved.
+    '''
+
+    # Cell side (image pixels)
+    CELL_SIZE = 16
+
+    ''' Initialization method. '''
+    def __init__(self, delimiter_point_list=[]):
+
+        self.__cells = {}                   # The cells (DelimiterPoint{}{})
+        self.__point_cells = {}             # The point_cells (tuple{})
+
+        for delimiter_point in delimiter_point_list:
+            self.insert(delimiter_point)
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                  Methods                                    #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+    ''' Adds given DelimiterPoint. '''
+    def insert(self, delimiter_point):
+
+        cell = DelimiterPointGrid.__get_cell(delimiter_point.get_coordinates())
+        self.__cells.setdefault(cell, {})[delimiter_point.get_id()] = \
+            delimiter_point
+        self.__point_cells[delimiter_point.get_id()] = cell
+        delimiter_point.set_grid(self)
+
+    ''' Removes given DelimiterPoint. '''
+    def remove(self, delimiter_point):
+
+        cell = self.__point_cells.pop(delimiter_point.get_id(), None)
+        if cell is not None:
+            del self.__cells[cell][delimiter_point.get_id()]
+            if len(self.__cells[cell]) == 0:
+                del self.__cells[cell]
+
+        if delimiter_point.get_grid() is self:
+            delimiter_point.set_grid(None)
+
+    ''' Moves given DelimiterPoint to the cell of its coordinates. '''
+    def move(self, delimiter_point):
+
+        cell = DelimiterPointGrid.__get_cell(delimiter_point.get_coordinates())
+        if self.__point_cells.get(delimiter_point.get_id()) != cell:
+            self.remove(delimiter_point)
+            self.insert(delimiter_point)
+
+    ''' 
+        Returns the DelimiterPoints in the cells within given distance of
+        given coordinates. Exact distances are left to the caller.
+    '''
+    def query(self, coordinates, distance):
+
+        (first_column, first_row) = DelimiterPointGrid.__get_cell(
+            (coordinates[0] - distance, coordinates[1] - distance))
+        (last_column, last_row) = DelimiterPointGrid.__get_cell(
+            (coordinates[0] + distance, coordinates[1] + distance))
+
+        delimiter_point_list = []
+        for row in range(first_row, last_row + 1):
+            for column in range(first_column, last_column + 1):
+                cell = self.__cells.get((column, row))
+                if cell is not None:
+                    delimiter_point_list += cell.values()
+
+        return delimiter_point_list
+
+    ''' Returns the cell of given coordinates. '''
+    def __get_cell(coordinates):
+        return (int(coordinates[0] // DelimiterPointGrid.CELL_SIZE),
+                int(coordinates[1] // DelimiterPointGrid.CELL_SIZE))
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                              Getters & Setters                              #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+    def get_size(self):
+        return len(self.__point_cells)
+
+
+
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
 #                                                                             #
 # 	Roommate                                                                  #
@@ -778,6 +1607,9 @@ class Roommate(object):
     '''
         The Roommate class.
     '''
+
+    __slots__ = ('__delimiter_point_type', '__canvas_contour_id',
+                 '__delimiter_point_id')
     
     def __init__(self, delimiter_point_type, canvas_contour_id, 
             delimiter_point_id):
@@ -799,6 +1631,24 @@ class Roommate(object):
             self.__delimiter_point_type,
             self.__canvas_contour_id
         )
+
+    ''' Pickling behaviour. '''
+    def __getstate__(self):
+
+        return {
+            '_Roommate__delimiter_point_type': self.__delimiter_point_type,
+            '_Roommate__canvas_contour_id': self.__canvas_contour_id,
+            '_Roommate__delimiter_point_id': self.__delimiter_point_id
+        }
+
+    ''' Unpickling behaviour. '''
+    def __setstate__(self, state):
+
+        # Older pickles may be (dict, slots) pairs
+        if isinstance(state, tuple):
+            state = {**(state[0] or {}), **(state[1] or {})}
+        for (name, value) in state.items():
+            setattr(self, name, value)
        
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
 #                              Getters & Setters                              #
@@ -868,10 +1718,9 @@ class CometContourBuilder(metaclass=Singleton):
                 canvas_contour = CanvasContour(contour_id)
                 self.get_contour_dict()[canvas_contour.get_id()] = canvas_contour
         
-        # Add the new DelimiterPoint to the Contour DelimiterPoint dict
-        delimiter_point.set_contour_id(canvas_contour.get_id())
-        canvas_contour.get_delimiter_point_dict()[
-            delimiter_point.get_id()] = delimiter_point  
+        # Add the new DelimiterPoint to the CanvasContour
+        canvas_contour.add_delimiter_point(delimiter_point)
+        CanvasModel.get_instance().index_delimiter_point(delimiter_point)
             
         if roommate is not None: 
             make_roommates(
@@ -887,28 +1736,25 @@ class CometContourBuilder(metaclass=Singleton):
         src_contour_id = src_point.get_contour_id()
         dst_contour_id = dst_point.get_contour_id()
 
-        # They are now local neighbors
-        make_neighbors(src_point, dst_point)
-
         # They belong to different contours
-        if src_point.get_contour_id() != dst_point.get_contour_id():
+        if src_contour_id != dst_contour_id:
 
             # Make a new CanvasContour with the union
             new_contour = CanvasContour(canvas_contour_id)
-            new_contour.get_delimiter_point_dict().update(
-                self.get_contour_dict()[src_contour_id].get_delimiter_point_dict())
-            new_contour.get_delimiter_point_dict().update(
-                self.get_contour_dict()[dst_contour_id].get_delimiter_point_dict())
-            
-            # The points belong to the new Contour
-            for (_, delimiter_point) in new_contour.get_delimiter_point_dict().items():
-                delimiter_point.set_contour_id(new_contour.get_id())
+            new_contour.add_delimiter_points(
+                list(self.get_contour_dict()[src_contour_id].
+                     get_delimiter_point_dict().values()) +
+                list(self.get_contour_dict()[dst_contour_id].
+                     get_delimiter_point_dict().values()))
 
             # Add the new CanvasContour to the CanvasContour dictionary
             self.get_contour_dict()[new_contour.get_id()] = new_contour
             # Remove the src and dst old contours
             del self.get_contour_dict()[src_contour_id]
-            del self.get_contour_dict()[dst_contour_id] 
+            del self.get_contour_dict()[dst_contour_id]
+
+        # They are now local neighbors
+        make_neighbors(src_point, dst_point)
 
     ''' Behaviour disconnecting two DelimiterPoints. '''
     def disconnect_points(self, src_point, dst_point,
@@ -927,17 +1773,10 @@ class CometContourBuilder(metaclass=Singleton):
             canvas_contour2 = CanvasContour(dst_point_previous_contour_id)
             
             # Add the corresponding DelimiterPoints to the new CanvasContours
-            delimiter_point_list = get_local_neighbors(src_point)
-            for delimiter_point in delimiter_point_list:
-                delimiter_point.set_contour_id(canvas_contour1.get_id())
-            canvas_contour1.set_delimiter_point_dict(
-                {p.get_id():p for p in delimiter_point_list}) 
-            
-            delimiter_point_list = get_local_neighbors(dst_point)
-            for delimiter_point in delimiter_point_list:
-                delimiter_point.set_contour_id(canvas_contour2.get_id())
-            canvas_contour2.set_delimiter_point_dict(
-                {p.get_id():p for p in delimiter_point_list})
+            canvas_contour1.add_delimiter_points(
+                get_local_neighbors(src_point))
+            canvas_contour2.add_delimiter_points(
+                get_local_neighbors(dst_point))
             
             # Add both contours to the CanvasContour dict
             self.get_contour_dict()[canvas_contour1.get_id()] = canvas_contour1
@@ -956,13 +1795,15 @@ class CometContourBuilder(metaclass=Singleton):
         if CanvasModel.get_instance().get_root_delimiter_point() is not None:
 
             anchored_point = self.set_anchored_delimiter_point_with_root(
-                                 (int(event.x), int(event.y)))
+                                 CanvasModel.get_instance().
+                                     to_image_coordinates((event.x, event.y)))
 
         # When a there isn't a root DelimiterPoint
         else:
 
             anchored_point = self.set_anchored_delimiter_point_with_no_root(
-                                 (int(event.x), int(event.y)))
+                                 CanvasModel.get_instance().
+                                     to_image_coordinates((event.x, event.y)))
 
         # Set anchored DelimiterPoint
         CanvasModel.get_instance().set_anchored_delimiter_point(anchored_point)
@@ -1001,37 +1842,35 @@ class CometContourBuilder(metaclass=Singleton):
     def get_anchoring_candidates(self, forbidden_id_list, mouse_coordinates):
 
         # First candidate comes from the comet contour DelimiterPoints
-        candidate1 = see_anchoring_with_delimiter_point_list(
-                        CanvasModel.get_instance().get_all_tail_points(),
+        candidate1 = see_anchoring_with_delimiter_point_grid(
+                        CanvasModel.get_instance().get_point_grid(
+                            DelimiterPointType.TAIL),
                         forbidden_id_list, mouse_coordinates)
 
         # Second candidate comes from the head contour DelimiterPoints
-        candidate2 = see_anchoring_with_delimiter_point_list(
-                        CanvasModel.get_instance().get_all_head_points(),
+        candidate2 = see_anchoring_with_delimiter_point_grid(
+                        CanvasModel.get_instance().get_point_grid(
+                            DelimiterPointType.HEAD),
                         forbidden_id_list, mouse_coordinates)
 
         return (candidate1, candidate2)
 
     ''' 
-        Returns the ID list of DelimiterPoints that cannot be
+        Returns the ID set of DelimiterPoints that cannot be
         anchored when given DelimiterPoint is root.
     '''
     def get_forbidden_id_list(self, delimiter_point):
 
         # Points that belong to a closed Contour cannot be anchored
-        points_from_closed_contours = \
-            get_delimiter_points_ids_from_closed_contours(
-                self.get_contour_dict())
-        
+        forbidden_id_list = get_delimiter_points_ids_from_closed_contours(
+                                self.get_contour_dict())
 
         # Own root cannot be anchored
-        forbidden_id_list = union(points_from_closed_contours, 
-                                [delimiter_point.get_id()])
+        forbidden_id_list.add(delimiter_point.get_id())
 
         # Neighbors cannot be anchored
-        forbidden_id_list = union(forbidden_id_list,
-            [neighbor.get_id() for neighbor
-             in delimiter_point.get_neighbors()])
+        forbidden_id_list.update(neighbor.get_id() for neighbor
+                                 in delimiter_point.get_neighbors())
 
         return forbidden_id_list
 
@@ -1172,21 +2011,32 @@ class HeadContourBuilder(CometContourBuilder):
 #                            Auxiliary Methods                                #
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ # 
 
-''' Union of two given lists. '''
-def union(list1, list2):
-    return list(set(list1) | set(list2))
+''' 
+    Invalidates the CanvasModel edges, or only their segments, if the
+    CanvasModel is instantiated.
+'''
+def invalidate_canvas_model_edges(segments_only=False):
+
+    canvas_model = CanvasModel.get_instance()
+    if canvas_model is None:
+        return
+
+    if segments_only:
+        canvas_model.invalidate_edge_segments()
+    else:
+        canvas_model.invalidate_edges()
 
 ''' Makes two DelimiterPoints 'neighbors'. '''
 def make_neighbors(delimiter_point1, delimiter_point2):
 
-    delimiter_point1.get_neighbors().append(delimiter_point2)
-    delimiter_point2.get_neighbors().append(delimiter_point1)
+    delimiter_point1.link(delimiter_point2)
+    invalidate_canvas_model_edges()
   
 ''' Makes two DelimiterPoints not being neighbors anymore. '''  
 def unmake_neighbors(delimiter_point1, delimiter_point2):
 
-    delimiter_point1.get_neighbors().remove(delimiter_point2)
-    delimiter_point2.get_neighbors().remove(delimiter_point1)
+    delimiter_point1.unlink(delimiter_point2)
+    invalidate_canvas_model_edges()
     
 ''' Makes two DelimiterPoints 'roommates'. '''
 def make_roommates(delimiter_point1, delimiter_point2):
@@ -1207,40 +2057,22 @@ def make_roommates(delimiter_point1, delimiter_point2):
     )    
     
 ''' 
-    Returns a list with all the local neighbors from given DelimiterPoint.
-    The contour the DelimiterPoint belongs to must not be closed. 
+    Returns a list with all the local neighbors from given DelimiterPoint,
+    that is, every DelimiterPoint reachable through its neighbors.
 '''    
 def get_local_neighbors(delimiter_point):
 
-    local_neighbors = [delimiter_point]
-    for neighbor in delimiter_point.get_neighbors():
-        local_neighbors = union(
-            local_neighbors,
-            __get_local_neighbors(
-                neighbor,
-                delimiter_point.get_id(),
-                []
-            )
-        )
-            
-    return local_neighbors        
-   
-''' 'get_local_neighbors' recursive auxiliary method. '''   
-def __get_local_neighbors(delimiter_point, sender_id, local_neighbors):    
-    
-    for neighbor in delimiter_point.get_neighbors():
-        if neighbor.get_id() != sender_id:
-            local_neighbors = union(
-                local_neighbors,
-                __get_local_neighbors(
-                    neighbor,
-                    delimiter_point.get_id(),
-                    []
-                )
-            )
-                
-    return union(local_neighbors, [delimiter_point])            
-    
+    visited = {delimiter_point.get_id(): delimiter_point}
+    stack = [delimiter_point]
+
+    while len(stack) > 0:
+        for neighbor in stack.pop().get_neighbors():
+            if neighbor.get_id() not in visited:
+                visited[neighbor.get_id()] = neighbor
+                stack.append(neighbor)
+
+    return list(visited.values())
+
 ''' 
     Returns whether given first CanvasContour is nested to second
     CanvasContour.
@@ -1260,36 +2092,44 @@ def contours_are_nested(canvas_contour1, canvas_contour2):
     return False 
 
 ''' 
-    Returns a list with the DelimiterPoint identifiers that belong to a
+    Returns a set with the DelimiterPoint identifiers that belong to a
     closed CanvasContour.
 '''
 def get_delimiter_points_ids_from_closed_contours(contour_dict):
 
-    point_ids_list = []
+    point_ids = set()
 
-    for (_, contour) in contour_dict.items():
+    for contour in contour_dict.values():
         if contour.get_closed():
-            point_ids_list += [point.get_id() for (_, point) in 
-                               contour.get_delimiter_point_dict().items()]
+            point_ids.update(contour.get_delimiter_point_dict().keys())
 
-    return point_ids_list
+    return point_ids
     
-''' Returns the candidate to be the anchored DelimiterPoint. '''
-def see_anchoring_with_delimiter_point_list(delimiter_point_list,
+''' 
+    Returns the candidate to be the anchored DelimiterPoint, searched on
+    given DelimiterPointGrid.
+'''
+def see_anchoring_with_delimiter_point_grid(delimiter_point_grid,
                                 forbidden_id_list, mouse_coordinates_point):
 
     # See anchoring with the DelimiterPoints except the ones that belongs
     # to the forbidden list
     candidate = None
-    for delimiter_point in delimiter_point_list:
+    anchoring_distance = CanvasModel.get_instance().to_image_distance(
+                             CanvasModel.ANCHORING_DISTANCE)
+    for delimiter_point in delimiter_point_grid.query(
+            mouse_coordinates_point, anchoring_distance):
 
-        if delimiter_point.get_id() not in forbidden_id_list:
+        # Points removed without going through the grid are skipped
+        if (delimiter_point.get_id() not in forbidden_id_list and
+                CanvasModel.get_instance().contains_delimiter_point(
+                    delimiter_point)):
 
             euclidean_distance = ( utils.euclidean_distance(
                                    delimiter_point.get_coordinates(), 
                                    mouse_coordinates_point)
                                   )
-            if euclidean_distance < CanvasModel.ANCHORING_DISTANCE:
+            if euclidean_distance < anchoring_distance:
 
                 if candidate is None:
                     candidate = (delimiter_point, euclidean_distance)
@@ -1301,56 +2141,51 @@ def see_anchoring_with_delimiter_point_list(delimiter_point_list,
    
 
 ''' 
-    Checks if a CanvasContour is closed. 
+    Checks if a CanvasContour is closed. Returns a set with the identifiers
+    of the DelimiterPoints that close it.
 '''
 def check_contour_is_closed(contour, root_point):
-        
-    delimiter_point_id_list = []
-
-    for neighbor in root_point.get_neighbors():
 
-        delimiter_point_id_list = union(
-            delimiter_point_id_list,
-            __check_contour_is_closed(
-                neighbor,
-                root_point.get_id(),
-                root_point.get_id(),
-                []
-            ))
-
-    contour.set_closed(root_point.get_id() in delimiter_point_id_list)
-    return delimiter_point_id_list
+    delimiter_point_id_set = __get_closing_delimiter_point_ids(root_point)
+    contour.set_closed(root_point.get_id() in delimiter_point_id_set)
+    return delimiter_point_id_set
 
 ''' 
-    Recursive function that returns a list with the DelimiterPoints that
-    closes the CanvasContour.
+    Returns a set with the identifiers of the DelimiterPoints that close
+    a cycle through given root DelimiterPoint. DelimiterPoints with less
+    than two neighbors are peeled off until only cycles remain, so each
+    DelimiterPoint and edge is visited a constant number of times.
 '''
-def __check_contour_is_closed(delimiter_point, sender_id, root_id,
-                                                     delimiter_point_id_list):
-
-    if len(delimiter_point.get_neighbors()) < 2:
-        return []
-
-    # Point is root
-    if delimiter_point.get_id() == root_id:
-        return union(delimiter_point_id_list.copy(), [root_id])
-
-    for neighbor in delimiter_point.get_neighbors():
-
-        # Neighbor isn't sender
-        if neighbor.get_id() != sender_id:
-
-            delimiter_point_id_list = union(
-                delimiter_point_id_list,
-                __check_contour_is_closed(
-                    neighbor,
-                    delimiter_point.get_id(),
-                    root_id,
-                    []
-                )
-            )
-
-    if len(delimiter_point_id_list) > 0:
-        return union(delimiter_point_id_list, [delimiter_point.get_id()])
-
-    return []   
\ No newline at end of file
+def __get_closing_delimiter_point_ids(root_point):
+
+    delimiter_point_list = get_local_neighbors(root_point)
+    degrees = {p.get_id(): len(p.get_neighbors()) for p in delimiter_point_list}
+
+    # Peel off the open ends
+    removed = set()
+    stack = [p for p in delimiter_point_list if degrees[p.get_id()] < 2]
+    while len(stack) > 0:
+
+        delimiter_point = stack.pop()
+        removed.add(delimiter_point.get_id())
+
+        for neighbor in delimiter_point.get_neighbors():
+            if neighbor.get_id() not in removed:
+                degrees[neighbor.get_id()] -= 1
+                if degrees[neighbor.get_id()] == 1:
+                    stack.append(neighbor)
+
+    if root_point.get_id() in removed:
+        return set()
+
+    # Collect the remaining DelimiterPoints reachable from root
+    delimiter_point_id_set = {root_point.get_id()}
+    stack = [root_point]
+    while len(stack) > 0:
+        for neighbor in stack.pop().get_neighbors():
+            if (neighbor.get_id() not in removed and
+                    neighbor.get_id() not in delimiter_point_id_set):
+                delimiter_point_id_set.add(neighbor.get_id())
+                stack.append(neighbor)
+
+    return delimiter_point_id_set
@@ -0,0 +1,174 @@
+# -*- encoding: utf-8 -*-
+
+'''
+    The canvas_snapshot module.
+'''
+
+# General imports
+import numpy
+
+# Custom imports
+from sample.model.canvas_model import CanvasContour, Roommate
+
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                                                             #
+# 	CanvasContourDictSnapshot                                                 #
+#                                                                             #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+class CanvasContourDictSnapshot(object):
+
+    '''
+        The CanvasContourDictSnapshot class. Immutable and compact copy of a
+        CanvasContour dictionary, used by the commands to restore the
+        CanvasModel contours.
+
+        Each CanvasContour is kept as a tuple with its closed value, and the
+        arrays copied from its ContourArray: the DelimiterPoint IDs, their
+        coordinates and their edges, as pairs of positions. Roommates are
+        kept by position. A snapshot taken over a base snapshot shares the
+        CanvasContours that didn't change with the base one. If only the
+        coordinates of a CanvasContour changed, it only keeps the positions
+        and coordinates of the moved DelimiterPoints.
+    '''
+
+    # Estimated memory usage (bytes) of a stored DelimiterPoint
+    POINT_SIZE = 48
+    # Estimated memory usage (bytes) of a stored moved DelimiterPoint
+    MOVED_POINT_SIZE = 24
+    # Estimated memory usage (bytes) of a stored CanvasContour
+    CONTOUR_SIZE = 160
+
+    ''' Initialization method. '''
+    def __init__(self, canvas_contour_dict, base=None):
+
+        # Deltas are always taken over a full snapshot
+        if base is not None and base.__base is not None:
+            base = base.__base
+
+        self.__base = base                  # The base (CanvasContourDictSnapshot)
+        # (closed, ids, coordinates, edges, roommates, moved) tuples. 'moved'
+        # is None, or the positions of the rows of 'coordinates' if only
+        # they changed from the base
+        self.__contours = {}                # The contours (tuple{})
+        self.__size = 0                     # The size (int)
+
+        base_contours = {} if base is None else base.__contours
+        for (canvas_contour_id, canvas_contour) in canvas_contour_dict.items():
+
+            contour = CanvasContourDictSnapshot.__freeze(canvas_contour)
+            base_contour = base_contours.get(canvas_contour_id)
+            if base_contour is not None:
+                contour = CanvasContourDictSnapshot.__diff(contour,
+                                                           base_contour)
+            self.__contours[canvas_contour_id] = contour
+
+            # Shared CanvasContours are not counted
+            if contour is not base_contour:
+                self.__size += CanvasContourDictSnapshot.CONTOUR_SIZE
+                if contour[5] is None:
+                    self.__size += (len(contour[1]) *
+                                    CanvasContourDictSnapshot.POINT_SIZE)
+                else:
+                    self.__size += (len(contour[5]) *
+                                    CanvasContourDictSnapshot.MOVED_POINT_SIZE)
+
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                  Methods                                    #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+    '''
+        Builds a new CanvasContour dictionary with DelimiterPoints of given
+        type.
+    '''
+    def restore(self, delimiter_point_type):
+
+        canvas_contour_dict = {}
+        for (canvas_contour_id, (closed, ids, coordinates, edges, roommates,
+                moved)) in self.__contours.items():
+
+            # Moved coordinates are applied over the base ones
+            if moved is not None:
+                moved_coordinates = coordinates
+                coordinates = self.__base.__contours[canvas_contour_id][2].copy()
+                coordinates[moved] = moved_coordinates
+
+            canvas_contour = CanvasContour(canvas_contour_id)
+            canvas_contour.set_closed(closed)
+            delimiter_point_list = canvas_contour.load(
+                ids, coordinates, edges, delimiter_point_type)
+            for (position, roommate) in roommates.items():
+                delimiter_point_list[position].set_roommate(Roommate(*roommate))
+
+            canvas_contour_dict[canvas_contour_id] = canvas_contour
+
+        return canvas_contour_dict
+
+    ''' Returns the IDs of the stored CanvasContours. '''
+    def get_contour_ids(self):
+        return list(self.__contours.keys())
+
+    '''
+        Returns the estimated memory usage (bytes) of the snapshot, not
+        counting the data it shares with its base.
+    '''
+    def get_size(self):
+        return self.__size
+
+    ''' Returns the tuple that stores given CanvasContour. '''
+    def __freeze(canvas_contour):
+
+        array = canvas_contour.get_array()
+        rows = array.get_rows()
+
+        # Rows are stored by position
+        positions = numpy.full(array.get_size(), -1, numpy.int64)
+        positions[rows] = numpy.arange(len(rows))
+        (edge_rows, neighbor_rows) = array.get_edge_rows()
+        edges = numpy.stack((positions[edge_rows], positions[neighbor_rows]),
+                            axis=1)
+
+        roommates = {}
+        for (row, roommate) in array.get_roommates().items():
+            roommates[int(positions[row])] = (
+                roommate.get_delimiter_point_type(),
+                roommate.get_canvas_contour_id(),
+                roommate.get_delimiter_point_id())
+
+        return (canvas_contour.get_closed(), array.get_ids(rows),
+                array.get_coordinates_array(rows), edges, roommates, None)
+
+    '''
+        Returns given CanvasContour tuple or, if it only differs from given
+        base one on its coordinates, the base tuple or a moved points tuple.
+    '''
+    def __diff(contour, base_contour):
+
+        (closed, ids, coordinates, edges, roommates, _) = contour
+        (_, base_ids, base_coordinates, base_edges, base_roommates, _) = \
+            base_contour
+
+        if (not numpy.array_equal(ids, base_ids) or
+                not numpy.array_equal(edges, base_edges) or
+                roommates != base_roommates):
+            return contour
+
+        moved = numpy.flatnonzero(
+            (coordinates != base_coordinates).any(axis=1))
+        if len(moved) == 0 and closed == base_contour[0]:
+            return base_contour
+
+        return (closed, base_ids, coordinates[moved], base_edges,
+                base_roommates, moved)
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                             Getters & Setters                               #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+    def get_base(self):
+        return self.__base
@@ -0,0 +1,160 @@
+# -*- encoding: utf-8 -*-
+
+'''
+    The image_cache module.
+'''
+
+# General imports
+import threading
+from collections import OrderedDict
+
+# Custom imports
+from sample.singleton import Singleton
+
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                                                             #
+# 	ImageCache                                                                #
+#                                                                             #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+class ImageCache(metaclass=Singleton):
+
+    '''
+        The ImageCache class. Extends from Singleton. Decodes the sample
+        images on demand through the loader registered for each sample and
+        keeps the most recently used ones while their size fits in the
+        memory budget.
+    '''
+
+    # Default memory budget (bytes)
+    DEFAULT_MEMORY_BUDGET = 512 * 1024 * 1024
+
+    ''' Initialization method. '''
+    def __init__(self, memory_budget=DEFAULT_MEMORY_BUDGET):
+
+        self.__memory_budget = memory_budget    # The memory_budget (int)
+        self.__loaders = {}                     # The loaders (callable{})
+        self.__uncached = set()                 # The uncached (int set)
+        self.__images = OrderedDict()           # The images (ndarray{})
+        self.__size = 0                         # The size (int)
+        self.__lock = threading.Lock()
+
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                  Methods                                    #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+    '''
+        Registers the loader that decodes the image of sample with given ID.
+        Images of loaders that are not 'cached' (e.g. memory-mapped views)
+        are requested to the loader every time and do not count against the
+        memory budget.
+    '''
+    def register(self, sample_id, loader, cached=True):
+
+        with self.__lock:
+            self.__loaders[sample_id] = loader
+            if cached:
+                self.__uncached.discard(sample_id)
+            else:
+                self.__uncached.add(sample_id)
+            self.__remove(sample_id)
+
+    ''' Forgets the loader and the image of sample with given ID. '''
+    def unregister(self, sample_id):
+
+        with self.__lock:
+            self.__loaders.pop(sample_id, None)
+            self.__uncached.discard(sample_id)
+            self.__remove(sample_id)
+
+    ''' Returns True if the image of sample with given ID is decoded lazily. '''
+    def is_registered(self, sample_id):
+        return sample_id in self.__loaders
+
+    '''
+        Returns the image of the sample with given ID, decoding it if it is
+        not cached. Returns None if the sample has no loader.
+    '''
+    def get_image(self, sample_id):
+
+        with self.__lock:
+
+            if sample_id in self.__images:
+                self.__images.move_to_end(sample_id)
+                return self.__images[sample_id]
+
+            loader = self.__loaders.get(sample_id)
+
+        if loader is None:
+            return None
+
+        # Decode outside the lock, so other samples can be served meanwhile
+        image = loader()
+
+        with self.__lock:
+
+            # Unregistered while decoding or not cached
+            if (sample_id not in self.__loaders or 
+                sample_id in self.__uncached):
+                return image
+
+            if sample_id not in self.__images:
+                self.__images[sample_id] = image
+                self.__size += image.nbytes
+                self.__evict()
+
+        return image
+
+    ''' Forgets every loader and cached image. '''
+    def reset(self):
+
+        with self.__lock:
+            self.__loaders.clear()
+            self.__uncached.clear()
+            self.__images.clear()
+            self.__size = 0
+
+    ''' Clears the cached images. Loaders are kept. '''
+    def clear(self):
+
+        with self.__lock:
+            self.__images.clear()
+            self.__size = 0
+
+    '''
+        Evicts the least recently used images until the budget is met. The
+        most recent image is always kept.
+    '''
+    def __evict(self):
+
+        while self.__size > self.__memory_budget and len(self.__images) > 1:
+            (_, image) = self.__images.popitem(last=False)
+            self.__size -= image.nbytes
+
+    ''' Removes the cached image of sample with given ID. '''
+    def __remove(self, sample_id):
+
+        image = self.__images.pop(sample_id, None)
+        if image is not None:
+            self.__size -= image.nbytes
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                             Getters & Setters                               #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+    def get_memory_budget(self):
+        return self.__memory_budget
+
+    def set_memory_budget(self, memory_budget):
+
+        with self.__lock:
+            self.__memory_budget = memory_budget
+            self.__evict()
+
+    def get_size(self):
+        return self.__size
@@ -0,0 +1,208 @@
+# -*- encoding: utf-8 -*-
+
+'''
+    The image_store module.
+'''
+
+# General imports
+import threading
+import pickle
+import numpy
+import os
+
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                                                             #
+# 	RawImageStore                                                             #
+#                                                                             #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+class RawImageStore(object):
+
+    '''
+        The RawImageStore class. Keeps decoded images as raw arrays in a
+        data file next to the project file and returns them as
+        copy-on-write numpy.memmap views, so the OS pages them in and out
+        and writes on the views never reach the file.
+
+        Images are appended to the data file and located through an index
+        file, which is replaced atomically after each append. The data file
+        is rewritten without the images that are no longer referenced when
+        they take most of it.
+    '''
+
+    DATA_FILE_EXTENSION = ".raw"
+    INDEX_FILE_EXTENSION = ".raw.idx"
+
+    # The data file is compacted when the referenced bytes fall below this
+    # ratio
+    COMPACTION_RATIO = 0.5
+
+    ''' Initialization method. '''
+    def __init__(self, path):
+
+        self.__path = path                  # The path (str)
+        self.__index = {}                   # The index ((int, tuple, str){})
+        self.__views = {}                   # The views (memmap{})
+        self.__lock = threading.Lock()
+
+        try:
+            with open(self.__get_index_path(), 'rb') as in_file:
+                self.__index = pickle.load(in_file)
+
+            # Index and data must agree
+            size = os.path.getsize(self.__get_data_path())
+            for (offset, shape, dtype) in self.__index.values():
+                if offset + RawImageStore.__get_size(shape, dtype) > size:
+                    self.__index = {}
+                    break
+
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.__index = {}
+
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                  Methods                                    #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+    ''' Returns the mapped image stored with given key or None. '''
+    def get(self, key):
+
+        with self.__lock:
+
+            if key in self.__views:
+                return self.__views[key]
+
+            if key not in self.__index:
+                return None
+
+            (offset, shape, dtype) = self.__index[key]
+            view = numpy.memmap(self.__get_data_path(), dtype=dtype,
+                                mode='c', offset=offset, shape=shape)
+            self.__views[key] = view
+            return view
+
+    ''' 
+        Stores given image with given key and returns its mapped view. If an
+        image is already stored with that key, it is kept.
+    '''
+    def put(self, key, image):
+
+        image = numpy.ascontiguousarray(image)
+
+        with self.__lock:
+
+            if key not in self.__index:
+
+                with open(self.__get_data_path(), 'ab') as out_file:
+                    offset = out_file.tell()
+                    out_file.write(image.tobytes())
+                    out_file.flush()
+                    os.fsync(out_file.fileno())
+
+                self.__index[key] = (offset, image.shape, image.dtype.str)
+                self.__write_index()
+
+        return self.get(key)
+
+    '''
+        Drops the images whose keys are not in given ones, once they take
+        most of the data file. Views already returned stay valid where the
+        OS allows it.
+    '''
+    def compact(self, keys):
+
+        with self.__lock:
+
+            index = {key: self.__index[key] for key in keys
+                     if key in self.__index}
+            live_size = sum(RawImageStore.__get_size(shape, dtype)
+                            for (_, shape, dtype) in index.values())
+            try:
+                size = os.path.getsize(self.__get_data_path())
+            except OSError:
+                return
+            if live_size >= RawImageStore.COMPACTION_RATIO * size:
+                return
+
+            temporary_path = self.__get_data_path() + ".tmp"
+            compacted_index = {}
+            with open(self.__get_data_path(), 'rb') as in_file, \
+                 open(temporary_path, 'wb') as out_file:
+
+                for (key, (offset, shape, dtype)) in index.items():
+                    in_file.seek(offset)
+                    compacted_index[key] = (out_file.tell(), shape, dtype)
+                    out_file.write(in_file.read(
+                        RawImageStore.__get_size(shape, dtype)))
+
+                out_file.flush()
+                os.fsync(out_file.fileno())
+
+            # The index goes first, so a crash before the new one is written
+            # leaves an empty store instead of a wrong one
+            try:
+                os.remove(self.__get_index_path())
+                os.replace(temporary_path, self.__get_data_path())
+            except OSError as err:
+                # Data file still mapped
+                print(err)
+                RawImageStore.__remove_file(temporary_path)
+                self.__write_index()
+                return
+
+            self.__index = compacted_index
+            self.__views = {}
+            self.__write_index()
+
+    ''' Returns True if there is a store at given path. '''
+    def exists(path):
+        return os.path.exists(path + RawImageStore.INDEX_FILE_EXTENSION)
+
+    '''
+        Removes the store files at given path. Views already returned stay
+        valid where the OS allows it.
+    '''
+    def remove(path):
+
+        for extension in (RawImageStore.INDEX_FILE_EXTENSION,
+                          RawImageStore.DATA_FILE_EXTENSION):
+            RawImageStore.__remove_file(path + extension)
+
+    ''' Atomically replaces the index file with the current index. '''
+    def __write_index(self):
+
+        temporary_path = self.__get_index_path() + ".tmp"
+        with open(temporary_path, 'wb') as out_file:
+            pickle.dump(self.__index, out_file, pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, self.__get_index_path())
+
+    ''' Returns the size (bytes) of an image of given shape and dtype. '''
+    def __get_size(shape, dtype):
+        return numpy.dtype(dtype).itemsize * int(numpy.prod(shape))
+
+    ''' Removes the file at given path, if any. '''
+    def __remove_file(path):
+
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    ''' Returns the data file path. '''
+    def __get_data_path(self):
+        return self.__path + RawImageStore.DATA_FILE_EXTENSION
+
+    ''' Returns the index file path. '''
+    def __get_index_path(self):
+        return self.__path + RawImageStore.INDEX_FILE_EXTENSION
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                             Getters & Setters                               #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+    def get_path(self):
+        return self.__path
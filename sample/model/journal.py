@@ -0,0 +1,334 @@
+# -*- encoding: utf-8 -*-
+
+'''
+    The journal module.
+'''
+
+# General imports
+import hashlib
+import pickle
+import struct
+import zlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Custom imports
+import sample.model.utils as utils
+from sample.model.project_file import ProjectFile
+
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                                                             #
+# 	Journal                                                                   #
+#                                                                             #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+class Journal(object):
+
+    '''
+        The Journal class. Append-only log of the changes made to a project
+        since it was last saved, kept next to the project file.
+
+        The journal is a sequence of frames, each one a length and a CRC
+        followed by a pickled dictionary. The first frame lists the IDs of
+        the samples stored on the project file, in order. Every other frame
+        holds the records (see ProjectFile.dump_record()) of the samples
+        that changed since they were last journaled or saved, and the images
+        that are not stored on the project file yet. The sample order and
+        the algorithm settings are only present on the frames where they
+        changed. A torn frame at the end of the file, left by a crash, is
+        ignored when the journal is read.
+
+        Records are pickled when the changes are recorded, but images are
+        encoded and frames are written, in order, by a background thread.
+        The thread is started on the first record and stopped when the
+        journal is started again or discarded.
+    '''
+
+    FILE_EXTENSION = ".journal"
+
+    # Frame header: (payload length, payload crc)
+    FRAME_HEADER = struct.Struct('<II')
+
+    # Journal size (bytes) from which it should be compacted
+    COMPACTION_SIZE = 8 * 1024 * 1024
+
+    ''' Initialization method. '''
+    def __init__(self):
+
+        self.__path = None                  # The path (str)
+        self.__project_file = None          # The project_file (ProjectFile)
+        self.__image_ids = set()            # The image_ids (int set)
+        self.__digests = {}                 # The digests (bytes{})
+        self.__order = None                 # The order (int list)
+        self.__settings = None              # The settings (bytes)
+        self.__n_records = 0                # The n_records (int)
+        self.__size = 0                     # The size (int)
+
+        # Writes the frames one at a time, in submission order
+        self.__writer = None
+        self.__last_write = None
+
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                  Methods                                    #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+    ''' Returns the journal path of the project at given path. '''
+    def get_journal_path(project_path):
+        return project_path + Journal.FILE_EXTENSION
+
+    '''
+        Returns the valid frames of the journal of the project at given path.
+        The list is empty if there is no journal.
+    '''
+    def read(project_path):
+
+        frames = []
+        try:
+            with open(Journal.get_journal_path(project_path), 'rb') as in_file:
+
+                while True:
+
+                    header = in_file.read(Journal.FRAME_HEADER.size)
+                    if len(header) < Journal.FRAME_HEADER.size:
+                        break
+
+                    (length, crc) = Journal.FRAME_HEADER.unpack(header)
+                    payload = in_file.read(length)
+                    if len(payload) < length or zlib.crc32(payload) != crc:
+                        break
+
+                    frames.append(pickle.loads(payload))
+
+        except OSError:
+            pass
+
+        return frames
+
+    '''
+        Starts a new journal for the project at given path, whose file stores
+        the samples with given IDs. If 'recovered_sample_ids' is given, the
+        journal also records those samples of 'samples', the ordered list of
+        samples of the project, and given settings; this way changes
+        recovered from the previous journal are not lost if the new one
+        can't be written. The previous journal is replaced.
+    '''
+    def start(self, project_path, project_file, sample_ids, samples=None,
+              recovered_sample_ids=None, settings=None):
+
+        path = Journal.get_journal_path(project_path)
+        if self.__path is not None and self.__path != path:
+            self.discard()
+        else:
+            self.__stop_writer()
+            self.__reset()
+
+        self.__path = path
+        self.__project_file = project_file
+        self.__order = list(sample_ids)
+
+        # Written aside and renamed, so a valid journal is always in place
+        temporary_path = self.__path + ".tmp"
+        with open(temporary_path, 'wb') as out_file:
+            self.__size = Journal.__write_frame(out_file, {'base': sample_ids})
+            if recovered_sample_ids is not None:
+                frame = self.__build_frame(samples, recovered_sample_ids,
+                                           settings)
+                if frame is not None:
+                    Journal.__encode_images(frame)
+                    self.__size += Journal.__write_frame(out_file, frame)
+                    self.__n_records += 1
+            out_file.flush()
+            os.fsync(out_file.fileno())
+        os.replace(temporary_path, self.__path)
+
+    '''
+        Appends a frame with the records of the samples with given IDs that
+        changed. 'samples' is the ordered list of samples of the project.
+        Nothing is written if nothing changed.
+    '''
+    def record(self, samples, sample_ids, settings):
+
+        if self.__path is None:
+            return
+
+        frame = self.__build_frame(samples, sample_ids, settings)
+        if frame is None:
+            return
+
+        self.__last_write = self.__get_writer().submit(
+            self.__write_record_frame, self.__path, frame)
+        self.__n_records += 1
+
+    '''
+        Forgets that the image of the sample with given ID is journaled, so
+        it is written again on the next record.
+    '''
+    def invalidate_image(self, sample_id):
+        self.__image_ids.discard(sample_id)
+
+    ''' Flushes the journal to disk, once the pending frames are written. '''
+    def sync(self):
+
+        if self.__path is None:
+            return
+
+        self.__last_write = self.__get_writer().submit(
+            Journal.__sync_file, self.__path)
+
+    '''
+        Removes the journal file, once the pending frames are written, and
+        stops the writer thread.
+    '''
+    def discard(self):
+
+        self.__stop_writer()
+        if self.__path is not None:
+            try:
+                os.remove(self.__path)
+            except OSError:
+                pass
+
+        self.__reset()
+
+    ''' Waits until the pending frames are written. '''
+    def wait(self):
+
+        if self.__last_write is not None:
+            self.__last_write.result()
+            self.__last_write = None
+
+    ''' Returns True if the journal should be compacted. '''
+    def needs_compaction(self):
+        return self.__size >= Journal.COMPACTION_SIZE
+
+    ''' Forgets the journal state. '''
+    def __reset(self):
+
+        self.__path = None
+        self.__project_file = None
+        self.__image_ids.clear()
+        self.__digests.clear()
+        self.__order = None
+        self.__settings = None
+        self.__n_records = 0
+        self.__size = 0
+
+    '''
+        Builds a frame with the records of the samples with given IDs that
+        changed. Returns None if nothing changed.
+    '''
+    def __build_frame(self, samples, sample_ids, settings):
+
+        sample_ids = set(sample_ids)
+        records = {}
+        images = {}
+        for sample in samples:
+
+            if sample.get_id() not in sample_ids:
+                continue
+
+            # Records are journaled only if they changed
+            record = ProjectFile.dump_record(sample)
+            digest = hashlib.sha1(record).digest()
+            previous_digest = self.__digests.get(sample.get_id(),
+                self.__project_file.get_digest(sample.get_id()))
+            if digest != previous_digest:
+                records[sample.get_id()] = record
+                self.__digests[sample.get_id()] = digest
+
+            # Images are journaled once, unless they change. They are
+            # encoded by the writer
+            if (sample.get_id() not in self.__image_ids and
+                not self.__project_file.has_image(sample.get_id())):
+                images[sample.get_id()] = sample.get_image()
+                self.__image_ids.add(sample.get_id())
+
+        frame = {'records': records, 'images': images}
+
+        order = [sample.get_id() for sample in samples]
+        if order != self.__order:
+            frame['order'] = order
+            self.__order = order
+
+        pickled_settings = pickle.dumps(settings, pickle.HIGHEST_PROTOCOL)
+        if pickled_settings != self.__settings:
+            frame['settings'] = settings
+            self.__settings = pickled_settings
+
+        if len(frame) == 2 and len(records) == 0 and len(images) == 0:
+            return None
+
+        return frame
+
+    ''' Returns the writer, starting it if needed. '''
+    def __get_writer(self):
+
+        if self.__writer is None:
+            self.__writer = ThreadPoolExecutor(max_workers=1)
+        return self.__writer
+
+    ''' Waits until the pending frames are written and stops the writer. '''
+    def __stop_writer(self):
+
+        if self.__writer is not None:
+            self.__writer.shutdown(wait=True)
+            self.__writer = None
+        self.__last_write = None
+
+    '''
+        Encodes the images of given frame and appends it to the journal at
+        given path. Runs on the writer thread.
+    '''
+    def __write_record_frame(self, path, frame):
+
+        try:
+            Journal.__encode_images(frame)
+
+            with open(path, 'ab') as out_file:
+                self.__size += Journal.__write_frame(out_file, frame)
+                out_file.flush()
+
+        except Exception as err:
+            print(err)
+            print("ERROR: changes couldn't be journaled.")
+
+    ''' Encodes the images of given frame. '''
+    def __encode_images(frame):
+
+        frame['images'] = {sample_id: utils.compress_image(image)
+                           for (sample_id, image) in frame['images'].items()}
+
+    ''' Flushes the file at given path to disk. Runs on the writer thread. '''
+    def __sync_file(path):
+
+        try:
+            with open(path, 'ab') as out_file:
+                os.fsync(out_file.fileno())
+        except OSError as err:
+            print(err)
+
+    ''' Writes a frame with given payload and returns its size. '''
+    def __write_frame(out_file, payload):
+
+        data = pickle.dumps(payload, pickle.HIGHEST_PROTOCOL)
+        out_file.write(Journal.FRAME_HEADER.pack(len(data), zlib.crc32(data)))
+        out_file.write(data)
+        return Journal.FRAME_HEADER.size + len(data)
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                             Getters & Setters                               #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+    def get_path(self):
+        return self.__path
+
+    def get_n_records(self):
+        return self.__n_records
+
+    def get_size(self):
+        return self.__size
@@ -6,12 +6,16 @@
 
 # General imports
 import ntpath
-import copy
+import functools
 
 # Custom imports
+import sample.config as config
 import sample.model.utils as utils
 from sample.model.canvas_model import CanvasModel
 from sample.model.parser import Parser
+from sample.model.project_file import ProjectFile
+from sample.model.journal import Journal
+from sample.model.image_cache import ImageCache
 from sample.model.algorithms import FreeComet, OpenComet
 from sample.model.algorithm_settings import AlgorithmSettings
 from sample.model.sample import Sample
@@ -40,18 +44,28 @@ class Model(object):
     ''' Initialization method. '''
     def __init__(self):
 
+        # Images of opened projects are mapped from a RawImageStore
+        self.__memory_mapped_images = config.MEMORY_MAPPED_IMAGES
+        # Changes since the last save are journaled next to the project file
+        self.__journal = Journal()
+        # Images of opened projects are decoded on demand
+        ImageCache(config.IMAGE_CACHE_MEMORY_BUDGET)
         self.initialize()
 
     ''' Attributes initialization. '''
     def initialize(self):
         
+        self.__journal.discard()
         self.__project_path = None
+        self.__project_file = ProjectFile()
         self.__store = {}
         self.__algorithm = None
         self.__algorithm_settings = AlgorithmSettings()
         
         # Initialize CanvasModel
         CanvasModel()
+        # Forget the images of the previous project
+        ImageCache.get_instance().reset()
 
 
 
@@ -63,61 +77,141 @@ class Model(object):
     def new_project(self):
         self.initialize()
 
-    ''' 'Open project' behaviour. '''
+    '''
+        'Open project' behaviour. Returns True if changes that were not saved
+        were recovered from the project journal.
+    '''
     def open_project(self, project_path):
 
-        # Retrieve data from file
-        data = Parser.read(project_path)
+        project_file = ProjectFile()
+        recovered_sample_ids = None
+        # (loader, cached) tuples by sample ID, registered on the ImageCache
+        # once the project has been read
+        loaders = {}
+
+        # Chunked project file
+        if ProjectFile.is_project_file(project_path):
+
+            data = project_file.read(project_path)
+            for sample in data['samples']:
+                # Image is mapped from the RawImageStore on demand
+                if self.__memory_mapped_images:
+                    loaders[sample.get_id()] = (functools.partial(
+                        project_file.read_image_view, sample.get_id()), False)
+                # Image is decoded on demand
+                else:
+                    loaders[sample.get_id()] = (functools.partial(
+                        project_file.read_image, sample.get_id()), True)
+
+            # Samples as stored on the file, before replaying the journal
+            stored_sample_ids = [sample.get_id() for sample in data['samples']]
+            recovered_sample_ids = self.__replay_journal(project_path,
+                                        project_file, data, loaders)
+
+        # Legacy pickled project file
+        else:
+
+            data = Parser.read(project_path)
+            for sample in data['samples']:
+
+                # Give new ID
+                sample.set_id(next(Sample.new_id))
+                # CanvasContours were saved in zoomed coordinates
+                self.__unzoom_canvas_contours(sample)
+                # Compressed image is decoded on demand
+                loaders[sample.get_id()] = (functools.partial(
+                    utils.decompress_image, sample.get_image()), True)
+                sample.set_image(None)
 
         store = {}
         # Add to each of the stores the required information
         for sample in data['samples']:
-
-            # Give new ID
-            sample.set_id(next(Sample.new_id))
-            # Set decompressed image
-            sample.set_image(utils.decompress_image(sample.get_image()))           
-            # Add to store           
             store[sample.get_id()] = sample
 
+        # Replace the images of the previous project
+        image_cache = ImageCache.get_instance()
+        image_cache.reset()
+        for (sample_id, (loader, cached)) in loaders.items():
+            image_cache.register(sample_id, loader, cached)
+
         # Update Model
         self.__store.clear()
         self.__store = store
         self.__project_path = project_path
+        self.__project_file = project_file
         self.__algorithm_settings = data['settings'] 
 
+        # Legacy project files are journaled once saved on the chunked format
+        if ProjectFile.is_project_file(project_path):
+            try:
+                self.__journal.start(project_path, project_file,
+                                     stored_sample_ids, data['samples'],
+                                     recovered_sample_ids,
+                                     self.__algorithm_settings)
+            except OSError as err:
+                print(err)
+        else:
+            self.__journal.discard()
+
+        return recovered_sample_ids is not None
 
-    ''' 'Save project' behaviour. '''
+    '''
+        'Save project' behaviour. Only the samples that changed since the
+        last save are written if the project is saved on the same file.
+    '''
     def save_project(self, path=None):
 
         if path is None:
             path = self.__project_path
 
-        # Prepare data to be saved in memory       
-        data = {}
-
-        samples = []
-        for (_, sample) in self.__store.items():
-
-            sample_copy = copy.deepcopy(sample)
-            # Compress image
-            compressed_image = utils.compress_image(sample.get_image().copy())
-            sample_copy.set_image(compressed_image)
-            samples.append(sample_copy)
-
-        data['samples'] = samples
-        data['settings'] = self.__algorithm_settings
-
         # Save data
         try:
-            Parser.write(data, path)
+            samples = list(self.__store.values())
+            self.__project_file.write(samples, self.__algorithm_settings, path)
             if path is not None:
                 self.__project_path = path
-            return True
 
-        except:                   
+        except:
             return False
 
+        # Saved changes are no longer journaled
+        try:
+            self.__journal.start(self.__project_path, self.__project_file,
+                                 [sample.get_id() for sample in samples])
+        except OSError as err:
+            print(err)
+
+        return True
+
+    '''
+        Appends the current state of the samples with given IDs to the
+        project journal.
+    '''
+    def record_changes(self, sample_ids):
+
+        try:
+            self.__journal.record(list(self.__store.values()), sample_ids,
+                                  self.__algorithm_settings)
+        except Exception as err:
+            print(err)
+            print("ERROR: changes couldn't be journaled.")
+
+    ''' Flushes the project journal to disk. '''
+    def sync_journal(self):
+
+        try:
+            self.__journal.sync()
+        except OSError as err:
+            print(err)
+
+    ''' Returns True if the project journal should be compacted. '''
+    def journal_needs_compaction(self):
+        return self.__journal.needs_compaction()
+
+    ''' Removes the project journal, discarding the changes it holds. '''
+    def discard_journal(self):
+        self.__journal.discard()
+
     ''' Adds given sample to the store. '''
     def add_sample(self, sample):
         self.__store[sample.get_id()] = sample
@@ -135,7 +229,8 @@ class Model(object):
         return (comet, pos)
 
     ''' Analyzes given sample. '''
-    def analyze_sample(self, sample, algorithm_settings):
+    def analyze_sample(self, sample, algorithm_settings,
+                       cancellation_token=None):
 
         if algorithm_settings is None:
             algorithm_settings = self.__algorithm_settings
@@ -156,6 +251,7 @@ class Model(object):
             self.__algorithm = OpenComet()
 
         # Execute algorithm
+        self.__algorithm.cancellation_token = cancellation_token
         comet_list_contours = self.__algorithm.execute(sample)
         # Build Comet objects
         return self.__build_comets(comet_list_contours, sample)
@@ -174,8 +270,11 @@ class Model(object):
     ''' 
         Generates the output file with the segmented comet images and metrics.
     '''
-    def generate_output_file(self, filename):
-        Parser.generate_output(self.__store.values(), filename) 
+    def generate_output_file(self, filename, image_format=None,
+                             compression=None, archive=False,
+                             cancellation_token=None):
+        Parser.generate_output(list(self.__store.values()), filename, image_format,
+                               compression, archive, cancellation_token)
 
     ''' Returns the current project name. '''
     def get_project_name(self):
@@ -230,6 +329,9 @@ class Model(object):
         flipped_image = utils.flip_image_horizontally(
                             self.__store[sample_id].get_image())
         self.__store[sample_id].set_image(flipped_image)
+        self.__project_file.invalidate_image(sample_id)
+        self.__journal.invalidate_image(sample_id)
+        ImageCache.get_instance().unregister(sample_id)
 
         # Flip the comet contours
         for comet in self.__store[sample_id].get_comet_list():
@@ -242,6 +344,9 @@ class Model(object):
         inverted_image = utils.invert_image(
                              self.__store[sample_id].get_image())
         self.__store[sample_id].set_image(inverted_image)
+        self.__project_file.invalidate_image(sample_id)
+        self.__journal.invalidate_image(sample_id)
+        ImageCache.get_instance().unregister(sample_id)
         # Comet statistics must be recalculated
         for comet in self.__store[sample_id].get_comet_list():
             comet.set_updated(False)
@@ -284,6 +389,69 @@ class Model(object):
     def select_comet(self, sample_id, comet_id):
         self.get_sample(sample_id).set_selected_comet_id(comet_id)
          
+    '''
+        Replays the journal of the project at given path over the data read
+        from its file. Journaled samples keep the ID of the sample they
+        replace, and journaled images replace their loader in given dict.
+        Returns the IDs of the replayed samples, or None if there was
+        nothing to replay.
+    '''
+    def __replay_journal(self, project_path, project_file, data, loaders):
+
+        frames = Journal.read(project_path)
+
+        # Journal must belong to the current file contents
+        if (len(frames) < 2 or 'base' not in frames[0] or
+            len(frames[0]['base']) != len(data['samples'])):
+            return None
+
+        samples = dict(zip(frames[0]['base'], data['samples']))
+        sample_ids = set()
+        # Order and settings are only journaled when they change
+        order = frames[0]['base']
+        settings = data['settings']
+        for frame in frames[1:]:
+
+            for (key, record) in frame['records'].items():
+
+                sample = ProjectFile.load_record(record)
+                if key in samples:
+                    sample.set_id(samples[key].get_id())
+                else:
+                    sample.set_id(next(Sample.new_id))
+                samples[key] = sample
+                sample_ids.add(sample.get_id())
+
+            for (key, image) in frame['images'].items():
+
+                sample_id = samples[key].get_id()
+                loaders[sample_id] = (functools.partial(
+                    utils.decompress_image, image), True)
+                project_file.invalidate_image(sample_id)
+
+            order = frame.get('order', order)
+            settings = frame.get('settings', settings)
+
+        data['samples'] = [samples[key] for key in order if key in samples]
+        data['settings'] = settings
+
+        return sample_ids
+
+    '''
+        Scales the 'Free editing' and 'Comet being edited' CanvasContours of
+        given Sample, saved by legacy project files in the coordinates of its
+        zoom, to image coordinates.
+    '''
+    def __unzoom_canvas_contours(self, sample):
+
+        scale_ratio = 1. / sample.get_zoom_model()[sample.get_zoom_index()]
+        for canvas_contour_dict in (
+                sample.get_tail_contour_dict(),
+                sample.get_head_contour_dict(),
+                sample.get_comet_being_edited_tail_contour_dict(),
+                sample.get_comet_being_edited_head_contour_dict()):
+            utils.scale_canvas_contour_dict(canvas_contour_dict, scale_ratio)
+
     ''' Builds Comet objects with given contours. '''
     def __build_comets(self, comet_contours_list, sample):
 
@@ -319,4 +487,8 @@ class Model(object):
     def set_algorithm_settings(self, algorithm_settings):
         self.__algorithm_settings = algorithm_settings
 
-   
+    def get_memory_mapped_images(self):
+        return self.__memory_mapped_images
+
+    def set_memory_mapped_images(self, memory_mapped_images):
+        self.__memory_mapped_images = memory_mapped_images
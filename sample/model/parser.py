@@ -10,12 +10,18 @@ import ntpath
 import pickle
 import numpy
 import xlwt
+import cv2
 import os
+import shutil
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 # Custom imports
 from sample.model.canvas_model import CanvasModel
 import sample.model.utils as utils
 import sample.model.constants as constants
+from sample.model.cancellation import CancellationError
  
 
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
@@ -32,6 +38,17 @@ class Parser(object):
 
     FILE_EXTENSION = ".xls"
     OUTPUT_STR = "_out"
+    ARCHIVE_EXTENSION = ".zip"
+
+    # Segmented images formats
+    PNG = ".png"
+    JPEG = ".jpg"
+    TIFF = ".tiff"
+    PNG_COMPRESSION_LEVEL = 3
+    JPEG_QUALITY = 95
+
+    # Number of threads that render and encode the segmented images
+    N_WORKERS = os.cpu_count() or 1
 
     ''' Write data in given path. '''
     def write(data, path):
@@ -48,21 +65,44 @@ class Parser(object):
         in_file.close()
         return data
 
-    ''' Generates the output of current project. '''
-    def generate_output(sample_list, path):
-        
+    ''' 
+        Generates the output of current project. If given CancellationToken
+        is cancelled, a CancellationError is raised before the next sample
+        image is rendered, and the partial output dir is removed.
+    '''
+    def generate_output(sample_list, path, image_format=None,
+                        compression=None, archive=False,
+                        cancellation_token=None):
+
         # Create spreadsheet
-        workbook = Parser.generate_spreadsheet(sample_list)
+        workbook = Parser.generate_spreadsheet(sample_list, image_format)
+        if cancellation_token is not None:
+            cancellation_token.check()
         # Create dir folder
         (final_path, dir_name) = Parser.create_dir(path)
 
-        # Save spreadsheet file on output dir
-        workbook.save(os.path.join(final_path, dir_name+Parser.FILE_EXTENSION))
-        # Save segmented images on output dir
-        Parser.save_segmented_images(sample_list, final_path)
+        try:
+            # Save spreadsheet file on output dir
+            workbook.save(os.path.join(final_path,
+                                       dir_name+Parser.FILE_EXTENSION))
+            # Save segmented images on output dir
+            Parser.save_segmented_images(sample_list, final_path, image_format,
+                compression, archive, cancellation_token)
 
-    ''' Saves the segmented images on given path. '''
-    def save_segmented_images(sample_list, path):
+        # An incomplete output is not left on disk
+        except CancellationError:
+            shutil.rmtree(final_path, ignore_errors=True)
+            raise
+
+    '''
+        Saves the segmented images on given path. Samples are rendered and
+        encoded concurrently, keeping at most N_WORKERS * 2 encoded images
+        in memory. If 'archive' is True, every image is stored in a single
+        zip file instead of separate files.
+    '''
+    def save_segmented_images(sample_list, path, image_format=None,
+                              compression=None, archive=False,
+                              cancellation_token=None):
 
         # Numpy wants BGR and not RGB
         tail_color = (
@@ -77,22 +117,95 @@ class Parser(object):
             CanvasModel.get_instance().get_head_color().red * constants.MAX_VALUE
         )
 
-        for sample in sample_list:
-        
-            image_copy = numpy.copy(sample.get_image())
-            n = 1
-            for comet in sample.get_comet_list():
-            
-                if comet.get_tail_contour() is not None:
-                    utils.draw_contours(image_copy, [comet.get_tail_contour()],
-                        tail_color, 1)
-                utils.draw_contours(image_copy, [comet.get_head_contour()],
-                    head_color, 1)
-                    
-                n += 1
+        zip_file = None
+        if archive:
+            zip_file = zipfile.ZipFile(os.path.join(path,
+                ntpath.basename(path) + Parser.ARCHIVE_EXTENSION), 'w',
+                zipfile.ZIP_STORED)
+
+        try:
+            with ThreadPoolExecutor(max_workers=Parser.N_WORKERS) as executor:
+
+                pending = deque()
+                for sample in sample_list:
+
+                    # Queued images are dropped if cancelled
+                    if (cancellation_token is not None and
+                            cancellation_token.is_cancelled()):
+                        for future in pending:
+                            future.cancel()
+                        cancellation_token.check()
+
+                    pending.append(executor.submit(
+                        Parser.render_segmented_image, sample, tail_color,
+                        head_color, image_format, compression))
+
+                    # Bound the number of encoded images held in memory
+                    if len(pending) >= Parser.N_WORKERS * 2:
+                        Parser.store_segmented_image(
+                            pending.popleft().result(), path, zip_file)
 
-            utils.save_image(image_copy, os.path.join(
-                path, Parser.get_image_output_name(sample.get_name())))
+                while len(pending) > 0:
+                    Parser.store_segmented_image(
+                        pending.popleft().result(), path, zip_file)
+
+        finally:
+            if zip_file is not None:
+                zip_file.close()
+
+    '''
+        Draws the comet contours of given sample on a copy of its image and
+        encodes it. Returns the output name and the encoded bytes.
+    '''
+    def render_segmented_image(sample, tail_color, head_color,
+                               image_format=None, compression=None):
+
+        image_copy = numpy.copy(sample.get_image())
+        for comet in sample.get_comet_list():
+
+            if comet.get_tail_contour() is not None:
+                utils.draw_contours(image_copy, [comet.get_tail_contour()],
+                    tail_color, 1)
+            utils.draw_contours(image_copy, [comet.get_head_contour()],
+                head_color, 1)
+
+        output_name = Parser.get_image_output_name(sample.get_name(),
+                                                   image_format)
+        extension = os.path.splitext(output_name)[1]
+        data = utils.encode_image(image_copy, extension,
+            Parser.get_image_encoding_parameters(extension, compression))
+
+        return (output_name, data)
+
+    ''' Writes an encoded segmented image on disk or into given archive. '''
+    def store_segmented_image(result, path, zip_file=None):
+
+        (output_name, data) = result
+        if zip_file is not None:
+            zip_file.writestr(output_name, data)
+        else:
+            with open(os.path.join(path, output_name), 'wb') as out_file:
+                out_file.write(data)
+
+    '''
+        Returns the OpenCV encoding parameters for given extension. The
+        compression value is the PNG compression level (0-9) or the JPEG
+        quality (0-100). Other formats are encoded with OpenCV defaults.
+    '''
+    def get_image_encoding_parameters(extension, compression=None):
+
+        extension = extension.lower()
+        if extension == Parser.PNG:
+            if compression is None:
+                compression = Parser.PNG_COMPRESSION_LEVEL
+            return [cv2.IMWRITE_PNG_COMPRESSION, compression]
+
+        if extension in (Parser.JPEG, ".jpeg"):
+            if compression is None:
+                compression = Parser.JPEG_QUALITY
+            return [cv2.IMWRITE_JPEG_QUALITY, compression]
+
+        return []
 
     ''' Creates a directory to save the output. '''
     def create_dir(path):
@@ -117,7 +230,7 @@ class Parser(object):
         return (local_path+dir_name, dir_name)
 
     ''' Creates a spreadsheet with the model statistics. '''
-    def generate_spreadsheet(sample_list):
+    def generate_spreadsheet(sample_list, image_format=None):
 
         # Workbook is created 
         workbook = xlwt.Workbook()  
@@ -176,7 +289,8 @@ class Parser(object):
         for sample in sample_list:
         
         
-            sample_output_name = Parser.get_image_output_name(sample.get_name())
+            sample_output_name = Parser.get_image_output_name(
+                sample.get_name(), image_format)
             comet_number = 1                
             for comet in sample.get_comet_list():
 
@@ -259,9 +373,14 @@ class Parser(object):
         sheet.write(row, 16, fun(list[14])) 
         sheet.write(row, 17, fun(list[15]))
     
-    ''' Returns the output name of an image. '''
-    def get_image_output_name(image_name): 
+    '''
+        Returns the output name of an image. The original extension is kept
+        unless an image format is given.
+    '''
+    def get_image_output_name(image_name, image_format=None):
         name, extension = os.path.splitext(image_name)
+        if image_format is not None:
+            extension = image_format
         return (name + Parser.OUTPUT_STR + extension)
     
     
@@ -0,0 +1,491 @@
+# -*- encoding: utf-8 -*-
+
+'''
+    The project_file module.
+'''
+
+# General imports
+import hashlib
+import pickle
+import struct
+import threading
+import zlib
+import io
+import os
+
+# Custom imports
+import sample.model.utils as utils
+from sample.model.sample import Sample
+from sample.model.image_store import RawImageStore
+
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                                                             #
+# 	ProjectFile                                                               #
+#                                                                             #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+class ProjectFile(object):
+
+    '''
+        The ProjectFile class. Reads and writes the chunked project file
+        format.
+
+        The file starts with a magic string followed by two header slots.
+        Every other byte of the file belongs to an append-only chunk: one
+        pickled record per sample (without its image), one PNG chunk per
+        sample image and one index chunk that lists, in order, the chunks of
+        every sample and the algorithm settings.
+
+        Saving appends only the records that changed and the images that were
+        never written, then appends a new index and points the older header
+        slot to it. A header slot holds a sequence number and the CRC of the
+        index it points to, so a save that is interrupted before the header
+        is written leaves the previous index in place. When most of the file
+        is no longer referenced it is rewritten into a temporary file that
+        atomically replaces the original one.
+    '''
+
+    MAGIC = b'FCPROJ01'
+    VERSION = 1
+
+    # Header slot: (sequence, index offset, index length, index crc)
+    HEADER_SLOT = struct.Struct('<QQQI')
+    HEADER_SIZE = len(MAGIC) + 2 * HEADER_SLOT.size
+
+    # Persistent ID given to the sample image inside the records
+    IMAGE_ID = 'image'
+
+    # The file is compacted when the referenced bytes fall below this ratio
+    COMPACTION_RATIO = 0.5
+
+    TEMPORARY_FILE_EXTENSION = ".tmp"
+
+    ''' Initialization method. '''
+    def __init__(self):
+
+        self.__path = None         # The path (str)
+        self.__entries = {}        # The entries (SampleEntry{})
+        self.__sequence = 0        # The sequence (int)
+        self.__raw_image_store = None   # The raw_image_store (RawImageStore)
+
+        # Images are mapped from the UI and the worker threads
+        self.__raw_image_store_lock = threading.Lock()
+
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                  Methods                                    #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+    ''' Returns True if the file at given path uses the chunked format. '''
+    def is_project_file(path):
+
+        try:
+            with open(path, 'rb') as in_file:
+                return in_file.read(len(ProjectFile.MAGIC)) == ProjectFile.MAGIC
+        except OSError:
+            return False
+
+    '''
+        Reads the project at given path. Returns a dictionary with the
+        samples, which get new IDs and no image, and the algorithm settings.
+    '''
+    def read(self, path):
+
+        with open(path, 'rb') as in_file:
+
+            index = self.__read_index(in_file)
+
+            samples = []
+            entries = {}
+            for (record_ref, digest, image_ref) in index['samples']:
+
+                sample = ProjectFile.load_record(
+                             self.__read_chunk(in_file, record_ref))
+                # Give new ID
+                sample.set_id(next(Sample.new_id))
+                samples.append(sample)
+                entries[sample.get_id()] = SampleEntry(
+                                               record_ref, digest, image_ref)
+
+        self.__path = path
+        self.__entries = entries
+
+        return {'samples': samples, 'settings': index['settings']}
+
+    ''' Returns the pickled sample without its image. '''
+    def dump_record(sample):
+
+        # Images decoded on demand are not loaded just to be left out
+        image = None
+        if sample.is_image_loaded():
+            image = sample.get_image()
+
+        buffer = io.BytesIO()
+        RecordPickler(buffer, image).dump(sample)
+        return buffer.getvalue()
+
+    ''' Returns the sample, without image, pickled on given record. '''
+    def load_record(record):
+        return RecordUnpickler(io.BytesIO(record)).load()
+
+    '''
+        Returns True if the image of the sample with given ID is stored on the
+        file.
+    '''
+    def has_image(self, sample_id):
+
+        return (sample_id in self.__entries and
+                self.__entries[sample_id].get_image_ref() is not None)
+
+    '''
+        Returns the digest of the stored record of the sample with given ID,
+        or None if the sample is not stored on the file.
+    '''
+    def get_digest(self, sample_id):
+
+        if sample_id not in self.__entries:
+            return None
+        return self.__entries[sample_id].get_digest()
+
+    ''' Returns the decoded image of the sample with given ID. '''
+    def read_image(self, sample_id):
+
+        with open(self.__path, 'rb') as in_file:
+            return utils.decompress_image(self.__read_chunk(
+                in_file, self.__entries[sample_id].get_image_ref()))
+
+    '''
+        Returns the image of the sample with given ID as a view of the
+        memory-mapped RawImageStore next to the project file. The image is
+        decoded and stored the first time it is requested.
+    '''
+    def read_image_view(self, sample_id):
+
+        raw_image_store = self.__get_raw_image_store()
+
+        image_ref = self.__entries[sample_id].get_image_ref()
+        image = raw_image_store.get(image_ref)
+        if image is None:
+            # Decoded outside the lock. If two threads decode the same image,
+            # the first stored one is kept
+            image = raw_image_store.put(image_ref, self.read_image(sample_id))
+        return image
+
+    '''
+        Writes given samples and algorithm settings at given path. Only the
+        changed samples are written if the path is the one of the last read
+        or write.
+    '''
+    def write(self, samples, settings, path):
+
+        if path == self.__path and ProjectFile.is_project_file(path):
+            self.__append(samples, settings)
+            if self.__get_live_size(samples) < (ProjectFile.COMPACTION_RATIO *
+                                                os.path.getsize(path)):
+                self.__rewrite(samples, settings, path)
+            else:
+                self.__compact_raw_image_store(samples)
+        else:
+            self.__rewrite(samples, settings, path)
+
+    '''
+        Forgets the stored image of the sample with given ID, so it is written
+        again on the next save.
+    '''
+    def invalidate_image(self, sample_id):
+
+        if sample_id in self.__entries:
+            self.__entries[sample_id].set_image_ref(None)
+
+    ''' Appends the changed samples and a new index to the current file. '''
+    def __append(self, samples, settings):
+
+        with open(self.__path, 'r+b') as out_file:
+
+            out_file.seek(0, os.SEEK_END)
+
+            entries = []
+            for sample in samples:
+
+                record = ProjectFile.dump_record(sample)
+                digest = hashlib.sha1(record).digest()
+                entry = self.__entries.get(sample.get_id())
+
+                # Image is written only once
+                if entry is None or entry.get_image_ref() is None:
+                    image_ref = ProjectFile.__write_chunk(out_file,
+                        utils.compress_image(sample.get_image()))
+                else:
+                    image_ref = entry.get_image_ref()
+
+                # Record is written only if it changed
+                if entry is None or entry.get_digest() != digest:
+                    record_ref = ProjectFile.__write_chunk(out_file, record)
+                else:
+                    record_ref = entry.get_record_ref()
+
+                entries.append((sample.get_id(),
+                                SampleEntry(record_ref, digest, image_ref)))
+
+            self.__write_index(out_file, entries, settings)
+
+        for (sample_id, entry) in entries:
+            self.__entries[sample_id] = entry
+
+    '''
+        Writes a whole new file at given path. Images already stored on the
+        current file are copied without being encoded again.
+    '''
+    def __rewrite(self, samples, settings, path):
+
+        temporary_path = path + ProjectFile.TEMPORARY_FILE_EXTENSION
+        in_file = None
+        if self.__path is not None and ProjectFile.is_project_file(self.__path):
+            in_file = open(self.__path, 'rb')
+
+        try:
+            with open(temporary_path, 'wb') as out_file:
+
+                out_file.write(ProjectFile.MAGIC)
+                out_file.write(bytes(2 * ProjectFile.HEADER_SLOT.size))
+                self.__sequence = 0
+
+                entries = []
+                for sample in samples:
+
+                    entry = self.__entries.get(sample.get_id())
+                    if (in_file is not None and entry is not None and
+                        entry.get_image_ref() is not None):
+                        image = self.__read_chunk(in_file, entry.get_image_ref())
+                    else:
+                        image = utils.compress_image(sample.get_image())
+
+                    record = ProjectFile.dump_record(sample)
+                    image_ref = ProjectFile.__write_chunk(out_file, image)
+                    record_ref = ProjectFile.__write_chunk(out_file, record)
+                    entries.append((sample.get_id(), SampleEntry(record_ref,
+                                    hashlib.sha1(record).digest(), image_ref)))
+
+                self.__write_index(out_file, entries, settings)
+
+        finally:
+            if in_file is not None:
+                in_file.close()
+
+        os.replace(temporary_path, path)
+
+        # Chunk references changed, so the stored raw images are stale
+        with self.__raw_image_store_lock:
+            RawImageStore.remove(path)
+            self.__raw_image_store = None
+
+        self.__path = path
+        self.__entries = dict(entries)
+
+    '''
+        Appends the index of given entries and points the older header slot
+        to it. Data is flushed to disk before and after the header is updated.
+    '''
+    def __write_index(self, out_file, entries, settings):
+
+        index = pickle.dumps({
+            'version': ProjectFile.VERSION,
+            'settings': settings,
+            'samples': [(entry.get_record_ref(), entry.get_digest(),
+                         entry.get_image_ref()) for (_, entry) in entries]
+        }, pickle.HIGHEST_PROTOCOL)
+        (offset, length) = ProjectFile.__write_chunk(out_file, index)
+
+        out_file.flush()
+        os.fsync(out_file.fileno())
+
+        self.__sequence += 1
+        out_file.seek(len(ProjectFile.MAGIC) +
+            (self.__sequence % 2) * ProjectFile.HEADER_SLOT.size)
+        out_file.write(ProjectFile.HEADER_SLOT.pack(
+            self.__sequence, offset, length, zlib.crc32(index)))
+
+        out_file.flush()
+        os.fsync(out_file.fileno())
+
+    ''' Returns the RawImageStore of the current file, opening it if needed. '''
+    def __get_raw_image_store(self):
+
+        with self.__raw_image_store_lock:
+
+            if (self.__raw_image_store is None or
+                self.__raw_image_store.get_path() != self.__path):
+                self.__raw_image_store = RawImageStore(self.__path)
+
+            return self.__raw_image_store
+
+    ''' 
+        Drops the stored raw images that given samples no longer reference,
+        such as the ones replaced by a flipped image.
+    '''
+    def __compact_raw_image_store(self, samples):
+
+        if (self.__raw_image_store is None and
+            not RawImageStore.exists(self.__path)):
+            return
+
+        self.__get_raw_image_store().compact(
+            [self.__entries[sample.get_id()].get_image_ref()
+             for sample in samples])
+
+    ''' Returns the index pointed by the newest valid header slot. '''
+    def __read_index(self, in_file):
+
+        in_file.seek(0)
+        header = in_file.read(ProjectFile.HEADER_SIZE)
+        if (len(header) != ProjectFile.HEADER_SIZE or
+            not header.startswith(ProjectFile.MAGIC)):
+            raise ValueError("ERROR: not a project file")
+
+        slots = []
+        for n in range(2):
+            slots.append(ProjectFile.HEADER_SLOT.unpack_from(
+                header, len(ProjectFile.MAGIC) + n * ProjectFile.HEADER_SLOT.size))
+
+        for (sequence, offset, length, crc) in sorted(slots, reverse=True):
+
+            if sequence == 0:
+                continue
+
+            index = self.__read_chunk(in_file, (offset, length))
+            if len(index) == length and zlib.crc32(index) == crc:
+                self.__sequence = sequence
+                return pickle.loads(index)
+
+        raise ValueError("ERROR: project file has no valid index")
+
+    ''' Returns the size of the chunks referenced by given samples. '''
+    def __get_live_size(self, samples):
+
+        size = ProjectFile.HEADER_SIZE
+        for sample in samples:
+            entry = self.__entries[sample.get_id()]
+            size += entry.get_record_ref()[1] + entry.get_image_ref()[1]
+        return size
+
+    ''' Reads the chunk with given (offset, length) reference. '''
+    def __read_chunk(self, in_file, ref):
+
+        (offset, length) = ref
+        in_file.seek(offset)
+        return in_file.read(length)
+
+    ''' Writes given data at the current position and returns its reference. '''
+    def __write_chunk(out_file, data):
+
+        offset = out_file.tell()
+        out_file.write(data)
+        return (offset, len(data))
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                             Getters & Setters                               #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+    def get_path(self):
+        return self.__path
+
+    def set_path(self, path):
+        self.__path = path
+
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                                                             #
+# 	SampleEntry                                                               #
+#                                                                             #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+class SampleEntry(object):
+
+    '''
+        The SampleEntry class. Location of a sample's chunks on the file.
+    '''
+
+    ''' Initialization method. '''
+    def __init__(self, record_ref, digest, image_ref):
+
+        self.__record_ref = record_ref      # The record_ref ((int, int))
+        self.__digest = digest              # The digest (bytes)
+        self.__image_ref = image_ref        # The image_ref ((int, int))
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                             Getters & Setters                               #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+    def get_record_ref(self):
+        return self.__record_ref
+
+    def set_record_ref(self, record_ref):
+        self.__record_ref = record_ref
+
+    def get_digest(self):
+        return self.__digest
+
+    def set_digest(self, digest):
+        self.__digest = digest
+
+    def get_image_ref(self):
+        return self.__image_ref
+
+    def set_image_ref(self, image_ref):
+        self.__image_ref = image_ref
+
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                                                             #
+# 	RecordPickler                                                             #
+#                                                                             #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+class RecordPickler(pickle.Pickler):
+
+    '''
+        The RecordPickler class. Extends from pickle.Pickler. Pickles a
+        sample replacing its image by a persistent ID.
+    '''
+
+    ''' Initialization method. '''
+    def __init__(self, file, image):
+
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.__image = image
+
+    ''' pickle.Pickler.persistent_id() implementation method. '''
+    def persistent_id(self, obj):
+
+        if self.__image is not None and obj is self.__image:
+            return ProjectFile.IMAGE_ID
+        return None
+
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                                                             #
+# 	RecordUnpickler                                                           #
+#                                                                             #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+class RecordUnpickler(pickle.Unpickler):
+
+    '''
+        The RecordUnpickler class. Extends from pickle.Unpickler. The sample
+        image is left empty.
+    '''
+
+    ''' pickle.Unpickler.persistent_load() implementation method. '''
+    def persistent_load(self, pid):
+
+        if pid == ProjectFile.IMAGE_ID:
+            return None
+        raise pickle.UnpicklingError("ERROR: unknown persistent ID")
@@ -7,6 +7,9 @@
 # General imports
 import itertools
 
+# Custom imports
+from sample.model.image_cache import ImageCache
+
 
 
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
@@ -90,6 +93,13 @@ class Sample(object):
             if comet.get_id() == comet_id:
                 return comet
 
+    ''' 
+        Returns True if the image is kept by the sample, False if it is
+        decoded on demand by the ImageCache.
+    '''
+    def is_image_loaded(self):
+        return self.__image is not None
+
 
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
 #                              Getters & Setters                              #
@@ -108,6 +118,10 @@ class Sample(object):
         self.__name = name
 
     def get_image(self):
+
+        # Image decoded on demand
+        if self.__image is None:
+            return ImageCache.get_instance().get_image(self.__id)
         return self.__image
 
     def set_image(self, image):
@@ -0,0 +1,218 @@
+# -*- encoding: utf-8 -*-
+
+'''
+    The test_canvas_model module. Tests the array-backed CanvasContours.
+'''
+
+# General imports
+import pickle
+import unittest
+import numpy
+
+# Custom imports
+from sample.model.canvas_model import (CanvasModel, CanvasContour,
+    DelimiterPoint, DelimiterPointType, HeadContourBuilder,
+    SelectedDelimiterPoint, Roommate, make_neighbors, unmake_neighbors)
+
+
+
+''' Returns the sorted neighbor IDs of given DelimiterPoint. '''
+def get_neighbor_ids(delimiter_point):
+    return sorted(neighbor.get_id() for neighbor
+                  in delimiter_point.get_neighbors())
+
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                                                             #
+# 	CanvasContourTest                                                         #
+#                                                                             #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+class CanvasContourTest(unittest.TestCase):
+
+    ''' Clears the CanvasModel head contours. '''
+    def setUp(self):
+
+        self.canvas_model = CanvasModel()
+        self.canvas_model.set_head_contour_dict({})
+        self.builder = HeadContourBuilder.get_instance()
+
+    ''' Loads a closed CanvasContour with given coordinates. '''
+    def load(self, coordinates):
+
+        self.canvas_model.load_opencv_contour(
+            numpy.array(coordinates, numpy.int32).reshape(-1, 1, 2),
+            self.builder)
+        return list(self.canvas_model.get_head_contour_dict().values())[-1]
+
+    ''' Loaded vertices are linked to their previous and next ones. '''
+    def test_load_closed_contour(self):
+
+        coordinates = [(0, 0), (10, 0), (10, 10), (0, 10)]
+        canvas_contour = self.load(coordinates)
+        points = list(canvas_contour.get_delimiter_point_dict().values())
+
+        self.assertEqual([p.get_coordinates() for p in points], coordinates)
+        for (index, point) in enumerate(points):
+            self.assertEqual(point.get_contour_id(), canvas_contour.get_id())
+            self.assertEqual(get_neighbor_ids(point), sorted(
+                (points[index - 1].get_id(), points[(index + 1) % 4].get_id())))
+
+        self.assertEqual(len(self.canvas_model.get_edges()), 4)
+        segments = self.canvas_model.get_edge_segments()
+        self.assertEqual(segments.shape, (4, 4))
+        for ((p1, p2), segment) in zip(self.canvas_model.get_edges(),
+                                       segments):
+            self.assertEqual(tuple(segment), p1.get_coordinates() +
+                                             p2.get_coordinates())
+
+    ''' Contours with less than three vertices don't repeat their edges. '''
+    def test_load_small_contours(self):
+
+        points = list(self.load([(0, 0), (10, 0)]).
+                      get_delimiter_point_dict().values())
+        self.assertEqual(get_neighbor_ids(points[0]), [points[1].get_id()])
+        self.assertEqual(get_neighbor_ids(points[1]), [points[0].get_id()])
+
+        points = list(self.load([(5, 5)]).get_delimiter_point_dict().values())
+        self.assertEqual(points[0].get_neighbors(), [])
+        self.assertEqual(len(self.canvas_model.get_edges()), 1)
+
+    ''' Moved DelimiterPoints update the arrays and the segments. '''
+    def test_set_coordinates(self):
+
+        canvas_contour = self.load([(0, 0), (10, 0), (10, 10)])
+        point = list(canvas_contour.get_delimiter_point_dict().values())[1]
+        self.canvas_model.get_edge_segments()
+
+        point.set_coordinates((20, 5))
+
+        self.assertEqual(point.get_coordinates(), (20, 5))
+        self.assertIn((20., 5.), [tuple(row) for row in self.canvas_model.
+                      get_edge_segments()[:, 0:2].tolist() +
+                      self.canvas_model.get_edge_segments()[:, 2:4].tolist()])
+        self.assertEqual(self.canvas_model.get_delimiter_points_inside_rect(
+            (15, 0, 10, 10)), [point])
+
+    ''' A DelimiterPoint can have more than two neighbors. '''
+    def test_extra_neighbors(self):
+
+        canvas_contour = self.load([(0, 0), (10, 0), (10, 10), (0, 10)])
+        points = list(canvas_contour.get_delimiter_point_dict().values())
+
+        make_neighbors(points[0], points[2])
+        self.assertEqual(len(points[0].get_neighbors()), 3)
+        self.assertEqual(len(self.canvas_model.get_edges()), 5)
+
+        unmake_neighbors(points[0], points[1])
+        self.assertEqual(get_neighbor_ids(points[0]),
+                         sorted((points[2].get_id(), points[3].get_id())))
+        self.assertEqual(len(self.canvas_model.get_edges()), 4)
+
+    ''' Removed DelimiterPoints lose their edges but keep their data. '''
+    def test_delete_delimiter_points(self):
+
+        canvas_contour = self.load([(0, 0), (10, 0), (10, 10), (0, 10)])
+        points = list(canvas_contour.get_delimiter_point_dict().values())
+
+        self.canvas_model.delete_delimiter_points([SelectedDelimiterPoint(
+            points[1].get_id(), DelimiterPointType.HEAD,
+            canvas_contour.get_id())])
+
+        self.assertNotIn(points[1].get_id(),
+                         canvas_contour.get_delimiter_point_dict())
+        self.assertFalse(canvas_contour.get_closed())
+        self.assertEqual(get_neighbor_ids(points[0]), [points[3].get_id()])
+        self.assertEqual(get_neighbor_ids(points[2]), [points[3].get_id()])
+        self.assertIsNone(points[1].get_array())
+        self.assertEqual(points[1].get_coordinates(), (10, 0))
+        self.assertEqual(len(self.canvas_model.get_edges()), 2)
+
+    ''' Connecting open contours merges them, and disconnecting splits them. '''
+    def test_connect_and_disconnect(self):
+
+        src_point = self.builder.create_delimiter_point((0, 0))
+        self.builder.create_and_connect_points(src_point, (10, 0))
+        dst_point = self.builder.create_delimiter_point((30, 0))
+        self.builder.create_and_connect_points(dst_point, (20, 0))
+        src_contour_id = src_point.get_contour_id()
+        dst_contour_id = dst_point.get_contour_id()
+        contour_dict = self.canvas_model.get_head_contour_dict()
+        self.assertEqual(len(contour_dict), 2)
+
+        self.builder.connect_points(src_point, dst_point)
+
+        self.assertEqual(len(contour_dict), 1)
+        canvas_contour = list(contour_dict.values())[0]
+        self.assertEqual(len(canvas_contour.get_delimiter_point_dict()), 4)
+        self.assertIs(src_point.get_array(), dst_point.get_array())
+        self.assertIn(dst_point.get_id(), get_neighbor_ids(src_point))
+        self.assertEqual(len(self.canvas_model.get_edges()), 3)
+
+        self.builder.disconnect_points(src_point, dst_point, src_contour_id,
+                                       dst_contour_id)
+
+        self.assertEqual(sorted(contour_dict.keys()),
+                         sorted((src_contour_id, dst_contour_id)))
+        self.assertEqual(src_point.get_contour_id(), src_contour_id)
+        self.assertEqual(len(src_point.get_neighbors()), 1)
+        self.assertEqual(src_point.get_neighbors()[0].get_coordinates(),
+                         (10, 0))
+        self.assertEqual(len(self.canvas_model.get_edges()), 2)
+
+    ''' Pickled CanvasContours are read back with their edges. '''
+    def test_pickle(self):
+
+        canvas_contour = self.load([(0, 0), (10, 0), (10, 10), (0, 10)])
+        point = list(canvas_contour.get_delimiter_point_dict().values())[0]
+        point.set_roommate(Roommate(DelimiterPointType.TAIL, 1, 2))
+
+        read_contour = pickle.loads(pickle.dumps(canvas_contour))
+        read_points = list(read_contour.get_delimiter_point_dict().values())
+
+        self.assertTrue(read_contour.get_closed())
+        self.assertEqual([p.get_coordinates() for p in read_points],
+                         [(0, 0), (10, 0), (10, 10), (0, 10)])
+        self.assertEqual(get_neighbor_ids(read_points[0]),
+                         get_neighbor_ids(point))
+        self.assertEqual(read_points[0].get_roommate().get_delimiter_point_id(),
+                         2)
+        self.assertIsNone(read_points[0].get_grid())
+
+    '''
+        Legacy CanvasContours, whose DelimiterPoints hold their coordinates
+        and neighbors, are read into a ContourArray.
+    '''
+    def test_legacy_state(self):
+
+        points = [DelimiterPoint.__new__(DelimiterPoint) for _ in range(3)]
+        for (index, point) in enumerate(points):
+            point.__setstate__({
+                '_DelimiterPoint__id': index,
+                '_DelimiterPoint__contour_id': 7,
+                '_DelimiterPoint__coordinates': (index * 10, 0),
+                '_DelimiterPoint__neighbors': [points[index - 1],
+                                               points[(index + 1) % 3]],
+                '_DelimiterPoint__roommate': None,
+                '_DelimiterPoint__type': DelimiterPointType.HEAD
+            })
+
+        canvas_contour = CanvasContour.__new__(CanvasContour)
+        canvas_contour.__setstate__({
+            '_CanvasContour__id': 7,
+            '_CanvasContour__delimiter_point_dict':
+                {p.get_id(): p for p in points},
+            '_CanvasContour__closed': True
+        })
+
+        self.assertIs(points[0].get_array(), canvas_contour.get_array())
+        self.assertEqual(points[2].get_coordinates(), (20, 0))
+        self.assertEqual(get_neighbor_ids(points[0]), [1, 2])
+        rows = canvas_contour.get_array().get_edge_rows()[0]
+        self.assertEqual(len(rows), 3)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+# -*- encoding: utf-8 -*-
+
+'''
+    The test_canvas_snapshot module. Tests the CanvasContour dictionary
+    snapshots.
+'''
+
+# General imports
+import unittest
+import numpy
+
+# Custom imports
+from sample.model.canvas_model import (CanvasModel, DelimiterPointType,
+    HeadContourBuilder, SelectedDelimiterPoint, RequestedDelimiterPoint,
+    make_roommates)
+from sample.model.canvas_snapshot import CanvasContourDictSnapshot
+
+
+
+''' Returns an octagon OpenCV contour centered on given coordinates. '''
+def create_contour(x, y):
+
+    return numpy.array([[[x + dx, y + dy]] for (dx, dy) in
+                        ((0, -20), (14, -14), (20, 0), (14, 14), (0, 20),
+                         (-14, 14), (-20, 0), (-14, -14))], numpy.int32)
+
+'''
+    Returns a comparable description of given CanvasContour dictionary:
+    the closed state of each CanvasContour, and the CanvasContour ID,
+    coordinates, neighbor IDs and roommate of each DelimiterPoint.
+'''
+def describe(canvas_contour_dict):
+
+    contours = {}
+    points = {}
+    for (canvas_contour_id, canvas_contour) in canvas_contour_dict.items():
+
+        contours[canvas_contour_id] = canvas_contour.get_closed()
+        for (delimiter_point_id, delimiter_point) in \
+                canvas_contour.get_delimiter_point_dict().items():
+
+            roommate = delimiter_point.get_roommate()
+            if roommate is not None:
+                roommate = (roommate.get_delimiter_point_type(),
+                            roommate.get_canvas_contour_id(),
+                            roommate.get_delimiter_point_id())
+            points[delimiter_point_id] = (
+                canvas_contour_id,
+                tuple(delimiter_point.get_coordinates()),
+                sorted(neighbor.get_id() for neighbor
+                       in delimiter_point.get_neighbors()),
+                roommate)
+
+    return (contours, points)
+
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                                                             #
+# 	CanvasContourDictSnapshotTest                                             #
+#                                                                             #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+class CanvasContourDictSnapshotTest(unittest.TestCase):
+
+    ''' Loads two head contours on the CanvasModel. '''
+    def setUp(self):
+
+        self.canvas_model = CanvasModel()
+        self.canvas_model.set_head_contour_dict({})
+        self.canvas_model.load_opencv_contour(
+            create_contour(50, 50), HeadContourBuilder.get_instance())
+        self.canvas_model.load_opencv_contour(
+            create_contour(150, 50), HeadContourBuilder.get_instance())
+        self.contour_dict = self.canvas_model.get_head_contour_dict()
+
+    ''' Returns the DelimiterPoints of the CanvasContour with given index. '''
+    def get_points(self, index):
+
+        canvas_contour = list(self.contour_dict.values())[index]
+        return list(canvas_contour.get_delimiter_point_dict().values())
+
+    ''' A full snapshot restores an equal CanvasContour dictionary. '''
+    def test_restore(self):
+
+        points = self.get_points(0)
+        make_roommates(points[0], self.get_points(1)[0])
+        description = describe(self.contour_dict)
+
+        snapshot = CanvasContourDictSnapshot(self.contour_dict)
+        restored = snapshot.restore(DelimiterPointType.HEAD)
+
+        self.assertEqual(describe(restored), description)
+        self.assertEqual(sorted(snapshot.get_contour_ids()),
+                         sorted(self.contour_dict.keys()))
+        self.assertIsNone(snapshot.get_base())
+        # Restored DelimiterPoints are new objects
+        restored_point = restored[points[0].get_contour_id()].\
+            get_delimiter_point_dict()[points[0].get_id()]
+        self.assertIsNot(restored_point, points[0])
+        self.assertEqual(restored_point.get_type(), DelimiterPointType.HEAD)
+
+    ''' A delta snapshot only stores the moved DelimiterPoints. '''
+    def test_moved_point(self):
+
+        base = CanvasContourDictSnapshot(self.contour_dict)
+        self.get_points(0)[2].set_coordinates((80, 52))
+        description = describe(self.contour_dict)
+
+        snapshot = CanvasContourDictSnapshot(self.contour_dict, base)
+
+        self.assertIs(snapshot.get_base(), base)
+        self.assertLess(snapshot.get_size(), base.get_size())
+        self.assertEqual(describe(snapshot.restore(DelimiterPointType.HEAD)),
+                         description)
+        # The base is not modified
+        self.assertEqual(describe(base.restore(DelimiterPointType.HEAD))[1][
+            self.get_points(0)[2].get_id()][1], (70, 50))
+
+    ''' A delta snapshot restores added and removed DelimiterPoints. '''
+    def test_added_and_removed_points(self):
+
+        base = CanvasContourDictSnapshot(self.contour_dict)
+
+        # Add a point between the first two of the first contour
+        points = self.get_points(0)
+        self.canvas_model.set_requested_delimiter_point(
+            RequestedDelimiterPoint((57, 33), (points[0], points[1])))
+        self.canvas_model.add_requested_delimiter_point()
+        # Remove a point of the second contour
+        removed_point = self.get_points(1)[4]
+        self.canvas_model.delete_delimiter_points([SelectedDelimiterPoint(
+            removed_point.get_id(), DelimiterPointType.HEAD,
+            removed_point.get_contour_id())])
+        description = describe(self.contour_dict)
+
+        snapshot = CanvasContourDictSnapshot(self.contour_dict, base)
+        restored = describe(snapshot.restore(DelimiterPointType.HEAD))
+
+        self.assertEqual(restored, description)
+        self.assertNotIn(removed_point.get_id(), restored[1])
+        self.assertFalse(restored[0][removed_point.get_contour_id()])
+
+    ''' Deltas of deltas are taken over the full base snapshot. '''
+    def test_delta_of_delta(self):
+
+        base = CanvasContourDictSnapshot(self.contour_dict)
+        self.get_points(0)[0].set_coordinates((50, 25))
+        first = CanvasContourDictSnapshot(self.contour_dict, base)
+        self.get_points(1)[0].set_coordinates((150, 25))
+        second = CanvasContourDictSnapshot(self.contour_dict, first)
+
+        self.assertIs(second.get_base(), base)
+        self.assertEqual(describe(second.restore(DelimiterPointType.HEAD)),
+                         describe(self.contour_dict))
+
+
+
+if __name__ == '__main__':
+    unittest.main()
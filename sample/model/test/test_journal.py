@@ -0,0 +1,176 @@
+# -*- encoding: utf-8 -*-
+
+'''
+    The test_journal module. Tests the project journal.
+'''
+
+# General imports
+import os
+import shutil
+import tempfile
+import unittest
+import numpy
+
+# Custom imports
+import sample.model.utils as utils
+from sample.model.sample import Sample
+from sample.model.project_file import ProjectFile
+from sample.model.journal import Journal
+
+
+
+''' Returns a new sample with a random image of given seed. '''
+def create_sample(name, seed):
+
+    image = numpy.random.RandomState(seed).randint(
+                0, 256, (8, 12, 3)).astype(numpy.uint8)
+    return Sample(name, image)
+
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                                                             #
+# 	JournalTest                                                               #
+#                                                                             #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+class JournalTest(unittest.TestCase):
+
+    ''' Creates the working directory and saves the project. '''
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "project.fc")
+        self.samples = [create_sample("sample" + str(n), n) for n in range(3)]
+        self.settings = {'algorithm': 'freecomet', 'fit_tail': True}
+        self.sample_ids = [sample.get_id() for sample in self.samples]
+
+        self.project_file = ProjectFile()
+        self.project_file.write(self.samples, self.settings, self.path)
+        self.journal = Journal()
+        self.journal.start(self.path, self.project_file, self.sample_ids)
+
+    ''' Discards the journal and removes the working directory. '''
+    def tearDown(self):
+
+        self.journal.discard()
+        shutil.rmtree(self.directory)
+
+    ''' Records, once synced, are read back on the frames that follow the base. '''
+    def test_record_and_read(self):
+
+        self.samples[1].set_name("renamed")
+        self.journal.record(self.samples, [self.sample_ids[1]], self.settings)
+        frames = self.__read_synced()
+
+        self.assertEqual(frames[0], {'base': self.sample_ids})
+        self.assertEqual(len(frames), 2)
+        self.assertEqual(list(frames[1]['records']), [self.sample_ids[1]])
+        self.assertEqual(ProjectFile.load_record(
+            frames[1]['records'][self.sample_ids[1]]).get_name(), "renamed")
+        # Stored images are not journaled
+        self.assertEqual(frames[1]['images'], {})
+
+    ''' Unchanged samples are not journaled again. '''
+    def test_record_unchanged(self):
+
+        self.journal.record(self.samples, self.sample_ids, self.settings)
+        n_records = self.journal.get_n_records()
+        self.journal.record(self.samples, self.sample_ids, self.settings)
+
+        self.assertEqual(self.journal.get_n_records(), n_records)
+
+    ''' Order and settings are only journaled on the frames where they change. '''
+    def test_order_and_settings(self):
+
+        self.samples[0].set_name("renamed")
+        self.journal.record(self.samples, [self.sample_ids[0]], self.settings)
+        self.samples.reverse()
+        self.samples[0].set_name("renamed")
+        self.journal.record(self.samples, [self.sample_ids[2]], self.settings)
+        settings = dict(self.settings, fit_tail=False)
+        self.samples[1].set_name("renamed")
+        self.journal.record(self.samples, [self.sample_ids[1]], settings)
+        frames = self.__read_synced()
+
+        self.assertEqual(len(frames), 4)
+        self.assertNotIn('order', frames[1])
+        self.assertEqual(frames[1]['settings'], self.settings)
+        self.assertEqual(frames[2]['order'], list(reversed(self.sample_ids)))
+        self.assertNotIn('settings', frames[2])
+        self.assertNotIn('order', frames[3])
+        self.assertEqual(frames[3]['settings'], settings)
+
+    ''' Images not stored on the project file are journaled once. '''
+    def test_record_images(self):
+
+        new_sample = create_sample("new", 3)
+        self.samples.append(new_sample)
+        self.journal.record(self.samples, [new_sample.get_id()], self.settings)
+        self.journal.record(self.samples, [new_sample.get_id()], self.settings)
+        frames = self.__read_synced()
+
+        self.assertEqual(frames[1]['order'],
+                         self.sample_ids + [new_sample.get_id()])
+        numpy.testing.assert_array_equal(utils.decompress_image(
+            frames[1]['images'][new_sample.get_id()]), new_sample.get_image())
+        self.assertEqual(len(frames), 2)
+
+    ''' A torn frame at the end of the journal is ignored. '''
+    def test_truncated_frame(self):
+
+        for (n, sample) in enumerate(self.samples):
+            sample.set_name("renamed" + str(n))
+            self.journal.record(self.samples, [sample.get_id()], self.settings)
+        self.__read_synced()
+
+        journal_path = Journal.get_journal_path(self.path)
+        size = os.path.getsize(journal_path)
+        with open(journal_path, 'r+b') as out_file:
+            out_file.truncate(size - 1)
+
+        frames = Journal.read(self.path)
+        self.assertEqual(len(frames), len(self.samples))
+        self.assertEqual(list(frames[-1]['records']), [self.sample_ids[1]])
+
+    '''
+        Starting the journal again with recovered samples keeps them on the
+        new journal.
+    '''
+    def test_start_with_recovered_samples(self):
+
+        self.samples[2].set_name("recovered")
+        self.journal.start(self.path, self.project_file, self.sample_ids,
+                           self.samples, [self.sample_ids[2]], self.settings)
+
+        # Written before start() returns
+        frames = Journal.read(self.path)
+        self.assertEqual(len(frames), 2)
+        self.assertEqual(frames[0], {'base': self.sample_ids})
+        self.assertEqual(ProjectFile.load_record(
+            frames[1]['records'][self.sample_ids[2]]).get_name(), "recovered")
+        self.assertEqual(frames[1]['settings'], self.settings)
+        self.assertFalse(os.path.exists(
+            Journal.get_journal_path(self.path) + ".tmp"))
+
+    ''' Discarding removes the journal file. '''
+    def test_discard(self):
+
+        self.samples[0].set_name("renamed")
+        self.journal.record(self.samples, [self.sample_ids[0]], self.settings)
+        self.journal.discard()
+
+        self.assertIsNone(self.journal.get_path())
+        self.assertEqual(Journal.read(self.path), [])
+
+    ''' Waits for the pending frames and returns the journal frames. '''
+    def __read_synced(self):
+
+        self.journal.sync()
+        self.journal.wait()
+        return Journal.read(self.path)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,246 @@
+# -*- encoding: utf-8 -*-
+
+'''
+    The test_project_file module. Tests the chunked project file format.
+'''
+
+# General imports
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+import numpy
+
+# Custom imports
+from sample.model.sample import Sample
+from sample.model.project_file import ProjectFile
+from sample.model.image_store import RawImageStore
+
+
+
+''' Returns a new sample with a random image of given seed. '''
+def create_sample(name, seed):
+
+    image = numpy.random.RandomState(seed).randint(
+                0, 256, (8, 12, 3)).astype(numpy.uint8)
+    return Sample(name, image)
+
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                                                             #
+# 	ProjectFileTest                                                           #
+#                                                                             #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+class ProjectFileTest(unittest.TestCase):
+
+    ''' Creates the working directory and the project samples. '''
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "project.fc")
+        self.samples = [create_sample("sample" + str(n), n) for n in range(3)]
+        self.settings = {'algorithm': 'freecomet', 'fit_tail': True}
+
+    ''' Removes the working directory. '''
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    ''' Written samples, images and settings are read back in order. '''
+    def test_write_and_read(self):
+
+        ProjectFile().write(self.samples, self.settings, self.path)
+
+        project_file = ProjectFile()
+        data = project_file.read(self.path)
+
+        self.assertTrue(ProjectFile.is_project_file(self.path))
+        self.assertEqual(data['settings'], self.settings)
+        self.assertEqual([sample.get_name() for sample in data['samples']],
+                         [sample.get_name() for sample in self.samples])
+
+        for (read_sample, sample) in zip(data['samples'], self.samples):
+            self.assertFalse(read_sample.is_image_loaded())
+            numpy.testing.assert_array_equal(
+                project_file.read_image(read_sample.get_id()),
+                sample.get_image())
+
+    ''' Saving again on the same file appends only the changed records. '''
+    def test_append_changed_samples(self):
+
+        project_file = ProjectFile()
+        project_file.write(self.samples, self.settings, self.path)
+        digests = [project_file.get_digest(sample.get_id())
+                   for sample in self.samples]
+        size = os.path.getsize(self.path)
+
+        self.samples[1].set_name("renamed")
+        project_file.write(self.samples, self.settings, self.path)
+
+        # The images are not written again
+        self.assertLess(os.path.getsize(self.path) - size, size / 2)
+        self.assertEqual(project_file.get_digest(self.samples[0].get_id()),
+                         digests[0])
+        self.assertNotEqual(project_file.get_digest(self.samples[1].get_id()),
+                            digests[1])
+
+        data = ProjectFile().read(self.path)
+        self.assertEqual([sample.get_name() for sample in data['samples']],
+                         ["sample0", "renamed", "sample2"])
+
+    ''' Unchanged samples are not appended again. '''
+    def test_append_unchanged_samples(self):
+
+        project_file = ProjectFile()
+        project_file.write(self.samples, self.settings, self.path)
+        size = os.path.getsize(self.path)
+
+        project_file.write(self.samples, self.settings, self.path)
+
+        # Only a new index is appended
+        self.assertLess(os.path.getsize(self.path) - size, size / 10)
+
+    ''' Removed and reordered samples are read as saved. '''
+    def test_append_order(self):
+
+        project_file = ProjectFile()
+        project_file.write(self.samples, self.settings, self.path)
+
+        samples = [self.samples[2], self.samples[0]]
+        project_file.write(samples, self.settings, self.path)
+
+        data = ProjectFile().read(self.path)
+        self.assertEqual([sample.get_name() for sample in data['samples']],
+                         ["sample2", "sample0"])
+
+    '''
+        The file is rewritten once most of it is no longer referenced, and
+        the rewritten file has the size of a fresh one.
+    '''
+    def test_compaction(self):
+
+        project_file = ProjectFile()
+        project_file.write(self.samples, self.settings, self.path)
+
+        # Each image written again leaves the previous one unreferenced
+        for _ in range(len(self.samples) + 1):
+            for sample in self.samples:
+                project_file.invalidate_image(sample.get_id())
+            project_file.write(self.samples, self.settings, self.path)
+
+        fresh_path = os.path.join(self.directory, "fresh.fc")
+        ProjectFile().write(self.samples, self.settings, fresh_path)
+
+        self.assertLessEqual(os.path.getsize(self.path),
+                             2 * os.path.getsize(fresh_path))
+        self.assertFalse(os.path.exists(
+            self.path + ProjectFile.TEMPORARY_FILE_EXTENSION))
+
+        project_file = ProjectFile()
+        data = project_file.read(self.path)
+        for (read_sample, sample) in zip(data['samples'], self.samples):
+            numpy.testing.assert_array_equal(
+                project_file.read_image(read_sample.get_id()),
+                sample.get_image())
+
+    ''' Saving on another path writes a whole new file. '''
+    def test_write_as(self):
+
+        project_file = ProjectFile()
+        project_file.write(self.samples, self.settings, self.path)
+
+        other_path = os.path.join(self.directory, "other.fc")
+        project_file.write(self.samples, self.settings, other_path)
+
+        self.assertEqual(project_file.get_path(), other_path)
+        self.assertEqual(os.path.getsize(other_path),
+                         os.path.getsize(self.path))
+
+    ''' A torn index falls back to the one of the previous save. '''
+    def test_torn_index(self):
+
+        project_file = ProjectFile()
+        project_file.write(self.samples, self.settings, self.path)
+        self.samples[0].set_name("renamed")
+        project_file.write(self.samples, self.settings, self.path)
+
+        # The last index is the tail of the file
+        with open(self.path, 'r+b') as out_file:
+            out_file.seek(-1, os.SEEK_END)
+            last_byte = out_file.read(1)
+            out_file.seek(-1, os.SEEK_END)
+            out_file.write(bytes([last_byte[0] ^ 0xFF]))
+
+        data = ProjectFile().read(self.path)
+        self.assertEqual(data['samples'][0].get_name(), "sample0")
+
+    ''' Mapped images are stored once and equal the decoded ones. '''
+    def test_read_image_view(self):
+
+        ProjectFile().write(self.samples, self.settings, self.path)
+        project_file = ProjectFile()
+        data = project_file.read(self.path)
+
+        for (read_sample, sample) in zip(data['samples'], self.samples):
+            numpy.testing.assert_array_equal(
+                project_file.read_image_view(read_sample.get_id()),
+                sample.get_image())
+        size = os.path.getsize(self.path + RawImageStore.DATA_FILE_EXTENSION)
+
+        project_file.read_image_view(data['samples'][0].get_id())
+        self.assertEqual(os.path.getsize(
+            self.path + RawImageStore.DATA_FILE_EXTENSION), size)
+
+    ''' Mapped images no longer referenced are dropped on save. '''
+    def test_raw_image_store_compaction(self):
+
+        # A large image keeps the project file from being rewritten
+        large_sample = Sample("large", numpy.random.RandomState(3).randint(
+                               0, 256, (64, 64, 3)).astype(numpy.uint8))
+        ProjectFile().write(self.samples + [large_sample], self.settings,
+                            self.path)
+
+        project_file = ProjectFile()
+        samples = project_file.read(self.path)['samples']
+        images = [sample.get_image() for sample in self.samples]
+        for sample in samples[:-1]:
+            project_file.read_image_view(sample.get_id())
+        size = os.path.getsize(self.path + RawImageStore.DATA_FILE_EXTENSION)
+
+        # Each image replaced leaves its mapped one unreferenced
+        for _ in range(2):
+            images = [numpy.fliplr(image) for image in images]
+            for (sample, image) in zip(samples, images):
+                sample.set_image(image)
+                project_file.invalidate_image(sample.get_id())
+            samples[-1].set_image(large_sample.get_image())
+            project_file.write(samples, self.settings, self.path)
+            for sample in samples:
+                sample.set_image(None)
+            for sample in samples[:-1]:
+                project_file.read_image_view(sample.get_id())
+
+        self.assertEqual(os.path.getsize(
+            self.path + RawImageStore.DATA_FILE_EXTENSION), size)
+        for (sample, image) in zip(samples, images):
+            numpy.testing.assert_array_equal(
+                project_file.read_image_view(sample.get_id()), image)
+
+    ''' Legacy pickled project files are not read as chunked files. '''
+    def test_legacy_file(self):
+
+        with open(self.path, 'wb') as out_file:
+            pickle.dump({'samples': [], 'settings': self.settings}, out_file)
+
+        self.assertFalse(ProjectFile.is_project_file(self.path))
+        self.assertFalse(ProjectFile.is_project_file(
+            os.path.join(self.directory, "missing.fc")))
+        with self.assertRaises(ValueError):
+            ProjectFile().read(self.path)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
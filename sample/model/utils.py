@@ -5,12 +5,11 @@
 '''
 
 # PyObject imports
-import gi
-gi.require_version('GdkPixbuf', '2.0')
-from gi.repository import GdkPixbuf
+import cairo
 
 # General imports
 import os
+import sys
 import cv2
 import numpy
 
@@ -28,10 +27,19 @@ def read_image(image_path: str, test_mode=False):
     if test_mode:
         image_path = os.path.join(constants.TEST_IMAGES_FOLDER_PATH, image_path)
     
-    grayscale_image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-    original_image = cv2.imread(image_path, cv2.IMREAD_COLOR)    
-
-    if grayscale_image is None or original_image is None:
+    # The file is read once and both images are decoded from its bytes.
+    # Grayscale is decoded by OpenCV, as reading it from the file did
+    original_image = None
+    grayscale_image = None
+    try:
+        data = numpy.fromfile(image_path, numpy.uint8)
+        if data.size > 0:
+            original_image = cv2.imdecode(data, cv2.IMREAD_COLOR)
+            grayscale_image = cv2.imdecode(data, cv2.IMREAD_GRAYSCALE)
+    except OSError:
+        pass
+
+    if original_image is None or grayscale_image is None:
         raise ValueError("ERROR: unable to read image " + image_path)
 
     return normalize_image(grayscale_image), original_image 
@@ -50,7 +58,18 @@ def display_image(image, window_name=None):
 
 def save_image(image, path):
     return cv2.imwrite(path, image)
-    
+
+def encode_image(image, extension, parameters=None):
+
+    if parameters is None:
+        parameters = []
+
+    (success, buffer) = cv2.imencode(extension, image, parameters)
+    if not success:
+        raise ValueError("ERROR: unable to encode image as " + extension)
+
+    return buffer.tobytes()
+
     
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
 #                                   Images                                    #
@@ -93,13 +112,25 @@ def get_red_from_image(image):
     mask = cv2.bitwise_or(left_mask, right_mask)
     return cv2.bitwise_and(image, image, mask=mask)
 
-def image_to_pixbuf(image):
+'''
+    Returns a cairo ImageSurface with given BGR image. The channels are
+    swapped once into a new buffer in the layout of cairo.FORMAT_RGB24, which
+    the surface references directly (no further copies are made). The surface
+    holds a reference to the buffer, so it is alive while the surface is.
+'''
+def image_to_surface(image):
 
-    image = image[...,[2, 1, 0]]
-    height, width, channels = image.shape
-    # Returning a copy is a must ... believe me
-    return GdkPixbuf.Pixbuf.new_from_data(image.tostring(),
-        GdkPixbuf.Colorspace.RGB, False, 8, width, height, width*channels).copy()
+    height, width = image.shape[:2]
+
+    # FORMAT_RGB24 pixels are native-endian 32 bit words (unused, R, G, B)
+    if sys.byteorder == 'little':
+        data = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+    else:
+        data = numpy.empty((height, width, 4), numpy.uint8)
+        data[..., 1:] = image[..., ::-1]
+
+    return cairo.ImageSurface.create_for_data(memoryview(data),
+        cairo.FORMAT_RGB24, width, height, width*4)
 
 def compress_image(image):
     return cv2.imencode('.png', image)[1].tostring()
@@ -182,6 +213,22 @@ def get_contour_perimeter(contour):
 
 def get_contour_convex_hull(contour):
     return cv2.convexHull(contour, False)
+
+''' 
+    Returns given closed contour simplified with the Douglas-Peucker
+    algorithm, so no removed vertex is farther than 'tolerance' pixels from
+    the result. The contour is returned as it is if the tolerance is not
+    positive or the result would have less than three vertices.
+'''
+def simplify_contour(contour, tolerance):
+
+    if tolerance <= 0:
+        return contour
+
+    simplified_contour = cv2.approxPolyDP(contour, tolerance, True)
+    if len(simplified_contour) < 3:
+        return contour
+    return simplified_contour
     
 def get_contour_rect_contour(contour):
 
@@ -347,3 +394,42 @@ def are_same_contours(image, contour1, contour2):
 def euclidean_distance(point1, point2):
     return numpy.sqrt(((point1[0]-point2[0]) * (point1[0]-point2[0])) + 
                       ((point1[1]-point2[1]) * (point1[1]-point2[1])))
+
+def edges_to_segments(edges):
+
+    segments = numpy.array(edges, dtype=numpy.float64)
+    return segments.reshape(len(edges), 4)
+
+def get_points_bounding_box(points):
+
+    x_list = [point[0] for point in points]
+    y_list = [point[1] for point in points]
+    return (min(x_list), min(y_list), max(x_list), max(y_list))
+
+def points_to_array(points):
+
+    coordinates = numpy.array(points, dtype=numpy.float64)
+    return coordinates.reshape(len(points), 2)
+
+def get_indexes_inside_rect(coordinates, rect):
+
+    (rect_x, rect_y, width, height) = rect
+    (x, y) = (coordinates[:, 0], coordinates[:, 1])
+
+    return numpy.flatnonzero((x >= rect_x) & (x <= rect_x + width) &
+                             (y >= rect_y) & (y <= rect_y + height))
+
+def get_distances_point_to_segments(point, segments):
+
+    origins = segments[:, 0:2]
+    directions = segments[:, 2:4] - origins
+    offsets = numpy.array(point, dtype=numpy.float64) - origins
+
+    length_sq = numpy.einsum('ij,ij->i', directions, directions)
+    dot = numpy.einsum('ij,ij->i', offsets, directions)
+    # Degenerate segments are measured from their first point
+    param = numpy.zeros(len(segments))
+    numpy.divide(dot, length_sq, out=param, where=length_sq != 0)
+    numpy.clip(param, 0., 1., out=param)
+
+    return numpy.hypot(*(offsets - directions * param[:, numpy.newaxis]).T)
@@ -14,10 +14,9 @@ gi.require_version('Gtk', '3.0')
 gi.require_foreign("cairo")
 from gi.repository import Gtk
 from gi.repository import Gdk
-from gi.repository import GdkPixbuf
+from gi.repository import GLib
 
 # Custom imports
-import sample.model.utils as utils
 from sample.view.color_tool import ColorTool
 
 
@@ -36,6 +35,8 @@ class Canvas(object):
 
     DEFAULT_SCROLLBAR_X_POSITION = 0
     DEFAULT_SCROLLBAR_Y_POSITION = 0
+    # Margin (pixels) around the overlay areas, for DelimiterPoints and lines
+    OVERLAY_MARGIN = 8
 
     ''' Initialization method. '''
     def __init__(self, view, gtk_builder):
@@ -99,11 +100,23 @@ class Canvas(object):
         self.__scroll_speed = 5.       
         self.__mouse_coordinates = None
         self.__move_reference_point = None
+        # Scrollbars position when the move reference point was set
+        self.__move_reference_scroll = None
 
         self.__brush = Brush()
         self.__contours_width = 1
         self.__contours_line_type = cairo.LINE_CAP_ROUND     
 
+        # Scale ratio and overlay rectangles of the last drawing
+        self.__scale_ratio = 1.
+        self.__overlay_rects = None
+
+        # Motion events are coalesced and handled once per frame
+        self.__motion_event = None
+        self.__motion_tick_id = None
+        self.__processed_motion_events = 0
+        self.__dropped_motion_events = 0
+
     ''' Restart. '''
     def restart(self):
 
@@ -140,6 +153,7 @@ class Canvas(object):
 
     ''' On key press event method. '''
     def on_key_press_event(self, event):
+        self.__flush_motion_event()
         self.__view.get_controller().on_canvas_key_press_event(event)
         self.update()
 
@@ -150,29 +164,81 @@ class Canvas(object):
 
     ''' On mouse leave callback method. '''
     def on_mouse_leave(self):
+        self.__flush_motion_event()
         self.__view.get_controller().on_canvas_mouse_leave()
         self.update()
 
     ''' On mouse release callback method. '''
     def on_mouse_release(self, event):
+        self.__flush_motion_event()
         self.__view.get_controller().on_canvas_mouse_release(event)      
         self.update()
 
     ''' On mouse click callback method. '''
     def on_mouse_click(self, event):
+        self.__flush_motion_event()
         self.__drawing_area.grab_focus()        
         self.__view.get_controller().on_canvas_mouse_click(event)
-        self.update()
 
-    ''' On mouse motion callback method. '''
-    def on_mouse_motion(self, event, pixbuf):
+        # Out of editing, clicks only change the comet selection
+        if self.__view.get_controller().get_editing():
+            self.update()
+        else:
+            self.update_overlay()
+
+    ''' 
+        On mouse motion callback method. Only the latest motion event is
+        handled, on the next frame clock tick.
+    '''
+    def on_mouse_motion(self, event):
 
         self.__mouse_coordinates = int(event.x), int(event.y)
         if not self.__is_mouse_pointer_inside_visible_area():
             return True
 
+        # A pending event is replaced by the new one
+        if self.__motion_event is not None:
+            self.__dropped_motion_events += 1
+        self.__motion_event = MotionEvent(event)
+
+        if self.__motion_tick_id is None:
+            self.__motion_tick_id = self.__drawing_area.add_tick_callback(
+                self.__on_motion_tick)
+
+    ''' Frame clock tick callback. Handles the pending motion event. '''
+    def __on_motion_tick(self, widget, frame_clock):
+
+        self.__motion_tick_id = None
+        self.__handle_motion_event()
+        return GLib.SOURCE_REMOVE
+
+    ''' 
+        Handles the pending motion event right away, so other events are
+        handled after it.
+    '''
+    def __flush_motion_event(self):
+
+        if self.__motion_tick_id is not None:
+            self.__drawing_area.remove_tick_callback(self.__motion_tick_id)
+            self.__motion_tick_id = None
+        self.__handle_motion_event()
+
+    ''' Handles the pending motion event, if any. '''
+    def __handle_motion_event(self):
+
+        if self.__motion_event is None:
+            return
+
+        event = self.__motion_event
+        self.__motion_event = None
+
+        # The active sample may have been closed since the event arrived
+        if self.__view.get_controller().get_active_sample_id() is None:
+            return
+        self.__processed_motion_events += 1
+
         self.__view.get_controller().on_canvas_mouse_motion(event)
-        self.update()
+        self.update_overlay()
 
     ''' Returns whether the mouse pointer is inside the DrawingArea's visible area or not. '''
     def __is_mouse_pointer_inside_visible_area(self):
@@ -193,43 +259,69 @@ class Canvas(object):
         return ( (mouse_x >= x_offset and mouse_x < x_offset + visible_area_width) and
                  (mouse_y >= y_offset and mouse_y < y_offset + visible_area_height) )
 
-    ''' Draw method. '''
-    def draw(self, cairo_context, pixbuf, comet_view_list):
+    ''' 
+        Draw method. Only the visible area of the image of sample with given
+        ID and SampleParameters is scaled to given ratio and painted.
+    '''
+    def draw(self, cairo_context, sample_id, sample_parameters, scale_ratio, 
+             comet_view_list):
+
+        surface = sample_parameters.get_surface()
 
         # Set drawing area size
-        self.__drawing_area.get_window().resize(pixbuf.get_width(), pixbuf.get_height())
-        self.__drawing_area.set_size_request(pixbuf.get_width(), pixbuf.get_height())
+        (displayed_width, displayed_height) = Canvas.get_displayed_size(
+                                                  surface, scale_ratio)
+        self.__drawing_area.get_window().resize(displayed_width, displayed_height)
+        self.__drawing_area.set_size_request(displayed_width, displayed_height)
 
         # (x, y) offsets
-        pixbuf_x = int(self.__viewport.get_hadjustment().get_value())
-        pixbuf_y = int(self.__viewport.get_vadjustment().get_value())
+        x = int(self.__viewport.get_hadjustment().get_value())
+        y = int(self.__viewport.get_vadjustment().get_value())
 
         # Width and height of the image's clip
         width = self.__viewport.get_allocation().width
         height = self.__viewport.get_allocation().height
-        if pixbuf_x + width > pixbuf.get_width():                            
-            width = pixbuf.get_width() - pixbuf_x
-        if pixbuf_y + height > pixbuf.get_height():
-            height = pixbuf.get_height() - pixbuf_y
+        if x + width > displayed_width:                            
+            width = displayed_width - x
+        if y + height > displayed_height:
+            height = displayed_height - y
 
         if width > 0 and height > 0: 
 
-            # Create the area of the image that will be displayed in the
-            # specific position
-            image = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB,
-                        pixbuf.get_has_alpha(), 8, width, height)
-            pixbuf.copy_area(pixbuf_x, pixbuf_y, width, height, image, 0, 0)
-
-            # Draw created area of Sample's Pixbuf
-            Gdk.cairo_set_source_pixbuf(
-                cairo_context, image, pixbuf_x, pixbuf_y)
-            cairo_context.paint()
+            # Everything is drawn inside the visible area
+            cairo_context.save()
+            cairo_context.rectangle(x, y, width, height)
+            cairo_context.clip()
+
+            # Only the exposed area, inside the visible one, is painted
+            (x1, y1, x2, y2) = cairo_context.clip_extents()
+            exposed_area = (int(x1), int(y1), int(math.ceil(x2)) - int(x1),
+                            int(math.ceil(y2)) - int(y1))
+
+            # Paint the exposed area of the image
+            if scale_ratio == 1:
+                cairo_context.set_source_surface(surface, 0, 0)
+                cairo_context.paint()
+            # Scaled images are painted from cached tiles
+            elif exposed_area[2] > 0 and exposed_area[3] > 0:
+                self.__view.get_main_window().get_zoom_tool().\
+                    get_tile_cache().paint(cairo_context, sample_id,
+                        sample_parameters, scale_ratio, exposed_area)
+
+            # Contours are kept in image coordinates and scaled here
+            cairo_context.scale(scale_ratio, scale_ratio)
 
             # Draw samples comets   
             self.__draw_sample_comets(cairo_context, comet_view_list)
 
             # Canvas state specific drawing
             self.__view.get_controller().draw(cairo_context)
+
+            cairo_context.restore()
+
+        # Keep the drawn overlay, to redraw only its area on mouse events
+        self.__scale_ratio = scale_ratio
+        self.__overlay_rects = self.__get_overlay_rects()
             
     ''' Draws the contours of the Sample's comets. '''
     def __draw_sample_comets(self, cairo_context, comet_view_list):
@@ -240,10 +332,18 @@ class Canvas(object):
             self.__brush.set_width(self.__contours_width)
             self.__brush.set_line_type(self.__contours_line_type)
 
-            # Initialize path
-            cairo_context.new_path()
+            # Exposed area in image coordinates, grown by the line width
+            (x1, y1, x2, y2) = cairo_context.clip_extents()
+            margin = abs(cairo_context.device_to_user_distance(
+                             self.__contours_width, 0)[0])
+            exposed_area = (x1 - margin, y1 - margin, x2 + margin, y2 + margin)
 
             for comet_view in comet_view_list:
+
+                # Do not draw comet if it's outside the exposed area
+                if not Canvas.__intersects(comet_view.get_bounding_box(),
+                                           exposed_area):
+                    continue
             
                 # Do not draw comet if it's currently being edited
                 if (self.__view.get_controller().get_active_sample_comet_being_edited_id() is not None and
@@ -253,35 +353,37 @@ class Canvas(object):
 
                 self.__draw_comet(cairo_context, comet_view)
 
-    ''' Draws the contours of a comet. '''
+    ''' Draws the contours of a comet from its cached cairo paths. '''
     def __draw_comet(self, cairo_context, comet_view):
 
         # Set Brush color to Tail Color
         self.__brush.set_color(self.__view.get_controller().get_tail_color())
 
         # Draw comet tail contour
-        if comet_view.get_scaled_tail_contour() is not None:
-            tail_contour = utils.contour_to_list(
-                comet_view.get_scaled_tail_contour())
-            self.__brush.draw_line(
-                cairo_context, tail_contour, close=True)
-
-        cairo_context.new_sub_path()
+        if comet_view.get_tail_path() is not None:
+            self.__brush.draw_path(cairo_context, comet_view.get_tail_path())
 
         # Set Brush color to Head color
         self.__brush.set_color(self.__view.get_controller().get_head_color())            
 
         # Draw comet head contour
-        head_contour = utils.contour_to_list(
-                           comet_view.get_scaled_head_contour())
-        self.__brush.draw_line(
-            cairo_context, head_contour, close=True)
+        self.__brush.draw_path(cairo_context, comet_view.get_head_path())
+
+    ''' Returns whether two (x1, y1, x2, y2) boxes intersect or not. '''
+    def __intersects(box1, box2):
+        return (box1[0] <= box2[2] and box2[0] <= box1[2] and
+                box1[1] <= box2[3] and box2[1] <= box1[3])
 
 
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
 #                                 Methods                                     #
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
 
+    ''' Returns the size of given image surface scaled to given ratio. '''
+    def get_displayed_size(surface, scale_ratio):
+        return (int(surface.get_width() * scale_ratio),
+                int(surface.get_height() * scale_ratio))
+
     ''' Redraw Canvas. '''
     def update(self, rect=None):
 
@@ -291,6 +393,39 @@ class Canvas(object):
         else:
             self.__drawing_area.queue_draw_area(*rect)
 
+    ''' 
+        Redraws the areas of the last drawn and the current Canvas state
+        overlays, or the whole Canvas if any of them is unknown.
+    '''
+    def update_overlay(self):
+
+        overlay_rects = self.__get_overlay_rects()
+        if self.__overlay_rects is None or overlay_rects is None:
+            self.update()
+
+        elif overlay_rects != self.__overlay_rects:
+            for rect in self.__overlay_rects + overlay_rects:
+                self.update(rect)
+
+    ''' 
+        Returns the Canvas state overlay areas as (x, y, width, height)
+        DrawingArea rectangles, or None if they are unknown.
+    '''
+    def __get_overlay_rects(self):
+
+        area = self.__view.get_controller().get_canvas_overlay_area()
+        if area is None:
+            return None
+
+        rects = []
+        for (x1, y1, x2, y2) in area:
+            x = int(math.floor(x1 * self.__scale_ratio)) - Canvas.OVERLAY_MARGIN
+            y = int(math.floor(y1 * self.__scale_ratio)) - Canvas.OVERLAY_MARGIN
+            rects.append((x, y,
+                int(math.ceil(x2 * self.__scale_ratio)) + Canvas.OVERLAY_MARGIN - x,
+                int(math.ceil(y2 * self.__scale_ratio)) + Canvas.OVERLAY_MARGIN - y))
+        return rects
+
     ''' Sets the Building buttons sensitivity. '''
     def set_build_contour_buttons_sensitivity(self, sensitivity):
         self.__build_tail_contour_button.set_sensitive(sensitivity)
@@ -301,15 +436,35 @@ class Canvas(object):
         self.__drawing_area.get_window().set_cursor(
             Gdk.Cursor.new_from_name(Gdk.Display.get_default(), cursor_name))
 
-    ''' Move scrollbars. '''
-    def move_scrollbars(self, axis):
+    ''' 
+        Starts a scrollbars movement at given pointer (root) coordinates,
+        keeping them as the move reference point along with the current
+        scrollbars position.
+    '''
+    def start_scrollbars_movement(self, point):
+
+        self.__move_reference_point = point
+        self.__move_reference_scroll = (
+            self.__scrolledwindow.get_hadjustment().get_value(),
+            self.__scrolledwindow.get_vadjustment().get_value())
+
+    ''' 
+        Moves the scrollbars by the displacement of given pointer (root)
+        coordinates from the move reference point. The displacement is
+        accumulated since the movement started, so the result does not
+        depend on how many motion events were handled.
+    '''
+    def move_scrollbars(self, point):
+
+        if self.__move_reference_point is None:
+            self.start_scrollbars_movement(point)
 
-        x_pos = int(self.__scrolledwindow.get_hadjustment().get_value())
-        y_pos = int(self.__scrolledwindow.get_vadjustment().get_value())
-        x_value = axis[0] * self.__scroll_speed
-        y_value = axis[1] * self.__scroll_speed
-        self.__scrolledwindow.get_hadjustment().set_value(x_pos + x_value)
-        self.__scrolledwindow.get_vadjustment().set_value(y_pos + y_value)
+        x_value = (self.__move_reference_point[0] - point[0]) * self.__scroll_speed
+        y_value = (self.__move_reference_point[1] - point[1]) * self.__scroll_speed
+        self.__scrolledwindow.get_hadjustment().set_value(
+            self.__move_reference_scroll[0] + x_value)
+        self.__scrolledwindow.get_vadjustment().set_value(
+            self.__move_reference_scroll[1] + y_value)
 
     ''' Switch Canvas On. '''
     def switch_on(self):
@@ -388,6 +543,12 @@ class Canvas(object):
     def set_move_reference_point(self, move_reference_point):
         self.__move_reference_point = move_reference_point
 
+    def get_processed_motion_events(self):
+        return self.__processed_motion_events
+
+    def get_dropped_motion_events(self):
+        return self.__dropped_motion_events
+
     def get_move_reference_point(self):
         return self.__move_reference_point
 
@@ -513,6 +674,33 @@ class Canvas(object):
 
 
 
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                                                             #
+# 	MotionEvent                                                               #
+#                                                                             #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ # 
+
+class MotionEvent(object):
+
+    '''
+        The MotionEvent class. Copy of the Gdk.EventMotion fields read by
+        the CanvasStates, so a motion event can be handled after GTK has
+        released it.
+    '''
+
+    __slots__ = ('x', 'y', 'x_root', 'y_root', 'state')
+
+    ''' Initialization method. '''
+    def __init__(self, event):
+
+        self.x = event.x
+        self.y = event.y
+        self.x_root = event.x_root
+        self.y_root = event.y_root
+        self.state = event.state
+
+
+
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
 #                                                                             #
 # 	Brush                                                                     #
@@ -555,14 +743,35 @@ class Brush(object):
         # Stroke
         cairo_context.stroke()
 
+    ''' Draws given (point1, point2) lines with a single stroke. '''
+    def draw_lines(self, cairo_context, lines):
+
+        self.set_properties(cairo_context)
+
+        cairo_context.new_path()
+        for (point1, point2) in lines:
+            cairo_context.move_to(point1[0], point1[1])
+            cairo_context.line_to(point2[0], point2[1])
+        cairo_context.stroke()
+
+    ''' Draws a prebuilt cairo path. '''
+    def draw_path(self, cairo_context, path):
+
+        self.set_properties(cairo_context)
+
+        cairo_context.new_path()
+        cairo_context.append_path(path)
+        cairo_context.stroke()
+
     ''' Draws a DelimiterPoint. '''
     def draw_delimiter_point(self, cairo_context, point, size):
 
         self.set_properties(cairo_context)
             
         # Draw rectangle
+        size = Brush.__to_user_distance(cairo_context, size)
         cairo_context.rectangle(
-            point[0]-(size // 2), point[1]-(size // 2), size, size)
+            point[0]-(size / 2), point[1]-(size / 2), size, size)
         # Fill rectangle
         cairo_context.fill()
         cairo_context.stroke()
@@ -573,6 +782,7 @@ class Brush(object):
         self.set_properties(cairo_context)
             
         # Draw circle
+        size = Brush.__to_user_distance(cairo_context, size)
         cairo_context.arc(
             point[0], point[1], size/2, 0., 2. * math.pi)
         # Fill circle
@@ -591,10 +801,18 @@ class Brush(object):
     ''' Sets the Cairo.context properties. '''
     def set_properties(self, cairo_context):
 
-        cairo_context.set_line_width(self.__width)          
+        cairo_context.set_line_width(
+            Brush.__to_user_distance(cairo_context, self.__width))          
         cairo_context.set_source_rgba(*self.__color)
         cairo_context.set_line_cap(self.__line_type)
 
+    ''' 
+        Returns given distance in device (screen) pixels in the current user
+        space, so lines and points keep their size at any zoom.
+    '''
+    def __to_user_distance(cairo_context, distance):
+        return abs(cairo_context.device_to_user_distance(distance, 0)[0])
+
 
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
 #                             Getters & Setters                               #
@@ -0,0 +1,110 @@
+# -*- encoding: utf-8 -*-
+
+'''
+    The comet_grid module.
+'''
+
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                                                             #
+# 	CometGrid                                                                 #
+#                                                                             #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+class CometGrid(object):
+
+    '''
+        The CometGrid class. Uniform grid over the image of a sample that
+        indexes its CometViews by bounding box, so the comets under a point
+        are found without testing every comet. Each CometView is stored in
+        every CELL_SIZE square cell its bounding box overlaps.
+    '''
+
+    # Cell side (image pixels)
+    CELL_SIZE = 64
+
+    ''' Initialization method. '''
+    def __init__(self, comet_view_list=[]):
+
+        self.__cells = {}                   # The cells (int set{})
+        self.__comet_views = {}             # The comet_views (tuple{})
+
+        for comet_view in comet_view_list:
+            self.insert(comet_view)
+
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                  Methods                                    #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+    ''' Adds given CometView to the grid. '''
+    def insert(self, comet_view):
+
+        bounding_box = comet_view.get_bounding_box()
+        cells = CometGrid.__get_cells(bounding_box)
+        for cell in cells:
+            self.__cells.setdefault(cell, set()).add(comet_view.get_id())
+
+        self.__comet_views[comet_view.get_id()] = (comet_view, cells)
+
+    ''' Removes the CometView with given ID from the grid. '''
+    def remove(self, comet_id):
+
+        (_, cells) = self.__comet_views.pop(comet_id, (None, []))
+        for cell in cells:
+            self.__cells[cell].discard(comet_id)
+            if len(self.__cells[cell]) == 0:
+                del self.__cells[cell]
+
+    ''' Moves given CometView to the cells of its current bounding box. '''
+    def update(self, comet_view):
+
+        self.remove(comet_view.get_id())
+        self.insert(comet_view)
+
+    ''' Removes every CometView. '''
+    def clear(self):
+
+        self.__cells.clear()
+        self.__comet_views.clear()
+
+    '''
+        Returns the CometViews whose bounding box contains given (x, y)
+        point, in no particular order.
+    '''
+    def query(self, point):
+
+        cell = (int(point[0] // CometGrid.CELL_SIZE),
+                int(point[1] // CometGrid.CELL_SIZE))
+
+        candidates = []
+        for comet_id in self.__cells.get(cell, ()):
+
+            comet_view = self.__comet_views[comet_id][0]
+            (x1, y1, x2, y2) = comet_view.get_bounding_box()
+            if x1 <= point[0] <= x2 and y1 <= point[1] <= y2:
+                candidates.append(comet_view)
+
+        return candidates
+
+    ''' Returns the cells overlapped by given (x1, y1, x2, y2) box. '''
+    def __get_cells(bounding_box):
+
+        (x1, y1, x2, y2) = bounding_box
+        first_column = int(x1 // CometGrid.CELL_SIZE)
+        first_row = int(y1 // CometGrid.CELL_SIZE)
+        last_column = int(x2 // CometGrid.CELL_SIZE)
+        last_row = int(y2 // CometGrid.CELL_SIZE)
+
+        return [(column, row) for row in range(first_row, last_row + 1)
+                for column in range(first_column, last_column + 1)]
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                             Getters & Setters                               #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+    def get_size(self):
+        return len(self.__comet_views)
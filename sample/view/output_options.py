@@ -0,0 +1,143 @@
+# -*- encoding: utf-8 -*-
+
+'''
+    The output_options module.
+'''
+
+
+# PyGObject imports
+import gi
+gi.require_version('Gtk', '3.0')
+from gi.repository import Gtk
+
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                                                             #
+# 	OutputOptions                                                             #
+#                                                                             #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+class OutputOptions(object):
+
+    '''
+        The OutputOptions class. Segmented images format, compression and
+        archive options shown on the GenerateOutputFileDialog.
+    '''
+
+    # Segmented images formats. The original format is kept by default
+    ORIGINAL = ""
+    PNG = ".png"
+    JPEG = ".jpg"
+    TIFF = ".tiff"
+
+    # Compression (lower, upper, default) by format. PNG compression level
+    # and JPEG quality
+    COMPRESSION_RANGES = {
+        PNG: (0, 9, 3),
+        JPEG: (0, 100, 95)
+    }
+
+    SPACING = 6
+
+    ''' Initialization method. '''
+    def __init__(self, dialog):
+
+        # # Gtk Components
+
+        # The format ComboBox
+        self.__format_label = Gtk.Label(halign=Gtk.Align.END)
+        self.__format_combobox = Gtk.ComboBoxText()
+        self.__format_combobox.append(OutputOptions.ORIGINAL, "")
+        for image_format in [OutputOptions.PNG, OutputOptions.JPEG,
+                             OutputOptions.TIFF]:
+            self.__format_combobox.append(image_format, image_format[1:].upper())
+
+        # The compression SpinButton
+        self.__compression_label = Gtk.Label(halign=Gtk.Align.END)
+        self.__compression_spinbutton = Gtk.SpinButton.new_with_range(0, 9, 1)
+
+        # The archive CheckButton
+        self.__archive_checkbutton = Gtk.CheckButton()
+
+        grid = Gtk.Grid(column_spacing=OutputOptions.SPACING,
+                        row_spacing=OutputOptions.SPACING)
+        grid.attach(self.__format_label, 0, 0, 1, 1)
+        grid.attach(self.__format_combobox, 1, 0, 1, 1)
+        grid.attach(self.__compression_label, 2, 0, 1, 1)
+        grid.attach(self.__compression_spinbutton, 3, 0, 1, 1)
+        grid.attach(self.__archive_checkbutton, 4, 0, 1, 1)
+        grid.show_all()
+        dialog.set_extra_widget(grid)
+
+        self.__format_combobox.connect(
+            "changed", self.__on_format_combobox_changed)
+
+        self.__initialize()
+
+    ''' Attributes initialization. '''
+    def __initialize(self):
+
+        self.__format_combobox.set_active_id(OutputOptions.ORIGINAL)
+        self.__archive_checkbutton.set_active(False)
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                Methods                                      #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+    ''' Sets the labels with given strings. '''
+    def set_strings(self, strings):
+
+        self.__format_label.set_label(strings.OUTPUT_OPTIONS_FORMAT_LABEL)
+        self.__set_original_format_label(
+            strings.OUTPUT_OPTIONS_ORIGINAL_FORMAT_LABEL)
+        self.__compression_label.set_label(
+            strings.OUTPUT_OPTIONS_COMPRESSION_LABEL)
+        self.__archive_checkbutton.set_label(
+            strings.OUTPUT_OPTIONS_ARCHIVE_LABEL)
+
+    '''
+        Returns the selected segmented images format, or None to keep the
+        original format.
+    '''
+    def get_image_format(self):
+
+        image_format = self.__format_combobox.get_active_id()
+        if image_format == OutputOptions.ORIGINAL:
+            return None
+        return image_format
+
+    '''
+        Returns the selected compression, or None if the format has no
+        compression setting.
+    '''
+    def get_compression(self):
+
+        if self.get_image_format() not in OutputOptions.COMPRESSION_RANGES:
+            return None
+        return self.__compression_spinbutton.get_value_as_int()
+
+    ''' Returns whether the images are written into a single archive. '''
+    def get_archive(self):
+        return self.__archive_checkbutton.get_active()
+
+    ''' Sets the label of the original format entry. '''
+    def __set_original_format_label(self, label):
+
+        model = self.__format_combobox.get_model()
+        for row in model:
+            if row[1] == OutputOptions.ORIGINAL:
+                row[0] = label
+
+    ''' Format ComboBox 'changed' callback. '''
+    def __on_format_combobox_changed(self, combobox):
+
+        compression_range = OutputOptions.COMPRESSION_RANGES.get(
+            combobox.get_active_id())
+
+        self.__compression_spinbutton.set_sensitive(compression_range is not None)
+        if compression_range is not None:
+            (lower, upper, default) = compression_range
+            self.__compression_spinbutton.set_range(lower, upper)
+            self.__compression_spinbutton.set_value(default)
@@ -0,0 +1,253 @@
+# -*- encoding: utf-8 -*-
+
+'''
+    The tile_cache module.
+'''
+
+# General imports
+from collections import OrderedDict
+
+# PyGObject imports
+import cairo
+
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                                                             #
+# 	TileCache                                                                 #
+#                                                                             #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+class TileCache(object):
+
+    '''
+        The TileCache class. Keeps the most recently drawn tiles of the
+        sample images, already scaled to their zoom level, while their pixel
+        bytes fit in the memory budget. Each tile is a TILE_SIZE square
+        cairo.ImageSurface in displayed (scaled) coordinates.
+
+        Tiles are scaled from the nearest level of the mipmap pyramid of the
+        sample image. Mipmap levels are kept under the same budget, so they
+        outlive the full resolution surface of inactive samples.
+    '''
+
+    # Tile side (pixels)
+    TILE_SIZE = 256
+
+    # Default memory budget (bytes)
+    DEFAULT_MEMORY_BUDGET = 128 * 1024 * 1024
+
+    ''' Initialization method. '''
+    def __init__(self, memory_budget=DEFAULT_MEMORY_BUDGET):
+
+        self.__memory_budget = memory_budget    # The memory_budget (int)
+        self.__tiles = OrderedDict()            # The tiles (ImageSurface{})
+        self.__size = 0                         # The size (int)
+        self.__hits = 0                         # The hits (int)
+        self.__misses = 0                       # The misses (int)
+
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                  Methods                                    #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+    '''
+        Paints the area of given rectangle (x, y, width, height) of the image
+        of sample with given ID and SampleParameters scaled to given ratio.
+        Rectangle coordinates are displayed (scaled) ones.
+    '''
+    def paint(self, cairo_context, sample_id, sample_parameters, scale_ratio,
+              rectangle):
+
+        (x, y, width, height) = rectangle
+
+        first_column = x // TileCache.TILE_SIZE
+        first_row = y // TileCache.TILE_SIZE
+        last_column = (x + width - 1) // TileCache.TILE_SIZE
+        last_row = (y + height - 1) // TileCache.TILE_SIZE
+
+        for row in range(first_row, last_row + 1):
+            for column in range(first_column, last_column + 1):
+
+                tile = self.get_tile(sample_id, sample_parameters,
+                                     scale_ratio, column, row)
+                cairo_context.set_source_surface(tile,
+                    column * TileCache.TILE_SIZE, row * TileCache.TILE_SIZE)
+                cairo_context.paint()
+
+    '''
+        Returns the tile at given column and row of the image of sample with
+        given ID and SampleParameters scaled to given ratio. It is rendered
+        if it is not cached.
+    '''
+    def get_tile(self, sample_id, sample_parameters, scale_ratio, column, row):
+
+        key = (sample_id, scale_ratio, column, row)
+
+        tile = self.__tiles.get(key)
+        if tile is not None:
+            self.__tiles.move_to_end(key)
+            self.__hits += 1
+            return tile
+
+        self.__misses += 1
+
+        source = self.get_mipmap(sample_id, sample_parameters, scale_ratio)
+        tile = TileCache.__render_tile(sample_parameters.get_surface(),
+                                       source, scale_ratio, column, row)
+        self.__add(key, tile)
+
+        return tile
+
+    '''
+        Removes the tiles and mipmaps of sample with given ID. Must be called
+        when its image changes.
+    '''
+    def invalidate(self, sample_id):
+
+        for key in [key for key in self.__tiles.keys() if key[0] == sample_id]:
+            self.__size -= TileCache.__get_tile_size(self.__tiles.pop(key))
+
+    ''' Removes every tile. Statistics are kept. '''
+    def clear(self):
+
+        self.__tiles.clear()
+        self.__size = 0
+
+    ''' Resets the hit and miss statistics. '''
+    def reset_stats(self):
+
+        self.__hits = 0
+        self.__misses = 0
+
+    ''' Returns the ratio of tile requests served from the cache. '''
+    def get_hit_ratio(self):
+
+        requests = self.__hits + self.__misses
+        if requests == 0:
+            return 0.
+        return self.__hits / requests
+
+    '''
+        Returns the smallest level of the mipmap pyramid of sample with given
+        ID and SampleParameters (the full resolution surface included) that
+        can be scaled to given ratio without upsampling. Missing levels are
+        built from the nearest cached one. Level i is 1/2^i the size of the
+        surface.
+    '''
+    def get_mipmap(self, sample_id, sample_parameters, scale_ratio):
+
+        surface = sample_parameters.get_surface()
+
+        # Wanted level
+        (width, height) = (surface.get_width(), surface.get_height())
+        (level, level_ratio) = (0, 1.)
+        while level_ratio / 2 >= scale_ratio and width > 1 and height > 1:
+            (width, height) = (width // 2, height // 2)
+            (level, level_ratio) = (level + 1, level_ratio / 2)
+
+        # Nearest cached level
+        source_level = level
+        while source_level > 0 and (sample_id, source_level) not in self.__tiles:
+            source_level -= 1
+
+        if source_level == 0:
+            mipmap = surface
+        else:
+            mipmap = self.__tiles[(sample_id, source_level)]
+            self.__tiles.move_to_end((sample_id, source_level))
+
+        for missing_level in range(source_level + 1, level + 1):
+            mipmap = TileCache.__downsample(mipmap)
+            self.__add((sample_id, missing_level), mipmap)
+
+        return mipmap
+
+    ''' Caches given surface with given key and evicts if needed. '''
+    def __add(self, key, surface):
+
+        self.__tiles[key] = surface
+        self.__size += TileCache.__get_tile_size(surface)
+        self.__evict()
+
+    '''
+        Evicts the least recently used tiles until the budget is met. The
+        most recent tile is always kept.
+    '''
+    def __evict(self):
+
+        while self.__size > self.__memory_budget and len(self.__tiles) > 1:
+            (_, tile) = self.__tiles.popitem(last=False)
+            self.__size -= TileCache.__get_tile_size(tile)
+
+    ''' 
+        Renders the tile at given column and row of given image surface
+        scaled to given ratio. It is scaled from given mipmap level.
+    '''
+    def __render_tile(surface, source, scale_ratio, column, row):
+
+        displayed_width = int(surface.get_width() * scale_ratio)
+        displayed_height = int(surface.get_height() * scale_ratio)
+
+        x = column * TileCache.TILE_SIZE
+        y = row * TileCache.TILE_SIZE
+        # Tiles on the right and bottom borders are cropped
+        width = min(TileCache.TILE_SIZE, displayed_width - x)
+        height = min(TileCache.TILE_SIZE, displayed_height - y)
+
+        tile = cairo.ImageSurface(cairo.FORMAT_RGB24,
+                                  max(width, 1), max(height, 1))
+        cairo_context = cairo.Context(tile)
+        cairo_context.translate(-x, -y)
+        cairo_context.scale(displayed_width / source.get_width(),
+                            displayed_height / source.get_height())
+        cairo_context.set_source_surface(source, 0, 0)
+        pattern = cairo_context.get_source()
+        pattern.set_extend(cairo.EXTEND_PAD)
+        if scale_ratio < 1:
+            pattern.set_filter(cairo.FILTER_GOOD)
+        else:
+            pattern.set_filter(cairo.FILTER_BILINEAR)
+        cairo_context.paint()
+        tile.flush()
+
+        return tile
+
+    ''' Returns given image surface scaled to half its size. '''
+    def __downsample(surface):
+
+        width = surface.get_width() // 2
+        height = surface.get_height() // 2
+
+        mipmap = cairo.ImageSurface(cairo.FORMAT_RGB24, width, height)
+        cairo_context = cairo.Context(mipmap)
+        cairo_context.scale(width / surface.get_width(),
+                            height / surface.get_height())
+        cairo_context.set_source_surface(surface, 0, 0)
+        cairo_context.get_source().set_filter(cairo.FILTER_GOOD)
+        cairo_context.paint()
+        mipmap.flush()
+
+        return mipmap
+
+    ''' Returns the pixel bytes of given tile. '''
+    def __get_tile_size(tile):
+        return tile.get_stride() * tile.get_height()
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                             Getters & Setters                               #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+    def get_memory_budget(self):
+        return self.__memory_budget
+
+    def get_size(self):
+        return self.__size
+
+    def get_hits(self):
+        return self.__hits
+
+    def get_misses(self):
+        return self.__misses
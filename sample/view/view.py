@@ -15,9 +15,10 @@ from gi.repository import GdkPixbuf
 from sample.dialog_response import DialogResponse
 from sample.view.windows import CometParametersWindow, MainSettingsWindow, SelectionWindow, \
                     LoadSamplesWindow, AnalyzeSamplesWindow, MainWindow, \
-                    AnalyzeSamplesLoadingWindow
+                    AnalyzeSamplesLoadingWindow, GenerateOutputFileLoadingWindow
 from sample.view.view_store import ViewStore, SampleParameters
 from sample.view.zoom_tool import ZoomTool
+from sample.view.output_options import OutputOptions
 from sample.controller.algorithm_settings_dto import AlgorithmSettingsDto
 from sample.observer import Observer
 from sample.i18n.language import Language
@@ -84,6 +85,8 @@ class View(Observer):
             self, gtk_builder)
         self.__analyze_samples_loading_window = AnalyzeSamplesLoadingWindow(
             gtk_builder)
+        self.__generate_output_file_loading_window = \
+            GenerateOutputFileLoadingWindow(gtk_builder)
         self.__load_samples_window = LoadSamplesWindow(gtk_builder)
         self.__main_settings_window = MainSettingsWindow(gtk_builder)
         self.__comet_parameters_window = CometParametersWindow(gtk_builder)
@@ -138,6 +141,8 @@ class View(Observer):
             "dialog-generate-output-file-cancel")
         self.__dialog_generate_output_file_save_button = gtk_builder.get_object(
             "dialog-generate-output-file-save")
+        self.__output_options = OutputOptions(
+            self.__dialog_generate_output_file)
         self.__dialog_comet_color_chooser = gtk_builder.get_object(
             "dialog-comet-color-chooser")
         self.__dialog_head_color_chooser = gtk_builder.get_object(
@@ -333,6 +338,10 @@ class View(Observer):
         self.__analyze_samples_loading_window.get_cancel_button().connect(
             "clicked", self.__on_analyze_samples_loading_window_cancel_button_clicked)
 
+        # GenerateOutputFileLoadingWindow
+        self.__generate_output_file_loading_window.get_cancel_button().connect(
+            "clicked", self.__on_generate_output_file_loading_window_cancel_button_clicked)
+
         # MainSettingsWindow
         self.__main_settings_window.get_window().connect(
             "delete-event", self.__on_settings_window_delete_event)
@@ -562,11 +571,18 @@ class View(Observer):
             strings.CANCEL_BUTTON_LABEL)
         self.__dialog_generate_output_file_save_button.set_label(
             strings.SAVE_BUTTON_LABEL)
+        self.__output_options.set_strings(strings)
 
         # AnalyzeSamplesLoadingWindow
         self.__analyze_samples_loading_window.get_cancel_button().set_label(
             strings.CANCEL_BUTTON_LABEL)
 
+        # GenerateOutputFileLoadingWindow
+        self.__generate_output_file_loading_window.get_top_label().set_label(
+            strings.GENERATING_OUTPUT_FILE_WINDOW_LABEL)
+        self.__generate_output_file_loading_window.get_cancel_button().set_label(
+            strings.CANCEL_BUTTON_LABEL)
+
         selection_window = self.__main_window.get_selection_window()
         # SelectionWindow
         selection_window.get_title_label().set_label(
@@ -692,7 +708,10 @@ class View(Observer):
         # Hide dialog
         self.__dialog_about.hide()
 
-    ''' Runs GenerateOutputFileDialog. '''
+    ''' 
+        Runs GenerateOutputFileDialog. Returns the response ID, the filename
+        and the segmented images format, compression and archive options.
+    '''
     def run_generate_output_file_dialog(self, filename):
 
         # Set default name
@@ -701,8 +720,11 @@ class View(Observer):
         response_id = self.__dialog_generate_output_file.run()
         # Hide dialog
         self.__dialog_generate_output_file.hide()
-        # Return response ID and filename
-        return (response_id, self.__dialog_generate_output_file.get_filename())
+        # Return response ID, filename and output options
+        return (response_id, self.__dialog_generate_output_file.get_filename(),
+                self.__output_options.get_image_format(),
+                self.__output_options.get_compression(),
+                self.__output_options.get_archive())
 
     ''' Runs ColorChooserDialog. '''
     def run_color_chooser_dialog(self, color_chooser_dialog):
@@ -918,9 +940,7 @@ class View(Observer):
     def __on_canvas_mouse_motion(self, drawing_area, event):
 
         if self.__controller.get_active_sample_id() is not None:           
-            pixbuf = self.__view_store.get_store()[self.__controller.get_active_sample_id()].\
-                get_displayed_pixbuf()       
-            self.__main_window.get_canvas().on_mouse_motion(event, pixbuf)
+            self.__main_window.get_canvas().on_mouse_motion(event)
 
     ''' Canvas 'button-press-event' callback. '''
     def __on_canvas_button_press_event(self, drawing_area, event):
@@ -937,15 +957,18 @@ class View(Observer):
         
         if self.__controller.get_active_sample_id() is not None:
 
-            # Get displayed pixbuf
-            pixbuf = self.__view_store.get_store()[self.__controller.get_active_sample_id()].\
-                get_displayed_pixbuf()
+            # Get sample parameters and zoom level
+            sample_parameters = self.__view_store.get_store()[
+                                    self.__controller.get_active_sample_id()]
+            scale_ratio = self.__controller.get_sample_zoom_value(
+                self.__controller.get_active_sample_id())
             # Get comet view list
             comet_view_list = self.__view_store.\
                 get_store()[self.__controller.get_active_sample_id()].get_comet_view_list()                
             # Draw
             self.__main_window.get_canvas().draw(
-                cairo_context, pixbuf, comet_view_list)
+                cairo_context, self.__controller.get_active_sample_id(),
+                sample_parameters, scale_ratio, comet_view_list)
 
     ''' Canvas Horizontal Scrollbar 'changed-value' callback. '''
     def __on_canvas_horizontal_scrollbar_value_changed(self, scrollbar):
@@ -1040,22 +1063,13 @@ class View(Observer):
                 # Combobox Entry unlimited length
                 combobox.get_child().set_max_length(ZoomTool.UNLIMITED)
 
-                # Scale image
-                pixbuf = sample_parameters.get_original_pixbuf()
-                scaled_pixbuf = zoom_tool.apply_zoom(
-                    self.__controller.get_active_sample_id(), pixbuf)
-                    
-                # Scale Active Sample Comets    
-                requested_scale_ratio = self.__main_window.get_zoom_tool()\
-                                            .get_active_scale_ratio()
-                self.__controller.scale_active_sample_comets(
-                    requested_scale_ratio)
+                # The image and the contours are scaled when drawn
+                requested_scale_ratio = zoom_tool.apply_zoom()
 
                 # Update Active Sample Parameters
                 current_scale_ratio = self.__controller.get_sample_zoom_value(
                                           self.__controller.get_active_sample_id())
                 scale_ratio = requested_scale_ratio / current_scale_ratio
-                sample_parameters.set_displayed_pixbuf(scaled_pixbuf)
                 self.__controller.set_sample_zoom_index(
                     self.__controller.get_active_sample_id(), zoom_tool.get_active())
                 x_pos = sample_parameters.get_scroll_x_position()
@@ -1272,6 +1286,17 @@ class View(Observer):
         self.__analyze_samples_loading_window.set_cancelled(True)
         self.__controller.stop_analyze_samples_thread()
 
+    #                                                                  #
+    # #     #    GenerateOutputFileLoadingWindow callbacks     #     # #
+    #                                                                  #
+
+    ''' GenerateOutputFileLoadingWindow 'Cancel' Button 'clicked' callback. '''
+    def __on_generate_output_file_loading_window_cancel_button_clicked(self, button):
+
+        button.set_sensitive(False)
+        self.__generate_output_file_loading_window.set_cancelled(True)
+        self.__controller.stop_generate_output_file_thread()
+
     #                                            #
     # #     #       SettingsWindow      #      # #
     #                                            #
@@ -1450,6 +1475,7 @@ class View(Observer):
         self.__main_settings_window.restart()
         self.__main_window.restart()
         self.__analyze_samples_loading_window.restart()
+        self.__generate_output_file_loading_window.restart()
 
     ''' Observer.update() implementation method. '''
     def update(self, store):
@@ -1597,6 +1623,13 @@ class View(Observer):
     def run_analyze_samples_loading_window(self):
         self.__analyze_samples_loading_window.show()
 
+    ''' Runs GenerateOutputFileLoadingWindow with given output filename. '''
+    def run_generate_output_file_loading_window(self, filename):
+
+        self.__generate_output_file_loading_window.get_bottom_label().set_label(
+            filename)
+        self.__generate_output_file_loading_window.show()
+
     ''' Closes LoadSamplesWindow. '''
     def close_load_samples_window(self):
         self.__load_samples_window.hide()
@@ -1605,6 +1638,10 @@ class View(Observer):
     def close_analyze_samples_loading_window(self):
         self.__analyze_samples_loading_window.hide()
 
+    ''' Closes GenerateOutputFileLoadingWindow. '''
+    def close_generate_output_file_loading_window(self):
+        self.__generate_output_file_loading_window.hide()
+
     ''' 
         Threading Synchronous method to update the configuration of
         LoadSamplesWindow.
@@ -1661,6 +1698,16 @@ class View(Observer):
             return self.__view_store.get_store()[self.__controller.get_active_sample_id()].\
                 get_comet_view_list()
 
+    ''' 
+        Returns the active sample's CometViews whose bounding box contains
+        given point.
+    '''
+    def get_active_sample_comet_views_at(self, point):
+
+        if self.__controller.get_active_sample_id() is not None:
+            return self.__view_store.get_store()[self.__controller.get_active_sample_id()].\
+                get_comet_views_at(point)
+
     ''' Returns the active sample's comet number. '''
     def get_active_sample_comet_number(self, comet_id):
 
@@ -1773,6 +1820,14 @@ class View(Observer):
     def set_analyze_samples_loading_window(self, analyze_samples_loading_window):
         self.__analyze_samples_loading_window = analyze_samples_loading_window
 
+    def get_generate_output_file_loading_window(self):
+        return self.__generate_output_file_loading_window
+
+    def set_generate_output_file_loading_window(self,
+            generate_output_file_loading_window):
+        self.__generate_output_file_loading_window = \
+            generate_output_file_loading_window
+
     def get_main_settings_window(self):
         return self.__main_settings_window
 
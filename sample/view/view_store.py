@@ -8,9 +8,12 @@
 import gi
 gi.require_version('Gtk', '3.0')
 from gi.repository import Gtk
+import cairo
 
 # Custom imports
+import sample.model.utils as utils
 from sample.view.canvas import Canvas
+from sample.view.comet_grid import CometGrid
 from sample.observer import Observable
 
  
@@ -52,17 +55,18 @@ class ViewStore(Observable):
                 return comet_view
 
     ''' 
-        Sets the scaled contours for the comet with given ID that belongs
+        Sets the contours for the comet with given ID that belongs
         to the sample with given ID.
     '''
-    def set_comet_scaled_contours(self, sample_id, comet_id, tail_contour,
+    def set_comet_contours(self, sample_id, comet_id, tail_contour,
                                                                 head_contour):
 
         for comet_view in self.__store[sample_id].get_comet_view_list():
 
             if comet_view.get_id() == comet_id:
-                comet_view.set_scaled_tail_contour(tail_contour)
-                comet_view.set_scaled_head_contour(head_contour)
+                comet_view.set_tail_contour(tail_contour)
+                comet_view.set_head_contour(head_contour)
+                self.__store[sample_id].update_comet(comet_view)
                 return
 
     '''
@@ -139,15 +143,18 @@ class SampleParameters(object):
     '''
 
     ''' Initialization method. '''
-    def __init__(self, pixbuf, comet_view_list=[]):
+    def __init__(self, surface, comet_view_list=[]):
 
-        self.__original_pixbuf = pixbuf
-        self.__displayed_pixbuf = pixbuf
+        # The full resolution image (cairo.ImageSurface). It is scaled to the
+        # zoom level when drawn, from its mipmaps kept by the TileCache
+        self.__surface = surface
 
         self.__scroll_x_position = Canvas.DEFAULT_SCROLLBAR_X_POSITION
         self.__scroll_y_position = Canvas.DEFAULT_SCROLLBAR_Y_POSITION
 
         self.__comet_view_list = comet_view_list
+        # The CometViews spatial index, kept in sync with the list
+        self.__comet_grid = CometGrid(comet_view_list)
  
 
 
@@ -162,6 +169,30 @@ class SampleParameters(object):
             self.get_comet_view_list().append(comet_view)
         else:
             self.get_comet_view_list().insert(pos, comet_view)
+        self.__comet_grid.insert(comet_view)
+
+    ''' 
+        Updates the spatial index of given CometView. Must be called when
+        its contours change.
+    '''
+    def update_comet(self, comet_view):
+        self.__comet_grid.update(comet_view)
+
+    '''
+        Returns the CometViews whose bounding box contains given point, in
+        the order of the CometView list.
+    '''
+    def get_comet_views_at(self, point):
+
+        candidates = self.__comet_grid.query(point)
+
+        # Overlapping comets keep the list order, so the same one is picked
+        if len(candidates) > 1:
+            positions = {comet_view.get_id(): i for (i, comet_view)
+                         in enumerate(self.__comet_view_list)}
+            candidates.sort(key=lambda comet_view: positions[comet_view.get_id()])
+
+        return candidates
 
     ''' Deletes the CometView object at given position. '''
     def delete_comet(self, comet_id):
@@ -170,6 +201,7 @@ class SampleParameters(object):
         while i < len(self.get_comet_view_list()):
             if self.get_comet_view_list()[i].get_id() == comet_id:
                 del self.get_comet_view_list()[i]
+                self.__comet_grid.remove(comet_id)
                 return True
             i += 1
 
@@ -180,17 +212,11 @@ class SampleParameters(object):
 #                              Getters & Setters                              #
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
 
-    def get_original_pixbuf(self):
-        return self.__original_pixbuf
+    def get_surface(self):
+        return self.__surface
 
-    def set_original_pixbuf(self, original_pixbuf):
-        self.__original_pixbuf = original_pixbuf
-
-    def get_displayed_pixbuf(self):
-        return self.__displayed_pixbuf
-
-    def set_displayed_pixbuf(self, displayed_pixbuf):
-        self.__displayed_pixbuf = displayed_pixbuf
+    def set_surface(self, surface):
+        self.__surface = surface
 
     def get_scroll_x_position(self):
         return self.__scroll_x_position
@@ -209,6 +235,7 @@ class SampleParameters(object):
 
     def set_comet_view_list(self, comet_view_list):
         self.__comet_view_list = comet_view_list
+        self.__comet_grid = CometGrid(comet_view_list)
 
  
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
@@ -220,15 +247,86 @@ class SampleParameters(object):
 class CometView(object):
 
     '''
-        The CometView class.
+        The CometView class. Its contours are in image coordinates. The cairo
+        paths and the bounding box used to draw them are built on demand and
+        kept until the contours change.
     '''
         
     ''' Initialization method. '''
     def __init__(self, comet_id, tail_contour, head_contour):
 
         self.__id = comet_id
-        self.__scaled_tail_contour = tail_contour
-        self.__scaled_head_contour = head_contour
+        self.__tail_contour = tail_contour
+        self.__head_contour = head_contour
+
+        self.__tail_path = None             # The tail_path (cairo.Path)
+        self.__head_path = None             # The head_path (cairo.Path)
+        self.__bounding_box = None          # The bounding_box (tuple)
+
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                  Methods                                    #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+    ''' Returns the cairo path of the tail contour, or None if no tail. '''
+    def get_tail_path(self):
+
+        if self.__tail_path is None and self.__tail_contour is not None:
+            self.__tail_path = CometView.__build_path(self.__tail_contour)
+        return self.__tail_path
+
+    ''' Returns the cairo path of the head contour. '''
+    def get_head_path(self):
+
+        if self.__head_path is None:
+            self.__head_path = CometView.__build_path(self.__head_contour)
+        return self.__head_path
+
+    ''' 
+        Returns the (x1, y1, x2, y2) box that encloses both contours.
+    '''
+    def get_bounding_box(self):
+
+        if self.__bounding_box is None:
+
+            contours = [self.__head_contour]
+            if self.__tail_contour is not None:
+                contours.append(self.__tail_contour)
+
+            boxes = []
+            for contour in contours:
+                (x, y, width, height) = utils.create_enclosing_rectangle(
+                                            contour)
+                boxes.append((x, y, x + width, y + height))
+
+            self.__bounding_box = (min(box[0] for box in boxes),
+                                   min(box[1] for box in boxes),
+                                   max(box[2] for box in boxes),
+                                   max(box[3] for box in boxes))
+
+        return self.__bounding_box
+
+    ''' Drops the cached paths and bounding box. '''
+    def __invalidate(self):
+
+        self.__tail_path = None
+        self.__head_path = None
+        self.__bounding_box = None
+
+    ''' Returns the closed cairo path of given OpenCV contour. '''
+    def __build_path(contour):
+
+        cairo_context = cairo.Context(
+                            cairo.ImageSurface(cairo.FORMAT_A1, 1, 1))
+
+        points = utils.contour_to_list(contour)
+        cairo_context.move_to(points[0][0], points[0][1])
+        for point in points[1:]:
+            cairo_context.line_to(point[0], point[1])
+        cairo_context.close_path()
+
+        return cairo_context.copy_path()
 
 
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
@@ -238,16 +336,18 @@ class CometView(object):
     def get_id(self):
         return self.__id
 
-    def get_scaled_tail_contour(self):
-        return self.__scaled_tail_contour
+    def get_tail_contour(self):
+        return self.__tail_contour
 
-    def set_scaled_tail_contour(self, scaled_tail_contour):
-        self.__scaled_tail_contour = scaled_tail_contour
+    def set_tail_contour(self, tail_contour):
+        self.__tail_contour = tail_contour
+        self.__invalidate()
 
-    def get_scaled_head_contour(self):
-        return self.__scaled_head_contour
+    def get_head_contour(self):
+        return self.__head_contour
 
-    def set_scaled_head_contour(self, scaled_head_contour):
-        self.__scaled_head_contour = scaled_head_contour
+    def set_head_contour(self, head_contour):
+        self.__head_contour = head_contour
+        self.__invalidate()
 
 
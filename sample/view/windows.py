@@ -664,7 +664,7 @@ class SelectionWindow(MyWindow):
                         comet_number))
 
                 self.__remove_tail_button.set_sensitive(
-                    comet_view.get_scaled_tail_contour() is not None)
+                    comet_view.get_tail_contour() is not None)
 
             # No comets selected
             else:
@@ -997,34 +997,30 @@ class CometParametersWindow(MyWindow):
 
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
 #                                                                             #
-#  AnalyzeSamplesLoadingWindow                                                #
+#  CancellableLoadingWindow                                                   #
 #                                                                             #
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
 
-class AnalyzeSamplesLoadingWindow(MyWindow):
+class CancellableLoadingWindow(MyWindow):
 
     '''
-        The AnalyzeSamplesLoadingWindow class. The window that shows the user 
-        which selected samples are being analyzed. 
+        The CancellableLoadingWindow class. The window that shows the user
+        the progress of a background operation that can be cancelled.
     '''
 
     ''' Initialization method. '''
-    def __init__(self, gtk_builder):
+    def __init__(self, gtk_builder, window_id):
 
         # The window
-        MyWindow.__init__(
-            self, gtk_builder.get_object("analyze-samples-loading-window"))
+        MyWindow.__init__(self, gtk_builder.get_object(window_id))
         self.get_window().set_default_size(440, 240)
 
         # The components
-        self.__top_label = gtk_builder.get_object(
-            "analyze-samples-loading-window-top-label")
+        self.__top_label = gtk_builder.get_object(window_id + "-top-label")
         self.__bottom_label = gtk_builder.get_object(
-            "analyze-samples-loading-window-bottom-label")
-        self.__spinner = gtk_builder.get_object(
-            "analyze-samples-loading-window-spinner")
-        self.__cancel_button = gtk_builder.get_object(
-            "analyze-samples-loading-window-cancel")
+            window_id + "-bottom-label")
+        self.__spinner = gtk_builder.get_object(window_id + "-spinner")
+        self.__cancel_button = gtk_builder.get_object(window_id + "-cancel")
         self.__initialize()
 
     ''' Initialization behaviour. '''
@@ -1089,3 +1085,41 @@ class AnalyzeSamplesLoadingWindow(MyWindow):
     def set_cancelled(self, cancelled):
         self.__cancelled = cancelled
 
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                                                             #
+#  AnalyzeSamplesLoadingWindow                                                #
+#                                                                             #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+class AnalyzeSamplesLoadingWindow(CancellableLoadingWindow):
+
+    '''
+        The AnalyzeSamplesLoadingWindow class. The window that shows the user 
+        which selected samples are being analyzed. 
+    '''
+
+    ''' Initialization method. '''
+    def __init__(self, gtk_builder):
+        super().__init__(gtk_builder, "analyze-samples-loading-window")
+
+
+
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+#                                                                             #
+#  GenerateOutputFileLoadingWindow                                            #
+#                                                                             #
+# ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
+
+class GenerateOutputFileLoadingWindow(CancellableLoadingWindow):
+
+    '''
+        The GenerateOutputFileLoadingWindow class. The window that shows the
+        user that the output file is being generated.
+    '''
+
+    ''' Initialization method. '''
+    def __init__(self, gtk_builder):
+        super().__init__(gtk_builder, "generate-output-file-loading-window")
+
@@ -10,6 +10,9 @@ import gi
 gi.require_version('Gtk', '3.0')
 from gi.repository import Gtk
 
+# Custom imports
+import sample.config as config
+from sample.view.tile_cache import TileCache
 
 # ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ ~ #
 #                                                                             #
@@ -52,19 +55,21 @@ class ZoomTool(object):
         self.__zoom_in_button = gtk_builder.get_object("toolbar-zoom-in")
         self.__zoom_out_button = gtk_builder.get_object("toolbar-zoom-out")
 
+        # The scaled image tiles cache
+        self.__tile_cache = TileCache(config.TILE_CACHE_MEMORY_BUDGET)
+
         self.__initialize()
 
     ''' Attributes initialization. '''
     def __initialize(self):
        
-        # # The scaled images cache
-        self.__cache = {}
         self.__entry.set_text("")
         self.__combobox.get_model().clear()
         self.switch_off()
 
     ''' Restart behaviour. '''
     def restart(self):
+        self.__tile_cache.clear()
         self.__initialize()
         
 
@@ -99,16 +104,6 @@ class ZoomTool(object):
     def get_active_scale_ratio(self):
         return self.__combobox.get_model()[self.__combobox.get_active()][1]        
 
-    ''' Adds a scaled pixbuf to the cache which belongs to a sample determined
-        by its ID. 
-    '''
-    def __add_cache(self, sample_id, zoom_level, scaled_pixbuf):
-
-        if not sample_id in self.__cache:
-            self.__cache[sample_id] = {zoom_level:scaled_pixbuf}
-        else:
-            self.__cache[sample_id][zoom_level] = scaled_pixbuf
-
     ''' Sets the Entry max length. '''
     def set_entry_max_length(self, length):
         self.__entry.set_max_length(length)
@@ -134,26 +129,16 @@ class ZoomTool(object):
     def set_model(self, model):
         self.__combobox.set_model(model)
 
-    ''' Applies a level of zoom to given image. '''
-    def apply_zoom(self, sample_id, pixbuf):
+    ''' 
+        Applies the active level of zoom and returns its scale ratio. Images
+        are scaled by the Canvas when drawn.
+    '''
+    def apply_zoom(self):
 
         # Update buttons sensitivity
         self.__update_buttons_sensitivity()
 
-        # Get zoom value 
-        zoom_value = self.__combobox.get_model()[self.__combobox.get_active()][1]
-        # See if stored in cache
-        if sample_id in self.__cache:
-            if zoom_value in self.__cache[sample_id]:
-                return self.__cache[sample_id][zoom_value]
-        
-        # Otherwise, scale and save to cache
-        scaled_pixbuf = pixbuf.scale_simple(pixbuf.get_width() * zoom_value, 
-                                            pixbuf.get_height() * zoom_value, 2)
-        # Add image to cache
-        self.__add_cache(sample_id, zoom_value, scaled_pixbuf)
-
-        return scaled_pixbuf
+        return self.get_active_scale_ratio()
 
     ''' Validates the combobox entry input. '''
     def validate_entry_text(self):
@@ -250,8 +235,5 @@ class ZoomTool(object):
     def set_entry(self, entry):
         self.__entry = entry
 
-    def get_cache(self):
-        return self.__cache
-
-    def set_cache(self, cache):
-        self.__cache = cache
+    def get_tile_cache(self):
+        return self.__tile_cache